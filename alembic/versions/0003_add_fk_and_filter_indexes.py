@@ -0,0 +1,41 @@
+"""add foreign-key and filter indexes matched to the crud queries
+
+Revision ID: 0003_add_fk_and_filter_indexes
+Revises: 0002_add_extra_and_trgm_index
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003_add_fk_and_filter_indexes'
+down_revision = '0002_add_extra_and_trgm_index'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # groups: search_groups filters on faculty_id + num_students, and the
+    # students-per-faculty report joins/sums on the same pair (index-only scan)
+    op.create_index('ix_groups_faculty_id_num_students', 'groups', ['faculty_id', 'num_students'])
+    # groups: promote_groups filters on course; (sort key, id) also serves the
+    # keyset pagination of search_groups for sort_by=course / num_students
+    op.create_index('ix_groups_course_id', 'groups', ['course', 'id'])
+    op.create_index('ix_groups_num_students_id', 'groups', ['num_students', 'id'])
+
+    # subjects: foreign key used by the subject details join
+    op.create_index(op.f('ix_subjects_department_id'), 'subjects', ['department_id'])
+
+    # sessions: foreign keys used by the session joins, and the date filter
+    op.create_index(op.f('ix_sessions_group_id'), 'sessions', ['group_id'])
+    op.create_index(op.f('ix_sessions_subject_id'), 'sessions', ['subject_id'])
+    op.create_index(op.f('ix_sessions_teacher_id'), 'sessions', ['teacher_id'])
+    op.create_index(op.f('ix_sessions_session_date'), 'sessions', ['session_date'])
+
+def downgrade():
+    op.drop_index(op.f('ix_sessions_session_date'), table_name='sessions')
+    op.drop_index(op.f('ix_sessions_teacher_id'), table_name='sessions')
+    op.drop_index(op.f('ix_sessions_subject_id'), table_name='sessions')
+    op.drop_index(op.f('ix_sessions_group_id'), table_name='sessions')
+    op.drop_index(op.f('ix_subjects_department_id'), table_name='subjects')
+    op.drop_index('ix_groups_num_students_id', table_name='groups')
+    op.drop_index('ix_groups_course_id', table_name='groups')
+    op.drop_index('ix_groups_faculty_id_num_students', table_name='groups')
@@ -0,0 +1,81 @@
+"""add faculty_stats summary table kept up to date by triggers on groups
+
+Revision ID: 0004_faculty_stats_summary
+Revises: 0003_add_fk_and_filter_indexes
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004_faculty_stats_summary'
+down_revision = '0003_add_fk_and_filter_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'faculty_stats',
+        sa.Column('faculty_id', sa.Integer, sa.ForeignKey('faculties.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('total_students', sa.BigInteger, nullable=False, server_default='0'),
+        sa.Column('group_count', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+    op.execute("""
+        INSERT INTO faculty_stats (faculty_id, total_students, group_count)
+        SELECT faculty_id, sum(num_students), count(*) FROM groups
+        WHERE faculty_id IS NOT NULL GROUP BY faculty_id
+    """)
+
+    # Statement-level triggers with transition tables: a bulk insert of N groups
+    # touches each affected faculty row once, and updates that change neither
+    # faculty_id nor num_students (e.g. promote_groups) produce no delta at all.
+    upsert = """
+        INSERT INTO faculty_stats AS fs (faculty_id, total_students, group_count, updated_at)
+        SELECT faculty_id, sum(students), sum(groups), now()
+        FROM ({delta}) AS delta
+        WHERE faculty_id IS NOT NULL
+        GROUP BY faculty_id
+        HAVING sum(students) <> 0 OR sum(groups) <> 0
+        ON CONFLICT (faculty_id) DO UPDATE
+        SET total_students = fs.total_students + EXCLUDED.total_students,
+            group_count = fs.group_count + EXCLUDED.group_count,
+            updated_at = EXCLUDED.updated_at;
+    """
+    inserted = "SELECT faculty_id, num_students AS students, 1 AS groups FROM new_rows"
+    deleted = "SELECT faculty_id, -num_students AS students, -1 AS groups FROM old_rows"
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION faculty_stats_apply_delta() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {upsert.format(delta=inserted)}
+            ELSIF TG_OP = 'DELETE' THEN
+                {upsert.format(delta=deleted)}
+            ELSE
+                {upsert.format(delta=inserted + " UNION ALL " + deleted)}
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE TRIGGER groups_faculty_stats_insert AFTER INSERT ON groups
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION faculty_stats_apply_delta()
+    """)
+    op.execute("""
+        CREATE TRIGGER groups_faculty_stats_update AFTER UPDATE ON groups
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION faculty_stats_apply_delta()
+    """)
+    op.execute("""
+        CREATE TRIGGER groups_faculty_stats_delete AFTER DELETE ON groups
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION faculty_stats_apply_delta()
+    """)
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS groups_faculty_stats_delete ON groups')
+    op.execute('DROP TRIGGER IF EXISTS groups_faculty_stats_update ON groups')
+    op.execute('DROP TRIGGER IF EXISTS groups_faculty_stats_insert ON groups')
+    op.execute('DROP FUNCTION IF EXISTS faculty_stats_apply_delta()')
+    op.drop_table('faculty_stats')
@@ -0,0 +1,28 @@
+"""add GiST trigram indexes for the ranked subject search
+
+Revision ID: 0005_subject_trgm_search_indexes
+Revises: 0004_faculty_stats_summary
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0005_subject_trgm_search_indexes'
+down_revision = '0004_faculty_stats_summary'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # search_subjects_by_trgm orders each field by `<->` distance with a LIMIT;
+    # only GiST trigram indexes can return rows in distance order (KNN), GIN
+    # cannot. The expressions must match crud.TRGM_FIELDS exactly.
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute("CREATE INDEX IF NOT EXISTS ix_subjects_name_trgm ON subjects USING gist (name gist_trgm_ops)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_subjects_notes_trgm_gist ON subjects USING gist ((extra->>'notes') gist_trgm_ops)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_subjects_tags_trgm ON subjects USING gist ((extra->>'tags') gist_trgm_ops)")
+    # The GIN index from 0002 (idx_subject_notes_trgm) stays: it serves the regex search.
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS ix_subjects_tags_trgm')
+    op.execute('DROP INDEX IF EXISTS ix_subjects_notes_trgm_gist')
+    op.execute('DROP INDEX IF EXISTS ix_subjects_name_trgm')
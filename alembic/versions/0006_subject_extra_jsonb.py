@@ -0,0 +1,44 @@
+"""convert subjects.extra from json to jsonb and add a jsonb_path_ops GIN index
+
+Revision ID: 0006_subject_extra_jsonb
+Revises: 0005_subject_trgm_search_indexes
+Create Date: 2026-10-17
+
+The type change rewrites the subjects table under an ACCESS EXCLUSIVE lock.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0006_subject_extra_jsonb'
+down_revision = '0005_subject_trgm_search_indexes'
+branch_labels = None
+depends_on = None
+
+# Expression indexes on `extra` (0002, 0005), rebuilt around the type change
+EXTRA_INDEXES = {
+    'idx_subject_notes_trgm': "USING gin ((extra->>'notes') gin_trgm_ops)",
+    'ix_subjects_notes_trgm_gist': "USING gist ((extra->>'notes') gist_trgm_ops)",
+    'ix_subjects_tags_trgm': "USING gist ((extra->>'tags') gist_trgm_ops)",
+}
+
+def drop_extra_indexes():
+    for name in EXTRA_INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+
+def create_extra_indexes():
+    for name, definition in EXTRA_INDEXES.items():
+        op.execute(f'CREATE INDEX IF NOT EXISTS {name} ON subjects {definition}')
+
+def upgrade():
+    drop_extra_indexes()
+    op.execute('ALTER TABLE subjects ALTER COLUMN extra TYPE jsonb USING extra::jsonb')
+    create_extra_indexes()
+    # jsonb_path_ops: smaller and faster than the default jsonb_ops, and only
+    # supports @> (plus jsonpath @? / @@), which is all the containment queries use
+    op.execute('CREATE INDEX IF NOT EXISTS ix_subjects_extra_path_ops ON subjects USING gin (extra jsonb_path_ops)')
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS ix_subjects_extra_path_ops')
+    drop_extra_indexes()
+    op.execute('ALTER TABLE subjects ALTER COLUMN extra TYPE json USING extra::json')
+    create_extra_indexes()
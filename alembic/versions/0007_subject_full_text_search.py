@@ -0,0 +1,54 @@
+"""add a trigger-maintained tsvector column over subject name and notes, with a GIN index
+
+Revision ID: 0007_subject_full_text_search
+Revises: 0006_subject_extra_jsonb
+Create Date: 2026-10-17
+
+The column is filled by a trigger instead of being GENERATED ... STORED: adding
+a stored generated column rewrites the whole table under an exclusive lock,
+while a plain nullable column is added instantly and existing rows can be
+indexed incrementally with scripts/reindex_subjects.py. Pass
+`alembic -x skip_fts_backfill=true upgrade head` to skip the one-shot backfill
+below on large tables and run the script instead.
+"""
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '0007_subject_full_text_search'
+down_revision = '0006_subject_extra_jsonb'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('subjects', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    # Single definition of the document, shared by the trigger and the reindex script.
+    # Name matches rank above notes (weights A and B for ts_rank).
+    op.execute("""
+        CREATE OR REPLACE FUNCTION subject_search_vector(name text, extra jsonb) RETURNS tsvector AS $$
+            SELECT setweight(to_tsvector('english', coalesce(name, '')), 'A')
+                || setweight(to_tsvector('english', coalesce(extra->>'notes', '')), 'B')
+        $$ LANGUAGE sql IMMUTABLE;
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION subjects_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := subject_search_vector(NEW.name, NEW.extra);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE TRIGGER subjects_search_vector BEFORE INSERT OR UPDATE OF name, extra ON subjects
+        FOR EACH ROW EXECUTE FUNCTION subjects_search_vector_update()
+    """)
+    if context.get_x_argument(as_dictionary=True).get('skip_fts_backfill', 'false').lower() != 'true':
+        op.execute('UPDATE subjects SET search_vector = subject_search_vector(name, extra)')
+    op.execute('CREATE INDEX IF NOT EXISTS ix_subjects_search_vector ON subjects USING gin (search_vector)')
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS ix_subjects_search_vector')
+    op.execute('DROP TRIGGER IF EXISTS subjects_search_vector ON subjects')
+    op.execute('DROP FUNCTION IF EXISTS subjects_search_vector_update()')
+    op.execute('DROP FUNCTION IF EXISTS subject_search_vector(text, jsonb)')
+    op.drop_column('subjects', 'search_vector')
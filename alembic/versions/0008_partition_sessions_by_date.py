@@ -0,0 +1,92 @@
+"""range-partition sessions by session_date, one partition per year
+
+Revision ID: 0008_partition_sessions_by_date
+Revises: 0007_subject_full_text_search
+Create Date: 2026-10-17
+
+The table is rebuilt: the old heap is renamed, a partitioned `sessions` is
+created with yearly partitions covering the existing dates (plus the current
+and next two years and a default partition), the rows are copied over and the
+old heap is dropped. This rewrites the table once and holds an exclusive lock
+on it while copying, so run it in a maintenance window.
+
+A partitioned table's primary key has to include the partition key, so the
+key becomes (id, session_date); ids still come from sessions_id_seq. The
+indexes are declared on the parent and created on every partition. See
+app/partitions.py and scripts/manage_partitions.py for later maintenance.
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0008_partition_sessions_by_date'
+down_revision = '0007_subject_full_text_search'
+branch_labels = None
+depends_on = None
+
+YEARS_AHEAD = 2
+
+INDEXES = {
+    'ix_sessions_id': ['id'],
+    'ix_sessions_group_id': ['group_id'],
+    'ix_sessions_subject_id': ['subject_id'],
+    'ix_sessions_teacher_id': ['teacher_id'],
+    'ix_sessions_session_date': ['session_date'],
+}
+
+COLUMNS = 'id, control_type, session_date, group_id, subject_id, teacher_id'
+
+def create_sessions_table(partitioned: bool):
+    op.execute(f"""
+        CREATE TABLE sessions (
+            id integer NOT NULL DEFAULT nextval('sessions_id_seq'),
+            control_type varchar(100) NOT NULL,
+            session_date date NOT NULL,
+            group_id integer NOT NULL REFERENCES groups (id),
+            subject_id integer NOT NULL REFERENCES subjects (id),
+            teacher_id integer NOT NULL REFERENCES teachers (id),
+            PRIMARY KEY ({'id, session_date' if partitioned else 'id'})
+        ){' PARTITION BY RANGE (session_date)' if partitioned else ''}
+    """)
+    op.execute('ALTER SEQUENCE sessions_id_seq OWNED BY sessions.id')
+    for name, columns in INDEXES.items():
+        if partitioned or name != 'ix_sessions_id':
+            op.create_index(name, 'sessions', columns)
+
+def upgrade():
+    conn = op.get_bind()
+    op.execute('ALTER TABLE sessions RENAME TO sessions_unpartitioned')
+    op.execute('ALTER SEQUENCE sessions_id_seq OWNED BY NONE')
+    for name in INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+    op.execute('ALTER TABLE sessions_unpartitioned RENAME CONSTRAINT sessions_pkey TO sessions_unpartitioned_pkey')
+
+    create_sessions_table(partitioned=True)
+    first, last = conn.execute(sa.text(
+        'SELECT extract(year FROM min(session_date))::int, extract(year FROM max(session_date))::int '
+        'FROM sessions_unpartitioned'
+    )).one()
+    current = date.today().year
+    for year in range(min(first or current, current), max(last or current, current + YEARS_AHEAD) + 1):
+        op.execute(
+            f"CREATE TABLE sessions_y{year} PARTITION OF sessions "
+            f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+        )
+    op.execute('CREATE TABLE sessions_default PARTITION OF sessions DEFAULT')
+
+    op.execute(f'INSERT INTO sessions ({COLUMNS}) SELECT {COLUMNS} FROM sessions_unpartitioned')
+    op.execute('DROP TABLE sessions_unpartitioned')
+    op.execute('ANALYZE sessions')
+
+def downgrade():
+    # Detached or archived partitions are not brought back
+    op.execute('ALTER TABLE sessions RENAME TO sessions_partitioned')
+    op.execute('ALTER SEQUENCE sessions_id_seq OWNED BY NONE')
+    for name in INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+    op.execute('ALTER TABLE sessions_partitioned RENAME CONSTRAINT sessions_pkey TO sessions_partitioned_pkey')
+
+    create_sessions_table(partitioned=False)
+    op.execute(f'INSERT INTO sessions ({COLUMNS}) SELECT {COLUMNS} FROM sessions_partitioned')
+    op.execute('DROP TABLE sessions_partitioned')
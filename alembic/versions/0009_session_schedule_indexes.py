@@ -0,0 +1,34 @@
+"""add (owner, session_date, id) indexes for schedules and double-booking checks
+
+Revision ID: 0009_session_schedule_indexes
+Revises: 0008_partition_sessions_by_date
+Create Date: 2026-10-17
+
+A teacher/group/subject schedule filters on the owner and a date range and is
+ordered by (session_date, id): with these indexes it is a range scan that
+returns rows in output order. The conflict check groups by (owner, date) and
+collects ids, which an index-only scan covers. Each index starts with the
+foreign key, so it replaces the single-column foreign key index.
+
+CREATE INDEX CONCURRENTLY is not available on a partitioned table; on a very
+large table create the index on each partition concurrently first (ALTER
+INDEX ... ATTACH PARTITION), or run this in a maintenance window.
+"""
+from alembic import op
+
+revision = '0009_session_schedule_indexes'
+down_revision = '0008_partition_sessions_by_date'
+branch_labels = None
+depends_on = None
+
+OWNERS = ('teacher_id', 'group_id', 'subject_id')
+
+def upgrade():
+    for owner in OWNERS:
+        op.create_index(f'ix_sessions_{owner}_date', 'sessions', [owner, 'session_date', 'id'])
+        op.drop_index(f'ix_sessions_{owner}', table_name='sessions')
+
+def downgrade():
+    for owner in OWNERS:
+        op.create_index(f'ix_sessions_{owner}', 'sessions', [owner])
+        op.drop_index(f'ix_sessions_{owner}_date', table_name='sessions')
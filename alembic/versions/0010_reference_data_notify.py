@@ -0,0 +1,41 @@
+"""notify on writes to the reference tables, for the per-worker snapshot
+
+Revision ID: 0010_reference_data_notify
+Revises: 0009_session_schedule_indexes
+Create Date: 2026-10-17
+
+Statement-level triggers send NOTIFY reference_data, '<table>' after every
+INSERT/UPDATE/DELETE/TRUNCATE on faculties, departments, teachers and subjects.
+Notifications are delivered at commit (identical ones within a transaction
+are sent once), and every worker's listener (app/reference.py) marks that
+table of its snapshot stale.
+"""
+from alembic import op
+
+revision = '0010_reference_data_notify'
+down_revision = '0009_session_schedule_indexes'
+branch_labels = None
+depends_on = None
+
+TABLES = ('faculties', 'departments', 'teachers', 'subjects')
+
+def upgrade():
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_reference_data() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('reference_data', TG_TABLE_NAME);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    for table in TABLES:
+        op.execute(f"""
+            CREATE TRIGGER {table}_notify_reference_data
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_reference_data()
+        """)
+
+def downgrade():
+    for table in TABLES:
+        op.execute(f'DROP TRIGGER IF EXISTS {table}_notify_reference_data ON {table}')
+    op.execute('DROP FUNCTION IF EXISTS notify_reference_data()')
@@ -0,0 +1,37 @@
+"""trigram-index the subject tags as strings, not as the JSON text of the array
+
+Revision ID: 0011_subject_tags_trgm_elements
+Revises: 0010_reference_data_notify
+Create Date: 2026-10-17
+
+ix_subjects_tags_trgm (0005) indexed extra->>'tags', the JSON text of the
+array, so the similarity of a query was computed against all tags at once.
+subject_tags_text(extra) returns the tags themselves, one per line; the
+search scores them by strict word similarity (crud.TRGM_WORD_FIELDS), which
+the GiST index supports as well. The function must stay IMMUTABLE and match
+crud.TRGM_FIELDS["tags"] exactly for the index to be used.
+"""
+from alembic import op
+
+revision = '0011_subject_tags_trgm_elements'
+down_revision = '0010_reference_data_notify'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute("""
+        CREATE OR REPLACE FUNCTION subject_tags_text(extra jsonb) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT string_agg(tag, E'\\n')
+            FROM jsonb_array_elements_text(
+                CASE WHEN jsonb_typeof(extra->'tags') = 'array' THEN extra->'tags' ELSE '[]'::jsonb END
+            ) AS tag
+        $$
+    """)
+    op.execute('DROP INDEX IF EXISTS ix_subjects_tags_trgm')
+    op.execute("CREATE INDEX ix_subjects_tags_trgm ON subjects USING gist (subject_tags_text(extra) gist_trgm_ops)")
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS ix_subjects_tags_trgm')
+    op.execute("CREATE INDEX ix_subjects_tags_trgm ON subjects USING gist ((extra->>'tags') gist_trgm_ops)")
+    op.execute('DROP FUNCTION IF EXISTS subject_tags_text(jsonb)')
@@ -0,0 +1,204 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
+
+from .replicas import wants_primary
+
+# --- Response cache for read endpoints ---
+#
+# GET responses of the routes in CACHED_ROUTES are stored under a key made of
+# the path, the sorted query string and the current version of every entity
+# namespace the route reads. A successful POST/PUT/PATCH/DELETE bumps the
+# version of its namespace (the first path segment, e.g. /groups/promote/ ->
+# "groups"), so stale entries are never read again and simply age out.
+#
+# CACHE_BACKEND=memory (default) keeps an LRU with TTL per worker process;
+# CACHE_BACKEND=redis shares entries and namespace versions between workers
+# (CACHE_URL, needs the `redis` package) and stores each entry as JSON, never
+# pickle, so whoever can write to Redis cannot make the app run code;
+# CACHE_BACKEND=off disables caching.
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+CACHE_TTL = int(os.getenv("CACHE_TTL", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+
+# Path -> entity namespaces whose writes invalidate it
+CACHED_ROUTES = {
+    "/faculties/": ("faculties",),
+    "/departments/": ("departments",),
+    "/subjects/": ("subjects",),
+    "/groups/search/": ("groups",),
+    "/groups/details/": ("groups", "faculties"),
+    "/subjects/details/": ("subjects", "departments"),
+    "/subjects/search-trgm/": ("subjects",),
+    "/subjects/search-regex/": ("subjects",),
+    "/subjects/search-fts/": ("subjects",),
+    "/subjects/by-tag/": ("subjects",),
+    "/subjects/by-extra/": ("subjects",),
+    "/sessions/conflicts/": ("sessions",),
+    "/reports/students-per-faculty/": ("groups", "faculties"),
+}
+
+# Writes under these paths change no cached entity (e.g. the promotion job, whose
+# run invalidates "groups" itself), so they bump no namespace
+UNCACHED_WRITE_PREFIXES = ("/jobs/",)
+
+# Response headers that are stored with a cached body
+CACHED_HEADERS = ("content-type", "x-next-cursor")
+
+
+class MemoryCache:
+    """In-process LRU cache with a per-entry TTL. Also the local stand-in for the shared backend."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: int = CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def version(self, namespace: str) -> int:
+        return self._versions.get(namespace, 0)
+
+    def bump(self, namespace: str):
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache:
+    """Shared cache for all workers; same interface as MemoryCache."""
+
+    def __init__(self, url: str = CACHE_URL, ttl: int = CACHE_TTL):
+        import redis  # optional dependency, only needed with CACHE_BACKEND=redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key: str):
+        raw = self.client.get("cache:" + key)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        return base64.b64decode(entry["body"]), entry["headers"], entry["etag"]
+
+    def set(self, key: str, value):
+        body, headers, etag = value
+        entry = {"body": base64.b64encode(body).decode("ascii"), "headers": headers, "etag": etag}
+        self.client.set("cache:" + key, json.dumps(entry), ex=self.ttl)
+
+    def version(self, namespace: str) -> int:
+        return int(self.client.get("cache-version:" + namespace) or 0)
+
+    def bump(self, namespace: str):
+        self.client.incr("cache-version:" + namespace)
+
+    def clear(self):
+        for key in self.client.scan_iter("cache:*"):
+            self.client.delete(key)
+
+
+def build_cache():
+    if CACHE_BACKEND == "off":
+        return None
+    if CACHE_BACKEND == "redis":
+        return RedisCache()
+    return MemoryCache()
+
+cache = build_cache()
+
+
+def invalidate(*namespaces: str):
+    """Invalidate cached responses that read any of `namespaces` (for writes outside POST/PUT routes)."""
+    if cache is not None:
+        for namespace in namespaces:
+            cache.bump(namespace)
+
+def cache_key(path: str, query: str, namespaces) -> str:
+    versions = ",".join(f"{ns}={cache.version(ns)}" for ns in namespaces)
+    return f"{path}?{urlencode(sorted(parse_qsl(query, keep_blank_values=True)))}#{versions}"
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+class CacheMiddleware(BaseHTTPMiddleware):
+    """Serve cached GET responses with ETag/If-None-Match and invalidate namespaces on writes."""
+
+    async def dispatch(self, request, call_next):
+        if cache is None:
+            return await call_next(request)
+
+        path = request.url.path
+        if request.method != "GET":
+            response = await call_next(request)
+            if (
+                request.method in ("POST", "PUT", "PATCH", "DELETE") and response.status_code < 400
+                and not path.startswith(UNCACHED_WRITE_PREFIXES)
+            ):
+                invalidate(path.strip("/").split("/")[0])
+            return response
+
+        namespaces = CACHED_ROUTES.get(path)
+        # Clients that just wrote read from the primary (replicas.py); an entry may have been
+        # filled from a lagging replica after their write, so they bypass the cache
+        if namespaces is None or wants_primary(request):
+            return await call_next(request)
+
+        if_none_match = request.headers.get("if-none-match")
+        key = cache_key(path, request.url.query, namespaces)
+        entry = cache.get(key)
+        if entry is not None:
+            body, headers, etag = entry
+            if etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers={"ETag": etag, "X-Cache": "HIT"})
+            return Response(content=body, headers={**headers, "ETag": etag, "Cache-Control": "no-cache", "X-Cache": "HIT"})
+
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+        etag = make_etag(body)
+        cache.set(key, (body, headers, etag))
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag, "X-Cache": "MISS"})
+        return Response(content=body, headers={**headers, "ETag": etag, "Cache-Control": "no-cache", "X-Cache": "MISS"})
@@ -1,58 +1,286 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func, text, update
-from typing import List, Optional
+import os
+import re
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import Float, Integer, String, any_, bindparam, cast, inspect as sa_inspect, func, insert, literal_column, select, text, tuple_, union_all, update
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, aggregate_order_by, insert as pg_insert
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
 
-from . import models, schemas
+from . import models, reference, schemas, statements
+from .serialization import NESTED_SEPARATOR, rows_to_dicts
 
 # --- Generic CRUD Functions ---
 
 def get_by_id(db: Session, model, id: int):
-    return db.query(model).filter(model.id == id).first()
+    return db.execute(by_field_statement(model, "id"), {"value": id}).scalars().first()
 
-def get_all(db: Session, model, skip: int, limit: int):
-    return db.query(model).offset(skip).limit(limit).all()
+def paginate(query, model, skip: int, limit: int, after_id: Optional[int] = None, ids: Optional[List[int]] = None):
+    """ OFFSET paging, or keyset paging (WHERE id > :after_id) when `after_id` is given
 
-def create(db: Session, model, schema):
-    db_obj = model(**schema.dict())
-    db.add(db_obj)
+    With `ids` the page is replaced by those rows, in id order: WHERE id = ANY(:ids)
+    binds one array, so there is a single statement (and plan) for any number of ids.
+    """
+    query = query.order_by(model.id)
+    if ids is not None:
+        return query.filter(model.id == any_(bindparam("ids", list(ids), type_=ARRAY(Integer))))
+    if after_id is not None:
+        return query.filter(model.id > after_id).limit(limit)
+    return query.offset(skip).limit(limit)
+
+def get_all(db: Session, model, skip: int, limit: int, after_id: Optional[int] = None, ids: Optional[List[int]] = None):
+    return paginate(db.query(model), model, skip, limit, after_id, ids).all()
+
+# Natural key of each model: creates use INSERT ... ON CONFLICT on it instead of a check-then-insert
+UNIQUE_FIELDS = {
+    models.Faculty: "name",
+    models.Department: "name",
+    models.Group: "code",
+    models.Subject: "name",
+}
+
+# Foreign keys of each model, to name the missing parent of a foreign key violation
+FOREIGN_KEYS = {
+    models.Group: {"faculty_id": models.Faculty},
+    models.Subject: {"department_id": models.Department},
+    models.Session: {"group_id": models.Group, "subject_id": models.Subject, "teacher_id": models.Teacher},
+}
+
+FOREIGN_KEY_VIOLATION = "23503"
+UNIQUE_VIOLATION = "23505"
+
+def create(db: Session, model, schema, upsert: bool = False):
+    """ Insert one row with a single statement; returns None when its natural key is taken.
+
+    With `upsert` the existing row with the same natural key is updated instead.
+    Foreign keys are checked by the database: an IntegrityError is raised (see
+    violated_foreign_key) and the session rolled back.
+    """
+    stmt = insert_statement(model, UNIQUE_FIELDS.get(model), upsert).values(**schema.dict())
+    try:
+        created = db.execute(stmt).mappings().first()
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise
+    reference.written(model)
+    return created
+
+def violated_foreign_key(error: IntegrityError, model) -> Optional[str]:
+    """ Name of the parent model a foreign key violation points at, or None for other errors """
+    if sqlstate(error) != FOREIGN_KEY_VIOLATION:
+        return None
+    # psycopg2: 'Key (faculty_id)=(9) is not present ...'; asyncpg: constraint 'groups_faculty_id_fkey'
+    message = str(error.orig)
+    for column, parent in FOREIGN_KEYS.get(model, {}).items():
+        if f"({column})" in message or f"_{column}_fkey" in message:
+            return parent.__name__
+    return "Referenced row"
+
+def create_bulk(
+    db: Session,
+    model,
+    schemas_in: list,
+    unique_field: Optional[str] = None,
+    foreign_keys: Optional[Dict[str, Any]] = None,
+    upsert: bool = False,
+):
+    """ Validate a batch with set-based queries and insert the valid rows at once.
+
+    Duplicates (against the table and within the batch) and missing foreign keys are
+    found with one `WHERE ... IN (...)` query per column. Valid rows go into a single
+    multi-row INSERT ... RETURNING; rows on a unique column use ON CONFLICT DO NOTHING
+    so a concurrent insert of the same value is reported instead of failing the batch.
+    With `upsert`, rows whose unique value exists update that row (ON CONFLICT DO UPDATE).
+    Returns the created rows (in input order) and a list of (index, detail) errors.
+    """
+    rows = [item.dict() for item in schemas_in]
+    taken = set()
+    if unique_field and not upsert:
+        column = getattr(model, unique_field)
+        taken = set(db.scalars(select(column).where(column.in_({row[unique_field] for row in rows}))))
+    found = {
+        field: existing_ids(db, parent, {row[field] for row in rows})
+        for field, parent in (foreign_keys or {}).items()
+    }
+    errors = validate_bulk(model, rows, unique_field, taken, foreign_keys or {}, found)
+    valid = [i for i in range(len(rows)) if i not in errors]
+    if not valid:
+        return [], sorted(errors.items())
+
+    inserted = db.execute(insert_statement(model, unique_field, upsert), [rows[i] for i in valid]).mappings().all()
     db.commit()
-    db.refresh(db_obj)
-    return db_obj
+    reference.written(model)
+    created = match_bulk_created(model, rows, valid, inserted, unique_field, errors)
+    return created, sorted(errors.items())
+
+# Helpers shared with the async implementation in crud_async
+
+def existing_ids(db: Session, model, ids: set) -> set:
+    """ The subset of `ids` that exist: from the reference snapshot, the rest with one IN query """
+    found = reference.known_ids(db, model, ids)
+    missing = ids - found
+    if missing:
+        found |= set(db.scalars(select(model.id).where(model.id.in_(missing))))
+    return found
+
+def validate_bulk(model, rows: list, unique_field, taken: set, foreign_keys: dict, found: dict) -> Dict[int, str]:
+    errors: Dict[int, str] = {}
+    if unique_field:
+        taken = set(taken)
+        for i, row in enumerate(rows):
+            if row[unique_field] in taken:
+                errors[i] = f"{model.__name__} with this {unique_field} already exists."
+            taken.add(row[unique_field])
+    for field, parent in foreign_keys.items():
+        for i, row in enumerate(rows):
+            if row[field] not in found[field]:
+                errors.setdefault(i, f"{parent.__name__} not found")
+    return errors
+
+def loaded_columns(model) -> list:
+    """ Table columns of `model` that the ORM loads (deferred ones, like search_vector, excluded) """
+    return [prop.columns[0] for prop in sa_inspect(model).column_attrs if not prop.deferred]
+
+def insert_statement(model, unique_field: Optional[str], upsert: bool = False):
+    """ INSERT ... RETURNING; ON CONFLICT on `unique_field` does nothing, or updates the row with `upsert` """
+    table = model.__table__
+    columns = loaded_columns(model)
+    if not unique_field:
+        return insert(table).returning(*columns, sort_by_parameter_order=True)
+    stmt = pg_insert(table)
+    if upsert:
+        updated = {c.name: stmt.excluded[c.name] for c in columns if c.name not in ("id", unique_field)}
+        # Nothing but the key to update (faculties, departments): a no-op update, so RETURNING
+        # still gives back the existing row, where DO NOTHING would return none
+        updated = updated or {unique_field: stmt.excluded[unique_field]}
+        return stmt.on_conflict_do_update(index_elements=[unique_field], set_=updated).returning(*columns)
+    return stmt.on_conflict_do_nothing(index_elements=[unique_field]).returning(*columns)
+
+def match_bulk_created(model, rows: list, valid: list, inserted: list, unique_field, errors: Dict[int, str]) -> list:
+    """ Put RETURNING rows back in input order; rows skipped by ON CONFLICT become errors """
+    if not unique_field:
+        return list(inserted)
+    by_value = {row[unique_field]: row for row in inserted}
+    created = []
+    for i in valid:
+        row = by_value.get(rows[i][unique_field])
+        if row is None:
+            errors[i] = f"{model.__name__} with this {unique_field} already exists."
+        else:
+            created.append(row)
+    return created
 
 # --- Specific Getters for Duplicate Checks ---
 
 def get_faculty_by_name(db: Session, name: str):
-    return db.query(models.Faculty).filter(models.Faculty.name == name).first()
+    return db.execute(by_field_statement(models.Faculty, "name"), {"value": name}).scalars().first()
 
 def get_group_by_code(db: Session, code: str):
-    return db.query(models.Group).filter(models.Group.code == code).first()
+    return db.execute(by_field_statement(models.Group, "code"), {"value": code}).scalars().first()
 
 def get_department_by_name(db: Session, name: str):
-    return db.query(models.Department).filter(models.Department.name == name).first()
+    return db.execute(by_field_statement(models.Department, "name"), {"value": name}).scalars().first()
 
 def get_subject_by_name(db: Session, name: str):
-    return db.query(models.Subject).filter(models.Subject.name == name).first()
+    return db.execute(by_field_statement(models.Subject, "name"), {"value": name}).scalars().first()
 
 def get_teacher_by_name(db: Session, name: str):
-    return db.query(models.Teacher).filter(models.Teacher.name == name).first()
+    return db.execute(by_field_statement(models.Teacher, "name"), {"value": name}).scalars().first()
+
+def by_field_statement(model, field: str):
+    """ SELECT model WHERE field = :value LIMIT 1, built once per (model, field) (see statements.py) """
+    return statements.cached(
+        ("by_field", model, field),
+        lambda: select(model).where(getattr(model, field) == bindparam("value")).limit(1)
+        .execution_options(**{statements.PREPARE_OPTION: True}),
+    )
 
 
 # --- Complex Queries ---
 
-def search_groups(db: Session, faculty_id: Optional[int], min_students: int, sort_by: Optional[str], skip: int, limit: int):
-    """ SELECT ... WHERE (с несколькими условиями) + sorting """
-    query = db.query(models.Group)
+def search_groups(
+    db: Session,
+    faculty_id: Optional[int],
+    min_students: int,
+    sort_by: Optional[str],
+    skip: int,
+    limit: int,
+    after: Optional[Tuple[Any, ...]] = None,
+):
+    """ SELECT ... WHERE (с несколькими условиями) + sorting
+
+    Rows are ordered by (sort_by, id), or by id alone, so the order is stable.
+    When `after` holds those key values for the last row of the previous page,
+    the page is fetched with a keyset seek instead of OFFSET.
+    """
+    stmt, params = search_groups_statement((models.Group,), faculty_id, min_students, sort_by, skip, limit, after)
+    return db.execute(stmt, params).scalars().all()
+
+def search_groups_statement(columns: tuple, faculty_id, min_students, sort_by, skip, limit, after=None):
+    """ (statement, parameters) of a search_groups page selecting `columns`
+
+    The statement only depends on which conditions are present, so it is built
+    once per shape and the values are passed as parameters (see statements.py).
+    """
+    sort_by = sort_by if sort_by and hasattr(models.Group, sort_by) else None
+    shape = ("search_groups", columns, bool(faculty_id), min_students > 0, sort_by, after is not None)
+    params = {"limit": limit}
     if faculty_id:
-        query = query.filter(models.Group.faculty_id == faculty_id)
+        params["faculty_id"] = faculty_id
     if min_students > 0:
-        query = query.filter(models.Group.num_students >= min_students)
-    if sort_by and hasattr(models.Group, sort_by):
-        query = query.order_by(getattr(models.Group, sort_by))
-    return query.offset(skip).limit(limit).all()
+        params["min_students"] = min_students
+    if after is not None:
+        params.update((f"after_{i}", value) for i, value in enumerate(after))
+    else:
+        params["skip"] = skip
+    return statements.cached(shape, lambda: build_search_groups(*shape[1:])), params
+
+def build_search_groups(columns: tuple, by_faculty: bool, by_min_students: bool, sort_by: Optional[str], keyset: bool):
+    stmt = select(*columns)
+    if by_faculty:
+        stmt = stmt.where(models.Group.faculty_id == bindparam("faculty_id"))
+    if by_min_students:
+        stmt = stmt.where(models.Group.num_students >= bindparam("min_students"))
+    order_by = [models.Group.id]
+    if sort_by:
+        order_by.insert(0, getattr(models.Group, sort_by))
+    stmt = stmt.order_by(*order_by).execution_options(**{statements.PREPARE_OPTION: True})
+    if keyset:
+        after = [bindparam(f"after_{i}", type_=column.type) for i, column in enumerate(order_by)]
+        return stmt.where(tuple_(*order_by) > tuple_(*after)).limit(bindparam("limit"))
+    return stmt.offset(bindparam("skip")).limit(bindparam("limit"))
+
+SESSION_DETAILS_OPTIONS = (
+    joinedload(models.Session.group),
+    joinedload(models.Session.subject),
+    joinedload(models.Session.teacher),
+)
 
-def get_session_details(db: Session, skip: int, limit: int):
-    """ JOIN example """
-    return db.query(models.Session).offset(skip).limit(limit).all()
+def get_session_details(db: Session, skip: int, limit: int, after_id: Optional[int] = None, ids: Optional[List[int]] = None):
+    """ JOIN example: group, subject and teacher come from one LEFT OUTER JOIN query.
+
+    With the reference snapshot, only the group is joined; subject and teacher
+    are nested from memory (see get_details_rows).
+    """
+    if reference.REFERENCE_SNAPSHOT:
+        return get_details_rows(db, models.Session, schemas.Session, skip, limit, after_id, ids)
+    query = db.query(models.Session).options(*SESSION_DETAILS_OPTIONS)
+    return paginate(query, models.Session, skip, limit, after_id, ids).all()
+
+def get_group_details(db: Session, skip: int, limit: int, after_id: Optional[int] = None, ids: Optional[List[int]] = None):
+    """ Groups joined with their faculty in a single query (the faculty from the snapshot when enabled) """
+    if reference.REFERENCE_SNAPSHOT:
+        return get_details_rows(db, models.Group, schemas.Group, skip, limit, after_id, ids)
+    query = db.query(models.Group).options(joinedload(models.Group.faculty))
+    return paginate(query, models.Group, skip, limit, after_id, ids).all()
+
+def get_subject_details(db: Session, skip: int, limit: int, after_id: Optional[int] = None, ids: Optional[List[int]] = None):
+    """ Subjects joined with their department in a single query (the department from the snapshot when enabled) """
+    if reference.REFERENCE_SNAPSHOT:
+        return get_details_rows(db, models.Subject, schemas.Subject, skip, limit, after_id, ids)
+    query = db.query(models.Subject).options(joinedload(models.Subject.department))
+    return paginate(query, models.Subject, skip, limit, after_id, ids).all()
 
 def promote_groups(db: Session, current_course: int):
     """ UPDATE с нетривиальным условием """
@@ -66,23 +294,495 @@ def promote_groups(db: Session, current_course: int):
     return result.rowcount
 
 def get_students_per_faculty(db: Session) -> List[schemas.FacultyStats]:
-    """ GROUP BY example """
+    """ GROUP BY example, served from the trigger-maintained faculty_stats summary
+
+    The SUM(num_students) ... GROUP BY faculty is kept up to date incrementally by
+    the triggers on `groups`, so this reads one row per faculty instead of
+    aggregating every group. `freshness` is when that faculty's totals last changed.
+    """
     result = (
         db.query(
             models.Faculty.name.label("faculty_name"),
-            func.sum(models.Group.num_students).label("total_students")
+            models.FacultyStat.total_students.label("total_students"),
+            models.FacultyStat.updated_at.label("freshness"),
         )
-        .join(models.Group, models.Faculty.id == models.Group.faculty_id)
-        .group_by(models.Faculty.name)
+        .join(models.FacultyStat, models.Faculty.id == models.FacultyStat.faculty_id)
+        .filter(models.FacultyStat.group_count > 0)
         .all()
     )
     return result
 
-def search_subjects_by_trgm(db: Session, query: str):
-    """ Full-text search using pg_trgm similarity """
-    # Requires pg_trgm extension and a GIN/GIST index on the JSON field.
-    return db.query(models.Subject).filter(text("extra->>'notes' % :query")).params(query=query).all()
+# Fields searched by search_subjects_by_trgm; each has a GiST gist_trgm_ops index
+# (migrations 0005, 0011) on exactly this expression, so the operators below can use it.
+TRGM_FIELDS = {
+    "name": models.Subject.name,
+    "notes": literal_column("(extra->>'notes')"),
+    # The tag strings themselves, one per line, not the JSON text of the array
+    "tags": func.subject_tags_text(models.Subject.extra),
+}
+
+# Fields scored by strict word similarity (`<<%`, `<<<->`): the best match against a
+# run of whole words, so a query is not diluted by the other tags of a subject.
+# A query of several words can still match across two adjacent tags.
+TRGM_WORD_FIELDS = ("tags",)
+
+TRGM_DEFAULT_THRESHOLD = 0.3  # pg_trgm's own default
+
+def set_trgm_threshold(threshold: float):
+    """ Transaction-local pg_trgm thresholds, used by the `%` and `<<%` operators """
+    return select(
+        func.set_config("pg_trgm.similarity_threshold", str(threshold), True),
+        func.set_config("pg_trgm.strict_word_similarity_threshold", str(threshold), True),
+    )
+
+def trgm_match(name: str, field, term):
+    """ (match condition, distance) of `term` against TRGM_FIELDS[name] """
+    if name in TRGM_WORD_FIELDS:
+        return term.op("<<%", is_comparison=True)(field), term.op("<<<->", return_type=Float)(field)
+    return field.op("%", is_comparison=True)(term), field.op("<->", return_type=Float)(term)
+
+def trgm_search_query(query: str, limit: int):
+    """ Ranked search over TRGM_FIELDS: the top `limit` per field by `<->` distance, best field per subject """
+    term = bindparam("query", query, type_=String)
+    matches = {name: trgm_match(name, field, term) for name, field in TRGM_FIELDS.items()}
+    candidates = union_all(*[
+        select(
+            models.Subject.id.label("id"),
+            distance.label("distance"),
+            literal_column(f"'{name}'").label("matched_on"),
+        )
+        .where(condition)
+        .order_by(distance)
+        .limit(limit)
+        for name, (condition, distance) in matches.items()
+    ]).subquery()
+    best = (
+        select(candidates)
+        .distinct(candidates.c.id)
+        .order_by(candidates.c.id, candidates.c.distance)
+        .subquery()
+    )
+    return (
+        select(
+            *schema_columns(models.Subject, schemas.Subject),
+            (1 - best.c.distance).label("score"),
+            best.c.matched_on,
+        )
+        .join(best, best.c.id == models.Subject.id)
+        .order_by(best.c.distance, models.Subject.id)
+        .limit(limit)
+    )
+
+def search_subjects_by_trgm(db: Session, query: str, limit: int = 20, threshold: float = TRGM_DEFAULT_THRESHOLD):
+    """ Trigram search over subject name, notes and tags, ranked by similarity """
+    db.execute(set_trgm_threshold(threshold))
+    return db.execute(trgm_search_query(query, limit)).all()
+
+# Regex search is bounded by a per-query statement_timeout; a pattern the
+# trigram index cannot narrow down is rejected before it reaches Postgres.
+REGEX_TIMEOUT_MS = int(os.getenv("REGEX_TIMEOUT_MS", "2000"))
+REGEX_MIN_LITERAL = 3  # pg_trgm needs a run of 3 word characters to extract a trigram
+
+QUERY_CANCELED = "57014"  # SQLSTATE of a statement cancelled by statement_timeout
+INVALID_REGULAR_EXPRESSION = "2201B"
+
+REGEX_BOUND = re.compile(r"\{(\d+)(?:,(\d*))?\}")
+
+def _class_end(pattern: str, i: int) -> int:
+    """ Index after the bracket expression starting at pattern[i] == "[" """
+    i += 1
+    if pattern[i:i + 1] == "^":
+        i += 1
+    # A "]" right after "[" or "[^" is a literal member, not the end
+    if pattern[i:i + 1] == "]":
+        i += 1
+    while i < len(pattern):
+        if pattern[i] == "\\":
+            i += 2
+            continue
+        # [:alpha:], [.x.] and [=x=] may contain "]"
+        if pattern[i] == "[" and pattern[i + 1:i + 2] in (":", ".", "="):
+            close = pattern.find(pattern[i + 1] + "]", i + 2)
+            if close != -1:
+                i = close + 2
+                continue
+        if pattern[i] == "]":
+            return i + 1
+        i += 1
+    return len(pattern)
+
+def _group_end(pattern: str, i: int) -> int:
+    """ Index of the ")" closing the group that starts at pattern[i] == "(" """
+    depth = 0
+    while i < len(pattern):
+        if pattern[i] == "\\":
+            i += 2
+            continue
+        if pattern[i] == "[":
+            i = _class_end(pattern, i)
+            continue
+        if pattern[i] == "(":
+            depth += 1
+        elif pattern[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    return len(pattern)
+
+def top_level_branches(pattern: str) -> List[str]:
+    """ Split a regex on `|` outside of groups, classes and escapes """
+    branches, start, i = [], 0, 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "[":
+            i = _class_end(pattern, i)
+            continue
+        if char == "(":
+            i = _group_end(pattern, i) + 1
+            continue
+        if char == "|":
+            branches.append(pattern[start:i])
+            start = i + 1
+        i += 1
+    branches.append(pattern[start:])
+    return branches
+
+def required_literal_run(pattern: str) -> int:
+    """ Longest run of literal letters/digits that every match must contain (conservative) """
+    return min(_branch_literal_run(branch) for branch in top_level_branches(pattern))
 
-def search_subjects_by_regex(db: Session, pattern: str):
-    """ Search using PostgreSQL regex """
-    return db.query(models.Subject).filter(text("extra->>'notes' ~ :pattern")).params(pattern=pattern).all()
\ No newline at end of file
+def _branch_literal_run(branch: str) -> int:
+    longest = run = 0
+    i = 0
+    while i < len(branch):
+        char = branch[i]
+        if char == "\\":
+            # escapes are classes (\w, \d) or punctuation, never word literals
+            longest, run = max(longest, run), 0
+            i += 2
+        elif char == "[":
+            longest, run = max(longest, run), 0
+            i = _class_end(branch, i)
+        elif char == "(":
+            end = _group_end(branch, i)
+            inner = branch[i + 1:end]
+            optional = branch[end + 1:end + 2] in ("*", "?", "{")
+            # lookarounds and optional groups guarantee nothing
+            group_run = 0 if optional or inner.startswith(("?=", "?!", "?<")) else required_literal_run(inner.removeprefix("?:"))
+            longest, run = max(longest, run, group_run), 0
+            i = end + 1
+        elif char == "{":
+            # a bound {m}, {m,} or {m,n}: its digits are not literals, and the
+            # preceding atom counts only if it is a plain character required at least once
+            bound = REGEX_BOUND.match(branch, i)
+            if bound is not None and int(bound.group(1)) == 0:
+                run = max(run - 1, 0)
+            longest, run = max(longest, run), 0
+            i = bound.end() if bound is not None else i + 1
+        else:
+            if char in "*?":
+                run = max(run - 1, 0)  # the preceding character is optional
+                longest, run = max(longest, run), 0
+            elif char == "+":
+                longest, run = max(longest, run), 0
+            elif char.isalnum() or char == "_":
+                run += 1
+            else:
+                longest, run = max(longest, run), 0
+            i += 1
+    return max(longest, run)
+
+def regex_is_indexable(pattern: str) -> bool:
+    """ True when every alternative has a literal run the trigram index can extract trigrams from """
+    return required_literal_run(pattern) >= REGEX_MIN_LITERAL
+
+def sqlstate(error: DBAPIError) -> Optional[str]:
+    """ SQLSTATE of a driver error (psycopg2: pgcode, asyncpg: sqlstate) """
+    return getattr(error.orig, "pgcode", None) or getattr(error.orig, "sqlstate", None)
+
+def is_statement_timeout(error: DBAPIError) -> bool:
+    return sqlstate(error) == QUERY_CANCELED
+
+def set_statement_timeout(timeout_ms: int):
+    """ Transaction-local statement_timeout for the queries that follow """
+    return select(func.set_config("statement_timeout", f"{int(timeout_ms)}ms", True))
+
+def regex_search_query(pattern: str, case_insensitive: bool = False):
+    # ~ and ~* are both served by the pg_trgm index on extra->>'notes'
+    operator = "~*" if case_insensitive else "~"
+    return select(models.Subject).where(
+        literal_column("(extra->>'notes')").op(operator, is_comparison=True)(bindparam("pattern", pattern, type_=String))
+    )
+
+def search_subjects_by_regex(db: Session, pattern: str, skip: int = 0, limit: int = 50,
+                             after_id: Optional[int] = None, case_insensitive: bool = False,
+                             timeout_ms: int = REGEX_TIMEOUT_MS):
+    """ Search using PostgreSQL regex, paged and bounded by statement_timeout """
+    db.execute(set_statement_timeout(timeout_ms))
+    stmt = paginate(regex_search_query(pattern, case_insensitive), models.Subject, skip, limit, after_id)
+    return db.scalars(stmt).all()
+
+def extra_contains_query(document: dict):
+    """ Subjects whose `extra` contains `document` (JSONB @>, served by ix_subjects_extra_path_ops) """
+    return select(models.Subject).where(
+        models.Subject.extra.op("@>", is_comparison=True)(bindparam("document", document, type_=JSONB))
+    )
+
+def get_subjects_by_extra(db: Session, document: dict, skip: int, limit: int, after_id: Optional[int] = None):
+    return db.scalars(paginate(extra_contains_query(document), models.Subject, skip, limit, after_id)).all()
+
+def get_subjects_by_tags(db: Session, tags: List[str], skip: int, limit: int, after_id: Optional[int] = None):
+    """ Subjects tagged with all of `tags` """
+    return get_subjects_by_extra(db, {"tags": tags}, skip, limit, after_id)
+
+# Full-text search over subjects.search_vector (name weighted above notes, migration 0007)
+FTS_CONFIG = literal_column("'english'::regconfig")
+FTS_HEADLINE_OPTIONS = "MaxFragments=2, MinWords=5, MaxWords=20, StartSel=<b>, StopSel=</b>"
+
+def fts_search_query(query: str, skip: int, limit: int, after: Optional[Tuple[float, int]] = None):
+    """ Matches of websearch_to_tsquery(query), best ts_rank first; snippets only for the returned page
+
+    Pages are ordered by (rank, id) descending; `after` is that pair for the
+    last row of the previous page (keyset), otherwise `skip` rows are skipped.
+    """
+    tsquery = func.websearch_to_tsquery(FTS_CONFIG, bindparam("query", query, type_=String))
+    ranked = (
+        # float8, so the rank in a cursor round-trips exactly (ts_rank returns float4)
+        select(models.Subject.id, cast(func.ts_rank(models.Subject.search_vector, tsquery), Float).label("rank"))
+        .where(models.Subject.search_vector.op("@@", is_comparison=True)(tsquery))
+        .subquery()
+    )
+    page = select(ranked.c.id, ranked.c.rank)
+    if after is not None:
+        page = page.where(tuple_(ranked.c.rank, ranked.c.id) < tuple_(*after))
+    else:
+        page = page.offset(skip)
+    page = page.order_by(ranked.c.rank.desc(), ranked.c.id.desc()).limit(limit).subquery()
+    notes = func.coalesce(TRGM_FIELDS["notes"], "")
+    return (
+        select(
+            *schema_columns(models.Subject, schemas.Subject),
+            page.c.rank,
+            func.ts_headline(FTS_CONFIG, notes, tsquery, FTS_HEADLINE_OPTIONS).label("snippet"),
+        )
+        .join(page, page.c.id == models.Subject.id)
+        .order_by(page.c.rank.desc(), page.c.id.desc())
+    )
+
+def search_subjects_by_fts(db: Session, query: str, skip: int = 0, limit: int = 20,
+                           after: Optional[Tuple[float, int]] = None):
+    """ Full-text search (stemming, phrases, OR, -exclusion) ranked by ts_rank """
+    return db.execute(fts_search_query(query, skip, limit, after)).all()
+
+# --- Schedules and double-booking ---
+# Served by the (owner, session_date, id) indexes of migration 0009: a schedule is an
+# index range scan in output order, and conflicts group the index entries without
+# visiting the table. Date bounds also prune the yearly partitions of `sessions`.
+
+SCHEDULE_OWNERS = {
+    "teacher": models.Session.teacher_id,
+    "group": models.Session.group_id,
+    "subject": models.Session.subject_id,
+}
+CONFLICT_KINDS = ("teacher", "group")
+
+def filter_dates(stmt, date_from: Optional[date], date_to: Optional[date]):
+    if date_from:
+        stmt = stmt.where(models.Session.session_date >= date_from)
+    if date_to:
+        stmt = stmt.where(models.Session.session_date <= date_to)
+    return stmt
+
+def schedule_query(owner: str, owner_id: int, date_from: Optional[date] = None, date_to: Optional[date] = None,
+                   limit: int = 100, after: Optional[Tuple[date, int]] = None):
+    """ Sessions of one teacher, group or subject by (date, id), with group code, subject and teacher names """
+    stmt = (
+        select(
+            models.Session.id,
+            models.Session.session_date,
+            models.Session.control_type,
+            models.Session.group_id,
+            models.Group.code.label("group_code"),
+            models.Session.subject_id,
+            models.Subject.name.label("subject_name"),
+            models.Session.teacher_id,
+            models.Teacher.name.label("teacher_name"),
+        )
+        .join(models.Group, models.Group.id == models.Session.group_id)
+        .join(models.Subject, models.Subject.id == models.Session.subject_id)
+        .join(models.Teacher, models.Teacher.id == models.Session.teacher_id)
+        .where(SCHEDULE_OWNERS[owner] == owner_id)
+    )
+    stmt = filter_dates(stmt, date_from, date_to)
+    if after is not None:
+        stmt = stmt.where(tuple_(models.Session.session_date, models.Session.id) > tuple_(*after))
+    return stmt.order_by(models.Session.session_date, models.Session.id).limit(limit)
+
+def get_schedule(db: Session, owner: str, owner_id: int, date_from: Optional[date] = None,
+                 date_to: Optional[date] = None, limit: int = 100, after: Optional[Tuple[date, int]] = None):
+    return db.execute(schedule_query(owner, owner_id, date_from, date_to, limit, after)).all()
+
+def conflicts_query(kind: str, date_from: Optional[date] = None, date_to: Optional[date] = None,
+                    limit: int = 100, after: Optional[Tuple[int, date]] = None):
+    """ Teachers or groups with more than one session on the same date, one row per (owner, date) """
+    owner = SCHEDULE_OWNERS[kind]
+    stmt = (
+        select(
+            owner.label("owner_id"),
+            models.Session.session_date,
+            func.count().label("session_count"),
+            func.array_agg(aggregate_order_by(models.Session.id, models.Session.id)).label("session_ids"),
+        )
+        .group_by(owner, models.Session.session_date)
+        .having(func.count() > 1)
+    )
+    stmt = filter_dates(stmt, date_from, date_to)
+    if after is not None:
+        stmt = stmt.where(tuple_(owner, models.Session.session_date) > tuple_(*after))
+    return stmt.order_by(owner, models.Session.session_date).limit(limit)
+
+def get_conflicts(db: Session, kind: str, date_from: Optional[date] = None, date_to: Optional[date] = None,
+                  limit: int = 100, after: Optional[Tuple[int, date]] = None):
+    return db.execute(conflicts_query(kind, date_from, date_to, limit, after)).all()
+
+# --- Plain-row Queries (SERIALIZATION=fast) ---
+# Same pages as the ORM getters above, as dicts built straight from column tuples.
+
+# Nested relations of the *Details schemas: name -> (related model, read schema)
+DETAILS_RELATIONS = {
+    models.Session: {
+        "group": (models.Group, schemas.Group),
+        "subject": (models.Subject, schemas.Subject),
+        "teacher": (models.Teacher, schemas.Teacher),
+    },
+    models.Group: {"faculty": (models.Faculty, schemas.Faculty)},
+    models.Subject: {"department": (models.Department, schemas.Department)},
+}
+
+def parse_fields(model, schema, fields: str, nested: bool = False) -> Tuple[list, Dict[str, list]]:
+    """ Parse a `fields=` list ("id,code,faculty.name") into (columns of `model`, {relation: its columns})
+
+    A relation name alone selects all of its fields and `relation.field` only
+    that one; relations that are not named are not joined. `id` is always
+    selected, since it carries the cursor. Raises ValueError on unknown fields.
+    """
+    relations = DETAILS_RELATIONS[model] if nested else {}
+    columns, nested_columns = [model.__table__.c.id], {}
+    for field in (f.strip() for f in fields.split(",")):
+        if not field:
+            continue
+        name, _, inner = field.partition(".")
+        if name in relations:
+            related, related_schema = relations[name]
+            available = schema_columns(related, related_schema)
+            selected = nested_columns.setdefault(name, [])
+            chosen = [c for c in available if c.name == inner] if inner else available
+            if not chosen:
+                raise ValueError(f"Unknown field `{field}`.")
+            selected.extend(c for c in chosen if c not in selected)
+        elif not inner and name in schema.model_fields and name in model.__table__.c:
+            if model.__table__.c[name] not in columns:
+                columns.append(model.__table__.c[name])
+        else:
+            raise ValueError(f"Unknown field `{field}`.")
+    return columns, nested_columns
+
+def all_fields(model, schema, nested: bool = False) -> Tuple[list, Dict[str, list]]:
+    """ The parse_fields result for every field of the read schema (and of each relation when `nested`) """
+    relations = DETAILS_RELATIONS[model] if nested else {}
+    return schema_columns(model, schema), {
+        name: schema_columns(related, related_schema) for name, (related, related_schema) in relations.items()
+    }
+
+def get_all_rows(
+    db: Session, model, schema, skip: int, limit: int,
+    after_id: Optional[int] = None, ids: Optional[List[int]] = None, fields: Optional[tuple] = None,
+) -> list:
+    """ Rows of `model`, restricted to the columns of `fields` (see parse_fields) when given """
+    columns, _ = fields or all_fields(model, schema)
+    return rows_to_dicts(db.execute(paginate(select(*columns), model, skip, limit, after_id, ids)))
+
+def get_details_rows(
+    db: Session, model, schema, skip: int, limit: int,
+    after_id: Optional[int] = None, ids: Optional[List[int]] = None, fields: Optional[tuple] = None,
+) -> list:
+    """ Rows of `model` with each relation of DETAILS_RELATIONS nested: reference tables
+    from the in-memory snapshot (app/reference.py), the others joined in.
+    With `fields` (see parse_fields) only the named relations are nested, with their named columns. """
+    columns, relations = fields or all_fields(model, schema, nested=True)
+    stmt = select(*columns)
+    from_snapshot = {}
+    for name, related_columns in relations.items():
+        related = DETAILS_RELATIONS[model][name][0]
+        if reference.covers(related):
+            from_snapshot[name] = (related, [c.name for c in related_columns])
+            if model.__table__.c[f"{name}_id"] not in columns:
+                stmt = stmt.add_columns(model.__table__.c[f"{name}_id"])
+            continue
+        stmt = stmt.add_columns(
+            *[column.label(f"{name}{NESTED_SEPARATOR}{column.name}") for column in related_columns]
+        ).join(related, related.id == getattr(model, f"{name}_id"))
+    rows = rows_to_dicts(db.execute(paginate(stmt, model, skip, limit, after_id, ids)))
+    for name, (related, names) in from_snapshot.items():
+        key = f"{name}_id"
+        resolved = reference.resolve(db, related, {row[key] for row in rows})
+        selected = model.__table__.c[key] in columns
+        nested = []
+        for row in rows:
+            found = resolved.get(row[key] if selected else row.pop(key))
+            # No related row (a NULL or dangling id): left out, as the join would leave it out
+            if found is not None:
+                row[name] = found if len(names) == len(found) else {n: found[n] for n in names}
+                nested.append(row)
+        rows = nested
+    return rows
+
+def search_groups_rows(db: Session, faculty_id, min_students, sort_by, skip, limit, after=None) -> list:
+    columns = tuple(schema_columns(models.Group, schemas.Group))
+    stmt, params = search_groups_statement(columns, faculty_id, min_students, sort_by, skip, limit, after)
+    return rows_to_dicts(db.execute(stmt, params))
+
+
+# --- Export Queries (plain column selects, streamed by app/export.py) ---
+
+def schema_columns(model, schema) -> list:
+    """ Table columns of `model` for the fields exposed by the read `schema`, in schema order """
+    return [model.__table__.c[name] for name in schema.model_fields if name in model.__table__.c]
+
+def export_query(model, schema):
+    return select(*schema_columns(model, schema)).order_by(model.id)
+
+def session_export_query(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    group_id: Optional[int] = None,
+    teacher_id: Optional[int] = None,
+    control_type: Optional[str] = None,
+    details: bool = False,
+):
+    """ Sessions ordered by id, optionally joined with group code, subject name and teacher name """
+    stmt = export_query(models.Session, schemas.Session)
+    if details:
+        stmt = (
+            stmt.add_columns(
+                models.Group.code.label("group_code"),
+                models.Group.course.label("group_course"),
+                models.Subject.name.label("subject_name"),
+                models.Teacher.name.label("teacher_name"),
+            )
+            .join(models.Group, models.Group.id == models.Session.group_id)
+            .join(models.Subject, models.Subject.id == models.Session.subject_id)
+            .join(models.Teacher, models.Teacher.id == models.Session.teacher_id)
+        )
+    stmt = filter_dates(stmt, date_from, date_to)
+    if group_id:
+        stmt = stmt.where(models.Session.group_id == group_id)
+    if teacher_id:
+        stmt = stmt.where(models.Session.teacher_id == teacher_id)
+    if control_type:
+        stmt = stmt.where(models.Session.control_type == control_type)
+    return stmt
@@ -0,0 +1,223 @@
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from sqlalchemy import select, text, update
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import models, reference, schemas
+from .crud import (
+    DETAILS_RELATIONS,
+    REGEX_TIMEOUT_MS,
+    SESSION_DETAILS_OPTIONS,
+    TRGM_DEFAULT_THRESHOLD,
+    UNIQUE_FIELDS,
+    by_field_statement,
+    conflicts_query,
+    existing_ids,
+    extra_contains_query,
+    fts_search_query,
+    get_all_rows,
+    get_details_rows,
+    insert_statement,
+    match_bulk_created,
+    paginate,
+    regex_search_query,
+    schedule_query,
+    schema_columns,
+    search_groups_statement,
+    set_statement_timeout,
+    set_trgm_threshold,
+    trgm_search_query,
+    validate_bulk,
+)
+from .serialization import rows_to_dicts
+
+# Async counterparts of the functions in crud.py, used when DB_ASYNC=1.
+# Relationships are never lazy-loaded here (that would need IO on attribute
+# access), so every nested response is eager-loaded up front.
+
+# --- Generic CRUD Functions ---
+
+async def get_by_id(db: AsyncSession, model, id: int):
+    return await db.get(model, id)
+
+async def get_all(db: AsyncSession, model, skip: int, limit: int, after_id: Optional[int] = None, ids: Optional[List[int]] = None):
+    result = await db.scalars(paginate(select(model), model, skip, limit, after_id, ids))
+    return result.all()
+
+async def create(db: AsyncSession, model, schema, upsert: bool = False):
+    """ See crud.create """
+    stmt = insert_statement(model, UNIQUE_FIELDS.get(model), upsert).values(**schema.dict())
+    try:
+        result = await db.execute(stmt)
+        created = result.mappings().first()
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise
+    reference.written(model)
+    return created
+
+async def create_bulk(
+    db: AsyncSession,
+    model,
+    schemas_in: list,
+    unique_field: Optional[str] = None,
+    foreign_keys: Optional[Dict[str, Any]] = None,
+    upsert: bool = False,
+):
+    """ See crud.create_bulk """
+    rows = [item.dict() for item in schemas_in]
+    taken = set()
+    if unique_field and not upsert:
+        column = getattr(model, unique_field)
+        taken = set(await db.scalars(select(column).where(column.in_({row[unique_field] for row in rows}))))
+    found = {}
+    for field, parent in (foreign_keys or {}).items():
+        await reference.refresh_async(parent)
+        found[field] = await db.run_sync(existing_ids, parent, {row[field] for row in rows})
+    errors = validate_bulk(model, rows, unique_field, taken, foreign_keys or {}, found)
+    valid = [i for i in range(len(rows)) if i not in errors]
+    if not valid:
+        return [], sorted(errors.items())
+
+    result = await db.execute(insert_statement(model, unique_field, upsert), [rows[i] for i in valid])
+    inserted = result.mappings().all()
+    await db.commit()
+    reference.written(model)
+    created = match_bulk_created(model, rows, valid, inserted, unique_field, errors)
+    return created, sorted(errors.items())
+
+# --- Specific Getters for Duplicate Checks ---
+
+async def get_faculty_by_name(db: AsyncSession, name: str):
+    return await db.scalar(by_field_statement(models.Faculty, "name"), {"value": name})
+
+async def get_group_by_code(db: AsyncSession, code: str):
+    return await db.scalar(by_field_statement(models.Group, "code"), {"value": code})
+
+async def get_department_by_name(db: AsyncSession, name: str):
+    return await db.scalar(by_field_statement(models.Department, "name"), {"value": name})
+
+async def get_subject_by_name(db: AsyncSession, name: str):
+    return await db.scalar(by_field_statement(models.Subject, "name"), {"value": name})
+
+async def get_teacher_by_name(db: AsyncSession, name: str):
+    return await db.scalar(by_field_statement(models.Teacher, "name"), {"value": name})
+
+
+# --- Complex Queries ---
+
+async def search_groups(
+    db: AsyncSession,
+    faculty_id: Optional[int],
+    min_students: int,
+    sort_by: Optional[str],
+    skip: int,
+    limit: int,
+    after: Optional[Tuple[Any, ...]] = None,
+):
+    stmt, params = search_groups_statement((models.Group,), faculty_id, min_students, sort_by, skip, limit, after)
+    result = await db.scalars(stmt, params)
+    return result.all()
+
+async def search_groups_rows(db: AsyncSession, faculty_id, min_students, sort_by, skip, limit, after=None) -> list:
+    columns = tuple(schema_columns(models.Group, schemas.Group))
+    stmt, params = search_groups_statement(columns, faculty_id, min_students, sort_by, skip, limit, after)
+    return rows_to_dicts(await db.execute(stmt, params))
+
+# With the reference snapshot the details pages are plain rows, built by
+# crud.get_details_rows on the session's sync facade (run_sync). The snapshot
+# tables are refreshed first, so run_sync never reloads them on the event loop.
+
+async def get_details_rows_async(db: AsyncSession, model, schema, *args):
+    await reference.refresh_async(*(related for related, _ in DETAILS_RELATIONS[model].values()))
+    return await db.run_sync(get_details_rows, model, schema, *args)
+
+async def get_session_details(db: AsyncSession, skip: int, limit: int, after_id: Optional[int] = None, ids: Optional[List[int]] = None):
+    if reference.REFERENCE_SNAPSHOT:
+        return await get_details_rows_async(db, models.Session, schemas.Session, skip, limit, after_id, ids)
+    stmt = select(models.Session).options(*SESSION_DETAILS_OPTIONS)
+    result = await db.scalars(paginate(stmt, models.Session, skip, limit, after_id, ids))
+    return result.all()
+
+async def get_group_details(db: AsyncSession, skip: int, limit: int, after_id: Optional[int] = None, ids: Optional[List[int]] = None):
+    if reference.REFERENCE_SNAPSHOT:
+        return await get_details_rows_async(db, models.Group, schemas.Group, skip, limit, after_id, ids)
+    stmt = select(models.Group).options(joinedload(models.Group.faculty))
+    result = await db.scalars(paginate(stmt, models.Group, skip, limit, after_id, ids))
+    return result.all()
+
+async def get_subject_details(db: AsyncSession, skip: int, limit: int, after_id: Optional[int] = None, ids: Optional[List[int]] = None):
+    if reference.REFERENCE_SNAPSHOT:
+        return await get_details_rows_async(db, models.Subject, schemas.Subject, skip, limit, after_id, ids)
+    stmt = select(models.Subject).options(joinedload(models.Subject.department))
+    result = await db.scalars(paginate(stmt, models.Subject, skip, limit, after_id, ids))
+    return result.all()
+
+async def get_fields_rows(db: AsyncSession, model, schema, fields: Optional[tuple], skip: int, limit: int,
+                          after_id: Optional[int] = None, ids: Optional[List[int]] = None, nested: bool = False):
+    """ Plain rows built by crud.get_all_rows / get_details_rows, narrowed to `fields` (crud.parse_fields) when given """
+    if nested:
+        return await get_details_rows_async(db, model, schema, skip, limit, after_id, ids, fields)
+    return await db.run_sync(get_all_rows, model, schema, skip, limit, after_id, ids, fields)
+
+async def promote_groups(db: AsyncSession, current_course: int):
+    stmt = (
+        update(models.Group)
+        .where(models.Group.course == current_course)
+        .values(course=models.Group.course + 1)
+    )
+    result = await db.execute(stmt)
+    await db.commit()
+    return result.rowcount
+
+async def get_students_per_faculty(db: AsyncSession):
+    stmt = (
+        select(
+            models.Faculty.name.label("faculty_name"),
+            models.FacultyStat.total_students.label("total_students"),
+            models.FacultyStat.updated_at.label("freshness"),
+        )
+        .join(models.FacultyStat, models.Faculty.id == models.FacultyStat.faculty_id)
+        .where(models.FacultyStat.group_count > 0)
+    )
+    result = await db.execute(stmt)
+    return result.all()
+
+async def search_subjects_by_trgm(db: AsyncSession, query: str, limit: int = 20,
+                                  threshold: float = TRGM_DEFAULT_THRESHOLD):
+    await db.execute(set_trgm_threshold(threshold))
+    result = await db.execute(trgm_search_query(query, limit))
+    return result.all()
+
+async def search_subjects_by_regex(db: AsyncSession, pattern: str, skip: int = 0, limit: int = 50,
+                                   after_id: Optional[int] = None, case_insensitive: bool = False,
+                                   timeout_ms: int = REGEX_TIMEOUT_MS):
+    await db.execute(set_statement_timeout(timeout_ms))
+    stmt = paginate(regex_search_query(pattern, case_insensitive), models.Subject, skip, limit, after_id)
+    result = await db.scalars(stmt)
+    return result.all()
+
+async def get_subjects_by_extra(db: AsyncSession, document: dict, skip: int, limit: int, after_id: Optional[int] = None):
+    result = await db.scalars(paginate(extra_contains_query(document), models.Subject, skip, limit, after_id))
+    return result.all()
+
+async def get_subjects_by_tags(db: AsyncSession, tags: List[str], skip: int, limit: int, after_id: Optional[int] = None):
+    return await get_subjects_by_extra(db, {"tags": tags}, skip, limit, after_id)
+
+async def search_subjects_by_fts(db: AsyncSession, query: str, skip: int = 0, limit: int = 20,
+                                 after: Optional[Tuple[float, int]] = None):
+    result = await db.execute(fts_search_query(query, skip, limit, after))
+    return result.all()
+
+async def get_schedule(db: AsyncSession, owner: str, owner_id: int, date_from: Optional[date] = None,
+                       date_to: Optional[date] = None, limit: int = 100, after: Optional[Tuple[date, int]] = None):
+    result = await db.execute(schedule_query(owner, owner_id, date_from, date_to, limit, after))
+    return result.all()
+
+async def get_conflicts(db: AsyncSession, kind: str, date_from: Optional[date] = None, date_to: Optional[date] = None,
+                        limit: int = 100, after: Optional[Tuple[int, date]] = None):
+    result = await db.execute(conflicts_query(kind, date_from, date_to, limit, after))
+    return result.all()
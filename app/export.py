@@ -0,0 +1,57 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from .database import engine, read_replicas
+
+# --- Streaming export of plain rows as NDJSON or CSV ---
+#
+# Rows are read through a server-side cursor (stream_results) in partitions of
+# EXPORT_CHUNK_SIZE, converted straight from column tuples (no ORM objects or
+# Pydantic models) and yielded one chunk at a time, so memory stays constant
+# whatever the table size.
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+def json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+def csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=json_default)
+    return value
+
+def stream_rows(stmt, fmt: str, chunk_size: int = EXPORT_CHUNK_SIZE, use_replica: bool = False):
+    """Yield the result of `stmt` encoded as `fmt`, one chunk of rows per item.
+
+    The generator opens its own connection (on a read replica when `use_replica`
+    and one is up), since it outlives the request's dependencies while the
+    response is being streamed.
+    """
+    conn = read_replicas.connect() if use_replica and read_replicas else None
+    with conn if conn is not None else engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(stmt)
+        keys = list(result.keys())
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(keys)
+            for rows in result.partitions(chunk_size):
+                writer.writerows([csv_value(value) for value in row] for row in rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+        else:
+            dumps = json.JSONEncoder(default=json_default, separators=(",", ":")).encode
+            for rows in result.partitions(chunk_size):
+                yield "".join(dumps(dict(zip(keys, row))) + "\n" for row in rows)
@@ -0,0 +1,218 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+from .metrics import route_metrics
+
+# --- Per-request instrumentation ---
+#
+# InstrumentationMiddleware opens a RequestStats for every HTTP request and
+# keeps it in a context variable. The SQLAlchemy cursor hooks add each
+# statement's execution time to it, and InstrumentedRoute splits the rest of
+# the request into:
+#   threadpool - waiting for a worker thread (sync dependencies and endpoints)
+#   app        - running the endpoint itself (its SQL included)
+#   serialize  - response_model validation and JSON encoding after the endpoint returns
+# The figures are returned in a Server-Timing header and recorded per route for
+# GET /metrics. Statements slower than SLOW_QUERY_MS are logged to the
+# "app.slow_query" logger with their parameters and EXPLAIN plan.
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))  # negative disables the slow-query log
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "1").lower() in ("1", "true", "yes")
+
+slow_query_logger = logging.getLogger("app.slow_query")
+
+EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "INSERT", "DELETE")
+
+
+class RequestStats:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.statements = 0
+        self.db_ms = 0.0
+        self.threadpool_ms = 0.0
+        self.app_ms = 0.0
+        self.serialize_ms = 0.0
+        # Last moment the event loop handed work to a worker thread
+        self.handoff = None
+        self.endpoint_end = None
+
+    def server_timing(self) -> str:
+        total = (time.perf_counter() - self.start) * 1000
+        return ", ".join([
+            f'db;dur={self.db_ms:.2f};desc="{self.statements} statements"',
+            f"threadpool;dur={self.threadpool_ms:.2f}",
+            f"app;dur={self.app_ms:.2f}",
+            f"serialize;dur={self.serialize_ms:.2f}",
+            f"total;dur={total:.2f}",
+        ])
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def enter_worker():
+    """Call first thing in code running in the threadpool: records how long it waited for a thread."""
+    stats = current_request.get()
+    if stats is not None and stats.handoff is not None:
+        stats.threadpool_ms += (time.perf_counter() - stats.handoff) * 1000
+        stats.handoff = None
+
+def leave_worker():
+    """Call when code in the threadpool hands control back, e.g. right before a dependency yields."""
+    stats = current_request.get()
+    if stats is not None:
+        stats.handoff = time.perf_counter()
+
+
+# --- SQLAlchemy hooks ---
+
+# The start time lives on the execution context, not the connection: a failed
+# statement never reaches after_cursor_execute and would leave it behind
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_query_start", None)
+    if start is None:
+        return
+    elapsed = (time.perf_counter() - start) * 1000
+    stats = current_request.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_ms += elapsed
+    if 0 <= SLOW_QUERY_MS <= elapsed:
+        # The compiled SQL, not the EXECUTE of a prepared statement (see statements.py)
+        log_slow_query(conn, context.statement if context is not None else statement, parameters, elapsed, executemany)
+
+def log_slow_query(conn, statement: str, parameters, elapsed_ms: float, executemany: bool):
+    plan = None
+    if SLOW_QUERY_EXPLAIN and not executemany and conn.dialect.name == "postgresql" \
+            and statement.lstrip().upper().startswith(EXPLAINABLE):
+        try:
+            cursor = conn.connection.cursor()
+            try:
+                cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+                plan = cursor.fetchone()[0]
+            finally:
+                cursor.close()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+        except Exception as e:  # never fail the request because of the log
+            plan = f"EXPLAIN failed: {e}"
+    slow_query_logger.warning(
+        "slow query (%.1f ms): %s | params: %r | plan: %s",
+        elapsed_ms, " ".join(statement.split()), parameters, json.dumps(plan, default=str),
+    )
+
+def instrument_queries(engine):
+    """Attach the statement timing hooks to a (sync or async) engine."""
+    target = getattr(engine, "sync_engine", engine)
+    event.listen(target, "before_cursor_execute", _before_cursor_execute)
+    event.listen(target, "after_cursor_execute", _after_cursor_execute)
+
+
+# --- Routes ---
+
+def _instrument_endpoint(endpoint):
+    """Wrap an endpoint to time it; the signature is kept (via __wrapped__) for dependency injection."""
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            stats = current_request.get()
+            start = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                if stats is not None:
+                    stats.endpoint_end = time.perf_counter()
+                    stats.app_ms += (stats.endpoint_end - start) * 1000
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            enter_worker()
+            stats = current_request.get()
+            start = time.perf_counter()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                if stats is not None:
+                    stats.endpoint_end = time.perf_counter()
+                    stats.app_ms += (stats.endpoint_end - start) * 1000
+    return wrapper
+
+
+class InstrumentedRoute(APIRoute):
+    """APIRoute that attributes request time to the endpoint, the threadpool and serialization."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _instrument_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def instrumented_handler(request):
+            stats = current_request.get()
+            if stats is None:
+                return await handler(request)
+            stats.handoff = time.perf_counter()
+            response = await handler(request)
+            if stats.endpoint_end is not None:
+                stats.serialize_ms = (time.perf_counter() - stats.endpoint_end) * 1000
+            return response
+
+        return instrumented_handler
+
+
+# --- Middleware ---
+
+class InstrumentationMiddleware:
+    """Pure ASGI middleware: adds Server-Timing to every response and records per-route metrics."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+        duration_ms = None
+
+        async def send_with_timing(message):
+            nonlocal status, duration_ms
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                duration_ms = (time.perf_counter() - stats.start) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                label = route.path
+            else:
+                # Answered before routing (a cache hit: a fixed path) or not found
+                label = scope["path"] if status != 404 else "<unmatched>"
+            route_metrics(scope["method"], label).record(
+                status,
+                duration_ms if duration_ms is not None else (time.perf_counter() - stats.start) * 1000,
+                stats.db_ms,
+                stats.statements,
+            )
@@ -1,18 +1,49 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, Query
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from contextlib import asynccontextmanager
+from datetime import date
+import json
 from typing import List, Optional
 
-from . import crud, models, schemas
-from .database import get_db
+from . import crud, crud_async, models, promotion, reference, schemas, statements
+from .cache import CacheMiddleware
+from .database import DB_ASYNC, POOL_OPTIONS, get_async_db, get_async_read_db, get_db, get_read_db
+from .export import EXPORT_FORMATS, stream_rows
+from .serialization import FAST_SERIALIZATION, FastJSONResponse
+from .instrumentation import InstrumentationMiddleware, InstrumentedRoute
+from .metrics import pool_stats, prometheus_text
+from .pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from .replicas import REPLICA_URLS, ReadYourWritesMiddleware, wants_primary
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Per-worker snapshot of the reference tables, kept current via LISTEN/NOTIFY
+    await run_in_threadpool(reference.start)
+    yield
+    reference.stop()
 
 app = FastAPI(
     title="University Session API",
     description="A refactored API for managing university entities, fulfilling all project requirements.",
     version="1.0.0",
+    lifespan=lifespan,
 )
+app.add_middleware(CacheMiddleware)
+if REPLICA_URLS:
+    app.add_middleware(ReadYourWritesMiddleware)
+# Outermost, so cached responses are timed too and the Server-Timing header survives the cache
+app.add_middleware(InstrumentationMiddleware)
+app.router.route_class = InstrumentedRoute
 
 # --- Routers ---
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
+# With DB_ASYNC=1 the async versions of the endpoints below are registered first
+# and take precedence; routes without an async version still use `router`.
+async_router = APIRouter(route_class=InstrumentedRoute)
 
 # --- Root ---
 @app.get("/")
@@ -21,103 +52,373 @@ def read_root():
 
 # --- CRUD Endpoints ---
 
-# Helper function to check for duplicates
-def check_duplicate(db: Session, entity_name: str, field: str, value: str):
-    getter = getattr(crud, f"get_{entity_name.lower()}_by_{field}")
-    if getter(db, value):
-        raise HTTPException(status_code=400, detail=f"{entity_name} with this {field} already exists.")
+# Helpers for creates. A create is one INSERT ... ON CONFLICT ... RETURNING: the
+# database enforces the natural key (409) and the foreign keys (404), so there are
+# no SELECTs before the insert and no race between check and insert.
+UPSERT = Query(False, description="Update the existing row with the same natural key instead of answering 409")
+
+def already_exists(model) -> HTTPException:
+    field = crud.UNIQUE_FIELDS.get(model, "value")
+    return HTTPException(status_code=409, detail=f"{model.__name__} with this {field} already exists.")
+
+def create_error(error: IntegrityError, model) -> Optional[HTTPException]:
+    parent = crud.violated_foreign_key(error, model)
+    if parent is not None:
+        return HTTPException(status_code=404, detail=f"{parent} not found")
+    if crud.sqlstate(error) == crud.UNIQUE_VIOLATION:
+        return already_exists(model)
+    return None
+
+def create_entity(db: Session, model, item, upsert: bool = False):
+    try:
+        created = crud.create(db, model, item, upsert)
+    except IntegrityError as e:
+        raise create_error(e, model) or e
+    if created is None:
+        raise already_exists(model)
+    return created
+
+# Helpers for keyset (cursor) pagination.
+# List routes accept either `cursor` (opaque, from the X-Next-Cursor header of the
+# previous page) or `after_id` to seek past a row instead of using OFFSET.
+def keyset_position(cursor: Optional[str], after_id: Optional[int] = None, size: int = 1):
+    if cursor is not None:
+        try:
+            position = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+        if len(position) != size:
+            raise HTTPException(status_code=400, detail="Cursor does not match this query.")
+        return position
+    if after_id is not None:
+        if size != 1:
+            raise HTTPException(status_code=400, detail="after_id cannot be combined with sort_by; use cursor.")
+        return [after_id]
+    return None
+
+def keyset_after_id(cursor: Optional[str], after_id: Optional[int]) -> Optional[int]:
+    position = keyset_position(cursor, after_id)
+    if position is None:
+        return None
+    if not isinstance(position[0], int):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    return position[0]
+
+def set_next_cursor(response: Response, items: list, limit: int, *values):
+    """Expose the cursor of the next page when this page is full."""
+    if items and len(items) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*values)
+
+def list_page(response: Response, items: list, limit: int):
+    if items:
+        # ORM objects, or plain rows (details pages built with the reference snapshot)
+        last = items[-1]
+        set_next_cursor(response, items, limit, last["id"] if isinstance(last, dict) else last.id)
+    return items
+
+# Helpers for the fast serialization path (SERIALIZATION=fast): rows are plain dicts
+# and the page is returned as an already encoded response.
+def fast_page(rows: list, limit: int, *cursor_values):
+    response = FastJSONResponse(rows)
+    if rows:
+        set_next_cursor(response, rows, limit, *(cursor_values or (rows[-1]["id"],)))
+    return response
+
+# Helpers for sparse fieldsets and batch lookups on the list and details routes.
+# `fields=id,code` selects only those columns (and, on details routes, only the
+# named relations are joined: `fields=id,group.code,teacher`); the rows are
+# returned as plain JSON, not validated against the full response model.
+# `ids=1,2,3` fetches those rows with one WHERE id = ANY(:ids) query instead of a page.
+MAX_IDS = 1000
+FIELDS = Query(None, description="Comma-separated fields to return, e.g. `id,code`; `relation` or `relation.field` on details routes")
+IDS = Query(None, description=f"Comma-separated ids to fetch in one query instead of a page (at most {MAX_IDS})")
+
+def parse_ids(ids: Optional[str]) -> Optional[List[int]]:
+    if ids is None:
+        return None
+    try:
+        values = sorted({int(value) for value in ids.split(",") if value.strip()})
+    except ValueError:
+        raise HTTPException(status_code=400, detail="`ids` must be comma-separated integers.")
+    if len(values) > MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_IDS} ids per request.")
+    return values
+
+def parse_fields(model, schema, fields: Optional[str], nested: bool = False) -> Optional[tuple]:
+    if fields is None:
+        return None
+    try:
+        return crud.parse_fields(model, schema, fields, nested)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def page_limit(limit: int, ids: Optional[List[int]]) -> Optional[int]:
+    """The limit that decides whether there is a next page; a batch lookup has none."""
+    return limit if ids is None else None
+
+def read_page(response: Response, db: Session, model, schema, skip: int, limit: int, cursor, after_id,
+              ids: Optional[str] = None, fields: Optional[str] = None):
+    after_id, ids = keyset_after_id(cursor, after_id), parse_ids(ids)
+    fieldset = parse_fields(model, schema, fields)
+    if FAST_SERIALIZATION or fieldset is not None:
+        return fast_page(crud.get_all_rows(db, model, schema, skip, limit, after_id, ids, fieldset), page_limit(limit, ids))
+    return list_page(response, crud.get_all(db, model, skip, limit, after_id, ids), page_limit(limit, ids))
+
+def read_details_page(response: Response, db: Session, model, schema, skip: int, limit: int, cursor, after_id,
+                      ids: Optional[str] = None, fields: Optional[str] = None):
+    after_id, ids = keyset_after_id(cursor, after_id), parse_ids(ids)
+    fieldset = parse_fields(model, schema, fields, nested=True)
+    if FAST_SERIALIZATION or fieldset is not None:
+        rows = crud.get_details_rows(db, model, schema, skip, limit, after_id, ids, fieldset)
+        return fast_page(rows, page_limit(limit, ids))
+    getter = {
+        models.Session: crud.get_session_details,
+        models.Group: crud.get_group_details,
+        models.Subject: crud.get_subject_details,
+    }[model]
+    return list_page(response, getter(db, skip, limit, after_id, ids), page_limit(limit, ids))
 
 @router.post("/faculties/", response_model=schemas.Faculty, tags=["Faculties"])
-def create_faculty(faculty: schemas.FacultyCreate, db: Session = Depends(get_db)):
-    check_duplicate(db, "Faculty", "name", faculty.name)
-    return crud.create(db, models.Faculty, faculty)
+def create_faculty(faculty: schemas.FacultyCreate, upsert: bool = UPSERT, db: Session = Depends(get_db)):
+    return create_entity(db, models.Faculty, faculty, upsert)
 
 @router.get("/faculties/", response_model=List[schemas.Faculty], tags=["Faculties"])
-def read_faculties(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_all(db, models.Faculty, skip, limit)
+def read_faculties(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    ids: Optional[str] = IDS,
+    fields: Optional[str] = FIELDS,
+    db: Session = Depends(get_read_db),
+):
+    return read_page(response, db, models.Faculty, schemas.Faculty, skip, limit, cursor, after_id, ids, fields)
 
 @router.post("/departments/", response_model=schemas.Department, tags=["Departments"])
-def create_department(department: schemas.DepartmentCreate, db: Session = Depends(get_db)):
-    check_duplicate(db, "Department", "name", department.name)
-    return crud.create(db, models.Department, department)
+def create_department(department: schemas.DepartmentCreate, upsert: bool = UPSERT, db: Session = Depends(get_db)):
+    return create_entity(db, models.Department, department, upsert)
 
 @router.get("/departments/", response_model=List[schemas.Department], tags=["Departments"])
-def read_departments(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_all(db, models.Department, skip, limit)
+def read_departments(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    ids: Optional[str] = IDS,
+    fields: Optional[str] = FIELDS,
+    db: Session = Depends(get_read_db),
+):
+    return read_page(response, db, models.Department, schemas.Department, skip, limit, cursor, after_id, ids, fields)
 
 @router.post("/teachers/", response_model=schemas.Teacher, tags=["Teachers"])
 def create_teacher(teacher: schemas.TeacherCreate, db: Session = Depends(get_db)):
     # Assuming teacher names are not unique, so no duplicate check
-    return crud.create(db, models.Teacher, teacher)
+    return create_entity(db, models.Teacher, teacher)
 
 @router.get("/teachers/", response_model=List[schemas.Teacher], tags=["Teachers"])
-def read_teachers(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_all(db, models.Teacher, skip, limit)
+def read_teachers(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    ids: Optional[str] = IDS,
+    fields: Optional[str] = FIELDS,
+    db: Session = Depends(get_read_db),
+):
+    return read_page(response, db, models.Teacher, schemas.Teacher, skip, limit, cursor, after_id, ids, fields)
 
 @router.post("/groups/", response_model=schemas.Group, tags=["Groups"])
-def create_group(group: schemas.GroupCreate, db: Session = Depends(get_db)):
-    check_duplicate(db, "Group", "code", group.code)
-    if not crud.get_by_id(db, models.Faculty, group.faculty_id):
-        raise HTTPException(status_code=404, detail="Faculty not found")
-    return crud.create(db, models.Group, group)
+def create_group(group: schemas.GroupCreate, upsert: bool = UPSERT, db: Session = Depends(get_db)):
+    return create_entity(db, models.Group, group, upsert)
 
 @router.get("/groups/", response_model=List[schemas.Group], tags=["Groups"])
-def read_groups(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_all(db, models.Group, skip, limit)
+def read_groups(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    ids: Optional[str] = IDS,
+    fields: Optional[str] = FIELDS,
+    db: Session = Depends(get_read_db),
+):
+    return read_page(response, db, models.Group, schemas.Group, skip, limit, cursor, after_id, ids, fields)
 
 @router.post("/subjects/", response_model=schemas.Subject, tags=["Subjects"])
-def create_subject(subject: schemas.SubjectCreate, db: Session = Depends(get_db)):
-    check_duplicate(db, "Subject", "name", subject.name)
-    if not crud.get_by_id(db, models.Department, subject.department_id):
-        raise HTTPException(status_code=404, detail="Department not found")
-    return crud.create(db, models.Subject, subject)
+def create_subject(subject: schemas.SubjectCreate, upsert: bool = UPSERT, db: Session = Depends(get_db)):
+    return create_entity(db, models.Subject, subject, upsert)
 
 @router.get("/subjects/", response_model=List[schemas.Subject], tags=["Subjects"])
-def read_subjects(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_all(db, models.Subject, skip, limit)
+def read_subjects(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    ids: Optional[str] = IDS,
+    fields: Optional[str] = FIELDS,
+    db: Session = Depends(get_read_db),
+):
+    return read_page(response, db, models.Subject, schemas.Subject, skip, limit, cursor, after_id, ids, fields)
 
 @router.post("/sessions/", response_model=schemas.Session, tags=["Sessions"])
 def create_session(session: schemas.SessionCreate, db: Session = Depends(get_db)):
-    if not crud.get_by_id(db, models.Group, session.group_id):
-        raise HTTPException(status_code=404, detail="Group not found")
-    if not crud.get_by_id(db, models.Subject, session.subject_id):
-        raise HTTPException(status_code=404, detail="Subject not found")
-    if not crud.get_by_id(db, models.Teacher, session.teacher_id):
-        raise HTTPException(status_code=404, detail="Teacher not found")
-    return crud.create(db, models.Session, session)
+    return create_entity(db, models.Session, session)
 
 @router.get("/sessions/", response_model=List[schemas.Session], tags=["Sessions"])
-def read_sessions(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_all(db, models.Session, skip, limit)
+def read_sessions(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    ids: Optional[str] = IDS,
+    fields: Optional[str] = FIELDS,
+    db: Session = Depends(get_read_db),
+):
+    return read_page(response, db, models.Session, schemas.Session, skip, limit, cursor, after_id, ids, fields)
+
+# --- Bulk Create Endpoints ---
+
+BULK_MAX_ITEMS = 5000
+
+def bulk_create(db: Session, model, items: list, **options):
+    """Validate and insert a batch; invalid items are reported per index instead of aborting the batch."""
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} items per bulk request.")
+    created, errors = crud.create_bulk(db, model, items, **options)
+    return {"created": created, "errors": [{"index": i, "detail": detail} for i, detail in errors]}
+
+@router.post("/faculties/bulk/", response_model=schemas.FacultyBulkResult, tags=["Faculties"])
+def create_faculties_bulk(faculties: List[schemas.FacultyCreate], upsert: bool = UPSERT, db: Session = Depends(get_db)):
+    return bulk_create(db, models.Faculty, faculties, unique_field="name", upsert=upsert)
+
+@router.post("/departments/bulk/", response_model=schemas.DepartmentBulkResult, tags=["Departments"])
+def create_departments_bulk(departments: List[schemas.DepartmentCreate], upsert: bool = UPSERT, db: Session = Depends(get_db)):
+    return bulk_create(db, models.Department, departments, unique_field="name", upsert=upsert)
+
+@router.post("/teachers/bulk/", response_model=schemas.TeacherBulkResult, tags=["Teachers"])
+def create_teachers_bulk(teachers: List[schemas.TeacherCreate], db: Session = Depends(get_db)):
+    return bulk_create(db, models.Teacher, teachers)
+
+@router.post("/groups/bulk/", response_model=schemas.GroupBulkResult, tags=["Groups"])
+def create_groups_bulk(groups: List[schemas.GroupCreate], upsert: bool = UPSERT, db: Session = Depends(get_db)):
+    return bulk_create(db, models.Group, groups, unique_field="code", upsert=upsert, foreign_keys={"faculty_id": models.Faculty})
+
+@router.post("/subjects/bulk/", response_model=schemas.SubjectBulkResult, tags=["Subjects"])
+def create_subjects_bulk(subjects: List[schemas.SubjectCreate], upsert: bool = UPSERT, db: Session = Depends(get_db)):
+    return bulk_create(db, models.Subject, subjects, unique_field="name", upsert=upsert, foreign_keys={"department_id": models.Department})
+
+@router.post("/sessions/bulk/", response_model=schemas.SessionBulkResult, tags=["Sessions"])
+def create_sessions_bulk(sessions: List[schemas.SessionCreate], db: Session = Depends(get_db)):
+    return bulk_create(
+        db,
+        models.Session,
+        sessions,
+        foreign_keys={"group_id": models.Group, "subject_id": models.Subject, "teacher_id": models.Teacher},
+    )
 
 # --- Complex Queries ---
 
 @router.get("/groups/search/", response_model=List[schemas.Group], tags=["Groups"], summary="5a. Select with multiple WHERE and sorting")
 def search_groups_endpoint(
+    response: Response,
     faculty_id: Optional[int] = None,
     min_students: int = Query(0, ge=0),
     sort_by: Optional[str] = Query(None, enum=["code", "course", "num_students"], description="Sort by 'code', 'course', or 'num_students'"),
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    db: Session = Depends(get_read_db),
 ):
     """
     **SELECT ... WHERE (with multiple conditions) + Sorting**
     - Filter groups by `faculty_id` and/or `min_students`.
-    - Sort results by a given field.
-    - Implements pagination with `skip` and `limit`.
+    - Sort results by a given field (ties are broken by `id`).
+    - Implements pagination with `skip` and `limit`, or keyset pagination with the
+      `cursor` returned in the `X-Next-Cursor` header (`after_id` when not sorting).
     """
-    return crud.search_groups(db, faculty_id, min_students, sort_by, skip, limit)
+    if sort_by:
+        # The cursor carries the sort column so it cannot be replayed against another ordering
+        position = keyset_position(cursor, after_id, size=3)
+        if position is not None and position[0] != sort_by:
+            raise HTTPException(status_code=400, detail="Cursor does not match this query.")
+        after = position[1:] if position is not None else None
+    else:
+        after = keyset_position(cursor, after_id)
+    if FAST_SERIALIZATION:
+        rows = crud.search_groups_rows(db, faculty_id, min_students, sort_by, skip, limit, after)
+        key = ((sort_by, rows[-1][sort_by], rows[-1]["id"]) if sort_by else (rows[-1]["id"],)) if rows else ()
+        return fast_page(rows, limit, *key)
+    items = crud.search_groups(db, faculty_id, min_students, sort_by, skip, limit, after)
+    if items:
+        last = items[-1]
+        key = (sort_by, getattr(last, sort_by), last.id) if sort_by else (last.id,)
+        set_next_cursor(response, items, limit, *key)
+    return items
 
 @router.get("/sessions/details/", response_model=List[schemas.SessionDetails], tags=["Sessions"], summary="5b. JOIN example")
-def get_session_details_endpoint(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
+def get_session_details_endpoint(
+    response: Response,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    ids: Optional[str] = IDS,
+    fields: Optional[str] = FIELDS,
+    db: Session = Depends(get_read_db),
+):
     """
     **JOIN**
     - Fetches session records and joins them with related Group, Subject, and Teacher data.
-    - The relationships are handled by SQLAlchemy ORM and represented in the nested `SessionDetails` schema.
-    - Implements pagination with `skip` and `limit`.
+    - The relationships are eager-loaded with a single JOIN query (no per-row lazy loads)
+      and represented in the nested `SessionDetails` schema.
+    - Implements pagination with `skip` and `limit`, or keyset pagination with `cursor`/`after_id`.
+    - `fields` narrows the columns and the joined relations; `ids` fetches the given rows in one query.
+    """
+    return read_details_page(response, db, models.Session, schemas.Session, skip, limit, cursor, after_id, ids, fields)
+
+@router.get("/groups/details/", response_model=List[schemas.GroupDetails], tags=["Groups"], summary="JOIN groups with faculties")
+def get_group_details_endpoint(
+    response: Response,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    ids: Optional[str] = IDS,
+    fields: Optional[str] = FIELDS,
+    db: Session = Depends(get_read_db),
+):
+    """
+    **JOIN**
+    - Fetches groups together with their Faculty in a single JOIN query.
+    - Implements pagination with `skip` and `limit`, or keyset pagination with `cursor`/`after_id`.
+    - `fields` narrows the columns and the joined relations; `ids` fetches the given rows in one query.
     """
-    return crud.get_session_details(db, skip, limit)
+    return read_details_page(response, db, models.Group, schemas.Group, skip, limit, cursor, after_id, ids, fields)
+
+@router.get("/subjects/details/", response_model=List[schemas.SubjectDetails], tags=["Subjects"], summary="JOIN subjects with departments")
+def get_subject_details_endpoint(
+    response: Response,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    ids: Optional[str] = IDS,
+    fields: Optional[str] = FIELDS,
+    db: Session = Depends(get_read_db),
+):
+    """
+    **JOIN**
+    - Fetches subjects together with their Department in a single JOIN query.
+    - Implements pagination with `skip` and `limit`, or keyset pagination with `cursor`/`after_id`.
+    - `fields` narrows the columns and the joined relations; `ids` fetches the given rows in one query.
+    """
+    return read_details_page(response, db, models.Subject, schemas.Subject, skip, limit, cursor, after_id, ids, fields)
 
 @router.put("/groups/promote/", tags=["Groups"], summary="5c. UPDATE with non-trivial condition")
 def promote_groups_endpoint(current_course: int, db: Session = Depends(get_db)):
@@ -131,31 +432,719 @@ def promote_groups_endpoint(current_course: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail=f"No groups found for course {current_course} to promote.")
     return {"message": f"Promoted {updated_count} groups from course {current_course}."}
 
+@router.post("/jobs/promotion/", response_model=schemas.PromotionJobStatus, status_code=202, tags=["Groups"], summary="End-of-year promotion job")
+def start_promotion_job(
+    response: Response,
+    dry_run: bool = Query(False, description="Only count the groups per course, write nothing"),
+    chunk_size: int = Query(promotion.PROMOTION_CHUNK_SIZE, ge=1, le=50000),
+    start_course: Optional[int] = Query(None, description="Resume: skip courses above this one"),
+    after_id: int = Query(0, ge=0, description="Resume: skip groups of `start_course` up to this id"),
+):
+    """
+    **Promote every group by one course, in the background**
+    - Courses are processed from the highest down, so no group is promoted twice.
+    - Updates run in chunks of `chunk_size` groups, each in its own short transaction.
+    - Poll `GET /jobs/promotion/{id}` for progress; 409 while another promotion is running.
+    """
+    try:
+        job = promotion.start_job(dry_run=dry_run, chunk_size=chunk_size, start_course=start_course, after_id=after_id)
+    except promotion.PromotionInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    response.headers["Location"] = f"/jobs/promotion/{job.id}"
+    return job.status_dict()
+
+@router.get("/jobs/promotion/{job_id}", response_model=schemas.PromotionJobStatus, tags=["Groups"])
+def read_promotion_job(job_id: str):
+    job = promotion.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.status_dict()
+
 @router.get("/reports/students-per-faculty/", response_model=List[schemas.FacultyStats], tags=["Reports"], summary="5d. GROUP BY example")
-def get_students_per_faculty_endpoint(db: Session = Depends(get_db)):
+def get_students_per_faculty_endpoint(db: Session = Depends(get_read_db)):
     """
     **GROUP BY**
     - Calculates the total number of students for each faculty.
-    - Uses `GROUP BY` on faculty name and `SUM` on the number of students.
+    - The `SUM` of students per faculty is precomputed in the `faculty_stats` summary table,
+      which triggers on `groups` keep current, so a read costs one row per faculty.
+    - `freshness` tells when each faculty's totals last changed.
     """
     return crud.get_students_per_faculty(db)
 
-@router.get("/subjects/search-trgm/", response_model=List[schemas.Subject], tags=["Subjects"], summary="6a. Full-text search with pg_trgm")
-def search_subjects_trgm_endpoint(query: str, db: Session = Depends(get_db)):
+@router.get("/subjects/search-trgm/", response_model=List[schemas.SubjectSearchResult], tags=["Subjects"], summary="6a. Full-text search with pg_trgm")
+def search_subjects_trgm_endpoint(
+    query: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    threshold: float = Query(crud.TRGM_DEFAULT_THRESHOLD, ge=0, le=1, description="Minimum trigram similarity"),
+    db: Session = Depends(get_read_db),
+):
     """
-    **Full-text search using pg_trgm similarity**
-    - Searches for subjects where the `extra['notes']` field is similar to the query string.
-    - Requires the `pg_trgm` extension and a GIN/GIST index on the JSON field for performance.
+    **Ranked full-text search using pg_trgm similarity**
+    - Searches the subject `name`, `extra['notes']` and `extra['tags']`.
+    - Returns the `limit` best matches, most similar first, each with its `score`
+      (similarity, 0..1) and the field it `matched_on`.
+    - `threshold` sets `pg_trgm.similarity_threshold` for this query only.
+    - Each field has a GiST trigram index, so the top-k is read in distance order (`<->`).
     """
-    return crud.search_subjects_by_trgm(db, query)
+    return crud.search_subjects_by_trgm(db, query, limit, threshold)
+
+# Errors of a bounded regex search, as HTTP errors
+def check_regex_pattern(pattern: str):
+    if not crud.regex_is_indexable(pattern):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Pattern needs at least {crud.REGEX_MIN_LITERAL} consecutive literal letters or digits "
+                   "in every alternative, so the trigram index can be used.",
+        )
+
+def regex_search_error(error: DBAPIError) -> HTTPException:
+    """The HTTP error for a failed regex search; unrelated database errors are re-raised."""
+    if crud.is_statement_timeout(error):
+        return HTTPException(status_code=422, detail=f"Pattern too expensive: the search exceeded {crud.REGEX_TIMEOUT_MS} ms.")
+    if crud.sqlstate(error) == crud.INVALID_REGULAR_EXPRESSION:
+        return HTTPException(status_code=400, detail="Invalid regular expression.")
+    raise error
 
 @router.get("/subjects/search-regex/", response_model=List[schemas.Subject], tags=["Subjects"], summary="6b. Full-text search with Regex")
-def search_subjects_regex_endpoint(pattern: str = Query(..., example="^Intro.*"), db: Session = Depends(get_db)):
+def search_subjects_regex_endpoint(
+    response: Response,
+    pattern: str = Query(..., example="^Intro.*"),
+    case_insensitive: bool = Query(False, description="Match with ~* instead of ~"),
+    skip: int = 0,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    db: Session = Depends(get_read_db),
+):
     """
     **Full-text search using PostgreSQL regular expressions**
-    - Searches for subjects where `extra['notes']` matches the given regex pattern (case-sensitive).
+    - Searches for subjects where `extra['notes']` matches the given regex pattern
+      (case-sensitive, or case-insensitive with `case_insensitive=true`).
     - Example: `^Intro.*` finds notes starting with "Intro".
+    - Every alternative of the pattern must contain 3 consecutive literal letters or digits,
+      so the trigram index narrows the search; other patterns are rejected with 400.
+    - Bounded: paged by `id` (`limit`, and `after_id`/`cursor` or `skip`) and cancelled
+      after REGEX_TIMEOUT_MS (422).
+    """
+    check_regex_pattern(pattern)
+    after_id = keyset_after_id(cursor, after_id)
+    try:
+        items = crud.search_subjects_by_regex(db, pattern, skip, limit, after_id, case_insensitive)
+    except DBAPIError as e:
+        db.rollback()
+        raise regex_search_error(e)
+    return list_page(response, items, limit)
+
+def fts_position(cursor: Optional[str]):
+    """(rank, id) of the last row of the previous full-text search page"""
+    position = keyset_position(cursor, size=2)
+    if position is not None and not (isinstance(position[0], (int, float)) and isinstance(position[1], int)):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    return position
+
+def fts_page(response: Response, items: list, limit: int):
+    if items:
+        set_next_cursor(response, items, limit, items[-1].rank, items[-1].id)
+    return items
+
+@router.get("/subjects/search-fts/", response_model=List[schemas.SubjectFtsResult], tags=["Subjects"], summary="6c. Full-text search with tsvector")
+def search_subjects_fts_endpoint(
+    response: Response,
+    q: str = Query(..., min_length=1, example='"data structures" -graphs'),
+    skip: int = 0,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+):
+    """
+    **Full-text search using a tsvector column and websearch_to_tsquery**
+    - Searches subject `name` and `extra['notes']` with English stemming; `q` takes web-search
+      syntax: `"quoted phrases"`, `or`, and `-excluded` words.
+    - Results are ordered by `ts_rank` (name matches weigh more than notes), each with a
+      `snippet` of the notes where matched terms are wrapped in `<b></b>`.
+    - Paged with `skip`/`limit`, or the `cursor` from the `X-Next-Cursor` header.
+    """
+    after = fts_position(cursor)
+    return fts_page(response, crud.search_subjects_by_fts(db, q, skip, limit, after), limit)
+
+# Helpers for schedules and conflicts, paged by keys that contain a date
+# (ISO formatted in the cursor)
+def dated_position(cursor: Optional[str], date_index: int):
+    position = keyset_position(cursor, size=2)
+    if position is None:
+        return None
+    try:
+        position[date_index] = date.fromisoformat(position[date_index])
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    if not isinstance(position[1 - date_index], int):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    return tuple(position)
+
+def schedule_page(response: Response, items: list, limit: int):
+    if items:
+        set_next_cursor(response, items, limit, items[-1].session_date.isoformat(), items[-1].id)
+    return items
+
+def conflicts_page(response: Response, items: list, limit: int):
+    if items:
+        set_next_cursor(response, items, limit, items[-1].owner_id, items[-1].session_date.isoformat())
+    return items
+
+def read_schedule(response: Response, db: Session, owner: str, owner_id: int, date_from, date_to, limit: int, cursor):
+    after = dated_position(cursor, 0)
+    return schedule_page(response, crud.get_schedule(db, owner, owner_id, date_from, date_to, limit, after), limit)
+
+@router.get("/teachers/{teacher_id}/schedule/", response_model=List[schemas.ScheduleEntry], tags=["Teachers"], summary="Timetable of a teacher")
+def read_teacher_schedule(
+    response: Response,
+    teacher_id: int,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+):
+    """
+    **Timetable**
+    - Sessions of the teacher between `date_from` and `date_to` (inclusive), ordered by date,
+      with group code, subject name and teacher name.
+    - Paged with `limit` and the `cursor` from the `X-Next-Cursor` header.
+    """
+    return read_schedule(response, db, "teacher", teacher_id, date_from, date_to, limit, cursor)
+
+@router.get("/groups/{group_id}/schedule/", response_model=List[schemas.ScheduleEntry], tags=["Groups"], summary="Timetable of a group")
+def read_group_schedule(
+    response: Response,
+    group_id: int,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+):
+    return read_schedule(response, db, "group", group_id, date_from, date_to, limit, cursor)
+
+@router.get("/subjects/{subject_id}/schedule/", response_model=List[schemas.ScheduleEntry], tags=["Subjects"], summary="Timetable of a subject")
+def read_subject_schedule(
+    response: Response,
+    subject_id: int,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+):
+    return read_schedule(response, db, "subject", subject_id, date_from, date_to, limit, cursor)
+
+@router.get("/sessions/conflicts/", response_model=List[schemas.SessionConflict], tags=["Sessions"], summary="Double-booked teachers or groups")
+def read_session_conflicts(
+    response: Response,
+    kind: str = Query("teacher", enum=list(crud.CONFLICT_KINDS)),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+):
+    """
+    **Double-booking detection**
+    - Every teacher (`kind=teacher`) or group (`kind=group`) with more than one session on
+      the same date, with the ids of those sessions, ordered by owner and date.
+    - One set-based GROUP BY ... HAVING count(*) > 1 over the (owner, date) index.
+    """
+    after = dated_position(cursor, 1)
+    return conflicts_page(response, crud.get_conflicts(db, kind, date_from, date_to, limit, after), limit)
+
+def parse_containment(contains: str) -> dict:
+    try:
+        document = json.loads(contains)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="`contains` must be valid JSON.")
+    if not isinstance(document, dict):
+        raise HTTPException(status_code=400, detail="`contains` must be a JSON object.")
+    return document
+
+@router.get("/subjects/by-tag/", response_model=List[schemas.Subject], tags=["Subjects"], summary="Subjects by tag (JSONB containment)")
+def get_subjects_by_tag_endpoint(
+    response: Response,
+    tag: List[str] = Query(..., description="Repeat to require several tags"),
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    db: Session = Depends(get_read_db),
+):
+    """
+    **Subjects carrying all the given tags**
+    - `extra @> {"tags": [...]}`, served by the `jsonb_path_ops` GIN index on `extra`.
+    - Paged by `id` like the list endpoints.
+    """
+    after_id = keyset_after_id(cursor, after_id)
+    return list_page(response, crud.get_subjects_by_tags(db, tag, skip, limit, after_id), limit)
+
+@router.get("/subjects/by-extra/", response_model=List[schemas.Subject], tags=["Subjects"], summary="Subjects by JSONB containment")
+def get_subjects_by_extra_endpoint(
+    response: Response,
+    contains: str = Query(..., example='{"tags": ["tag1"]}', description="JSON object that `extra` must contain"),
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    db: Session = Depends(get_read_db),
+):
+    """
+    **Subjects whose `extra` contains a JSON document**
+    - `extra @> :contains`, e.g. `{"tags": ["tag1"]}` or `{"level": 2, "tags": ["lab"]}`.
+    - Served by the `jsonb_path_ops` GIN index on `extra`, with no per-row JSON parsing.
     """
-    return crud.search_subjects_by_regex(db, pattern)
+    document = parse_containment(contains)
+    after_id = keyset_after_id(cursor, after_id)
+    return list_page(response, crud.get_subjects_by_extra(db, document, skip, limit, after_id), limit)
+
+# --- Streaming Export ---
+
+EXPORTABLE = {
+    "faculties": (models.Faculty, schemas.Faculty),
+    "departments": (models.Department, schemas.Department),
+    "teachers": (models.Teacher, schemas.Teacher),
+    "groups": (models.Group, schemas.Group),
+    "subjects": (models.Subject, schemas.Subject),
+}
+
+def export_response(request: Request, stmt, name: str, format: str):
+    return StreamingResponse(
+        stream_rows(stmt, format, use_replica=not wants_primary(request)),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{format}"'},
+    )
+
+@router.get("/export/sessions/", tags=["Export"], summary="Stream all sessions as NDJSON or CSV")
+def export_sessions(
+    request: Request,
+    format: str = Query("ndjson", enum=list(EXPORT_FORMATS)),
+    details: bool = Query(False, description="Add group code/course, subject name and teacher name columns"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    group_id: Optional[int] = None,
+    teacher_id: Optional[int] = None,
+    control_type: Optional[str] = None,
+):
+    """
+    **Streaming export**
+    - Streams every matching session, ordered by `id`, through a server-side cursor.
+    - Rows go straight from column tuples to NDJSON lines or CSV records, in chunks,
+      so memory use does not grow with the number of rows.
+    """
+    stmt = crud.session_export_query(date_from, date_to, group_id, teacher_id, control_type, details)
+    return export_response(request, stmt, "sessions", format)
+
+@router.get("/export/{entity}/", tags=["Export"], summary="Stream an entity table as NDJSON or CSV")
+def export_entity(request: Request, entity: str, format: str = Query("ndjson", enum=list(EXPORT_FORMATS))):
+    if entity not in EXPORTABLE:
+        raise HTTPException(status_code=404, detail=f"Unknown entity '{entity}'.")
+    model, schema = EXPORTABLE[entity]
+    return export_response(request, crud.export_query(model, schema), entity, format)
+
+# --- Metrics ---
+
+@router.get("/metrics/pool", tags=["Metrics"], summary="Connection pool statistics")
+def pool_metrics_endpoint():
+    """
+    **Connection pool statistics for this worker process**
+    - Live `size`, `checkedin`, `checkedout` and `overflow` per engine.
+    - Checkout wait time (total and as a latency histogram), timeouts, and
+      connections created/invalidated since the worker started.
+    - Hit rates of the statement cache, the compiled SQL cache and the server-side prepared statements.
+    """
+    return {
+        "config": POOL_OPTIONS,
+        "pools": pool_stats(),
+        "reference_snapshot": reference.snapshot.stats(),
+        "statement_cache": statements.stats.snapshot(),
+    }
+
+@router.get("/metrics", tags=["Metrics"], summary="Prometheus metrics", response_class=PlainTextResponse)
+def prometheus_metrics_endpoint():
+    """
+    **Per-route metrics in the Prometheus text format (this worker process)**
+    - Request counts by status code, latency and SQL time histograms, statements executed.
+    - Connection pool checkout wait histograms.
+    """
+    return PlainTextResponse(prometheus_text(), media_type="text/plain; version=0.0.4")
+
+# --- Async Endpoints (DB_ASYNC=1) ---
+
+async def create_entity_async(db: AsyncSession, model, item, upsert: bool = False):
+    try:
+        created = await crud_async.create(db, model, item, upsert)
+    except IntegrityError as e:
+        raise create_error(e, model) or e
+    if created is None:
+        raise already_exists(model)
+    return created
+
+async def read_page_async(response: Response, db: AsyncSession, model, schema, skip: int, limit: int, cursor, after_id,
+                          ids: Optional[str] = None, fields: Optional[str] = None):
+    after_id, ids = keyset_after_id(cursor, after_id), parse_ids(ids)
+    fieldset = parse_fields(model, schema, fields)
+    if FAST_SERIALIZATION or fieldset is not None:
+        rows = await crud_async.get_fields_rows(db, model, schema, fieldset, skip, limit, after_id, ids)
+        return fast_page(rows, page_limit(limit, ids))
+    return list_page(response, await crud_async.get_all(db, model, skip, limit, after_id, ids), page_limit(limit, ids))
+
+async def read_details_page_async(response: Response, db: AsyncSession, model, schema, skip: int, limit: int, cursor, after_id,
+                                  ids: Optional[str] = None, fields: Optional[str] = None):
+    after_id, ids = keyset_after_id(cursor, after_id), parse_ids(ids)
+    fieldset = parse_fields(model, schema, fields, nested=True)
+    if FAST_SERIALIZATION or fieldset is not None:
+        rows = await crud_async.get_fields_rows(db, model, schema, fieldset, skip, limit, after_id, ids, nested=True)
+        return fast_page(rows, page_limit(limit, ids))
+    getter = {
+        models.Session: crud_async.get_session_details,
+        models.Group: crud_async.get_group_details,
+        models.Subject: crud_async.get_subject_details,
+    }[model]
+    return list_page(response, await getter(db, skip, limit, after_id, ids), page_limit(limit, ids))
+
+@async_router.post("/faculties/", response_model=schemas.Faculty, tags=["Faculties"])
+async def create_faculty_async(faculty: schemas.FacultyCreate, upsert: bool = UPSERT, db: AsyncSession = Depends(get_async_db)):
+    return await create_entity_async(db, models.Faculty, faculty, upsert)
+
+@async_router.get("/faculties/", response_model=List[schemas.Faculty], tags=["Faculties"])
+async def read_faculties_async(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    ids: Optional[str] = IDS,
+    fields: Optional[str] = FIELDS,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    return await read_page_async(response, db, models.Faculty, schemas.Faculty, skip, limit, cursor, after_id, ids, fields)
+
+@async_router.post("/departments/", response_model=schemas.Department, tags=["Departments"])
+async def create_department_async(department: schemas.DepartmentCreate, upsert: bool = UPSERT, db: AsyncSession = Depends(get_async_db)):
+    return await create_entity_async(db, models.Department, department, upsert)
+
+@async_router.get("/departments/", response_model=List[schemas.Department], tags=["Departments"])
+async def read_departments_async(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    ids: Optional[str] = IDS,
+    fields: Optional[str] = FIELDS,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    return await read_page_async(response, db, models.Department, schemas.Department, skip, limit, cursor, after_id, ids, fields)
+
+@async_router.post("/teachers/", response_model=schemas.Teacher, tags=["Teachers"])
+async def create_teacher_async(teacher: schemas.TeacherCreate, db: AsyncSession = Depends(get_async_db)):
+    return await create_entity_async(db, models.Teacher, teacher)
+
+@async_router.get("/teachers/", response_model=List[schemas.Teacher], tags=["Teachers"])
+async def read_teachers_async(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    ids: Optional[str] = IDS,
+    fields: Optional[str] = FIELDS,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    return await read_page_async(response, db, models.Teacher, schemas.Teacher, skip, limit, cursor, after_id, ids, fields)
+
+@async_router.post("/groups/", response_model=schemas.Group, tags=["Groups"])
+async def create_group_async(group: schemas.GroupCreate, upsert: bool = UPSERT, db: AsyncSession = Depends(get_async_db)):
+    return await create_entity_async(db, models.Group, group, upsert)
+
+@async_router.get("/groups/", response_model=List[schemas.Group], tags=["Groups"])
+async def read_groups_async(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    ids: Optional[str] = IDS,
+    fields: Optional[str] = FIELDS,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    return await read_page_async(response, db, models.Group, schemas.Group, skip, limit, cursor, after_id, ids, fields)
+
+@async_router.post("/subjects/", response_model=schemas.Subject, tags=["Subjects"])
+async def create_subject_async(subject: schemas.SubjectCreate, upsert: bool = UPSERT, db: AsyncSession = Depends(get_async_db)):
+    return await create_entity_async(db, models.Subject, subject, upsert)
+
+@async_router.get("/subjects/", response_model=List[schemas.Subject], tags=["Subjects"])
+async def read_subjects_async(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    ids: Optional[str] = IDS,
+    fields: Optional[str] = FIELDS,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    return await read_page_async(response, db, models.Subject, schemas.Subject, skip, limit, cursor, after_id, ids, fields)
+
+@async_router.post("/sessions/", response_model=schemas.Session, tags=["Sessions"])
+async def create_session_async(session: schemas.SessionCreate, db: AsyncSession = Depends(get_async_db)):
+    return await create_entity_async(db, models.Session, session)
+
+@async_router.get("/sessions/", response_model=List[schemas.Session], tags=["Sessions"])
+async def read_sessions_async(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    ids: Optional[str] = IDS,
+    fields: Optional[str] = FIELDS,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    return await read_page_async(response, db, models.Session, schemas.Session, skip, limit, cursor, after_id, ids, fields)
+
+async def bulk_create_async(db: AsyncSession, model, items: list, **options):
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} items per bulk request.")
+    created, errors = await crud_async.create_bulk(db, model, items, **options)
+    return {"created": created, "errors": [{"index": i, "detail": detail} for i, detail in errors]}
+
+@async_router.post("/faculties/bulk/", response_model=schemas.FacultyBulkResult, tags=["Faculties"])
+async def create_faculties_bulk_async(faculties: List[schemas.FacultyCreate], upsert: bool = UPSERT, db: AsyncSession = Depends(get_async_db)):
+    return await bulk_create_async(db, models.Faculty, faculties, unique_field="name", upsert=upsert)
+
+@async_router.post("/departments/bulk/", response_model=schemas.DepartmentBulkResult, tags=["Departments"])
+async def create_departments_bulk_async(departments: List[schemas.DepartmentCreate], upsert: bool = UPSERT, db: AsyncSession = Depends(get_async_db)):
+    return await bulk_create_async(db, models.Department, departments, unique_field="name", upsert=upsert)
+
+@async_router.post("/teachers/bulk/", response_model=schemas.TeacherBulkResult, tags=["Teachers"])
+async def create_teachers_bulk_async(teachers: List[schemas.TeacherCreate], db: AsyncSession = Depends(get_async_db)):
+    return await bulk_create_async(db, models.Teacher, teachers)
+
+@async_router.post("/groups/bulk/", response_model=schemas.GroupBulkResult, tags=["Groups"])
+async def create_groups_bulk_async(groups: List[schemas.GroupCreate], upsert: bool = UPSERT, db: AsyncSession = Depends(get_async_db)):
+    return await bulk_create_async(db, models.Group, groups, unique_field="code", upsert=upsert, foreign_keys={"faculty_id": models.Faculty})
+
+@async_router.post("/subjects/bulk/", response_model=schemas.SubjectBulkResult, tags=["Subjects"])
+async def create_subjects_bulk_async(subjects: List[schemas.SubjectCreate], upsert: bool = UPSERT, db: AsyncSession = Depends(get_async_db)):
+    return await bulk_create_async(db, models.Subject, subjects, unique_field="name", upsert=upsert, foreign_keys={"department_id": models.Department})
+
+@async_router.post("/sessions/bulk/", response_model=schemas.SessionBulkResult, tags=["Sessions"])
+async def create_sessions_bulk_async(sessions: List[schemas.SessionCreate], db: AsyncSession = Depends(get_async_db)):
+    return await bulk_create_async(
+        db,
+        models.Session,
+        sessions,
+        foreign_keys={"group_id": models.Group, "subject_id": models.Subject, "teacher_id": models.Teacher},
+    )
+
+@async_router.get("/groups/search/", response_model=List[schemas.Group], tags=["Groups"], summary="5a. Select with multiple WHERE and sorting")
+async def search_groups_endpoint_async(
+    response: Response,
+    faculty_id: Optional[int] = None,
+    min_students: int = Query(0, ge=0),
+    sort_by: Optional[str] = Query(None, enum=["code", "course", "num_students"], description="Sort by 'code', 'course', or 'num_students'"),
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    if sort_by:
+        position = keyset_position(cursor, after_id, size=3)
+        if position is not None and position[0] != sort_by:
+            raise HTTPException(status_code=400, detail="Cursor does not match this query.")
+        after = position[1:] if position is not None else None
+    else:
+        after = keyset_position(cursor, after_id)
+    if FAST_SERIALIZATION:
+        rows = await crud_async.search_groups_rows(db, faculty_id, min_students, sort_by, skip, limit, after)
+        key = ((sort_by, rows[-1][sort_by], rows[-1]["id"]) if sort_by else (rows[-1]["id"],)) if rows else ()
+        return fast_page(rows, limit, *key)
+    items = await crud_async.search_groups(db, faculty_id, min_students, sort_by, skip, limit, after)
+    if items:
+        last = items[-1]
+        key = (sort_by, getattr(last, sort_by), last.id) if sort_by else (last.id,)
+        set_next_cursor(response, items, limit, *key)
+    return items
+
+@async_router.get("/sessions/details/", response_model=List[schemas.SessionDetails], tags=["Sessions"], summary="5b. JOIN example")
+async def get_session_details_endpoint_async(
+    response: Response,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    ids: Optional[str] = IDS,
+    fields: Optional[str] = FIELDS,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    return await read_details_page_async(response, db, models.Session, schemas.Session, skip, limit, cursor, after_id, ids, fields)
+
+@async_router.get("/groups/details/", response_model=List[schemas.GroupDetails], tags=["Groups"], summary="JOIN groups with faculties")
+async def get_group_details_endpoint_async(
+    response: Response,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    ids: Optional[str] = IDS,
+    fields: Optional[str] = FIELDS,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    return await read_details_page_async(response, db, models.Group, schemas.Group, skip, limit, cursor, after_id, ids, fields)
+
+@async_router.get("/subjects/details/", response_model=List[schemas.SubjectDetails], tags=["Subjects"], summary="JOIN subjects with departments")
+async def get_subject_details_endpoint_async(
+    response: Response,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    ids: Optional[str] = IDS,
+    fields: Optional[str] = FIELDS,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    return await read_details_page_async(response, db, models.Subject, schemas.Subject, skip, limit, cursor, after_id, ids, fields)
+
+@async_router.put("/groups/promote/", tags=["Groups"], summary="5c. UPDATE with non-trivial condition")
+async def promote_groups_endpoint_async(current_course: int, db: AsyncSession = Depends(get_async_db)):
+    updated_count = await crud_async.promote_groups(db, current_course)
+    if updated_count == 0:
+        raise HTTPException(status_code=404, detail=f"No groups found for course {current_course} to promote.")
+    return {"message": f"Promoted {updated_count} groups from course {current_course}."}
+
+@async_router.get("/reports/students-per-faculty/", response_model=List[schemas.FacultyStats], tags=["Reports"], summary="5d. GROUP BY example")
+async def get_students_per_faculty_endpoint_async(db: AsyncSession = Depends(get_async_read_db)):
+    return await crud_async.get_students_per_faculty(db)
+
+@async_router.get("/subjects/search-trgm/", response_model=List[schemas.SubjectSearchResult], tags=["Subjects"], summary="6a. Full-text search with pg_trgm")
+async def search_subjects_trgm_endpoint_async(
+    query: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    threshold: float = Query(crud.TRGM_DEFAULT_THRESHOLD, ge=0, le=1, description="Minimum trigram similarity"),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    return await crud_async.search_subjects_by_trgm(db, query, limit, threshold)
+
+@async_router.get("/subjects/search-regex/", response_model=List[schemas.Subject], tags=["Subjects"], summary="6b. Full-text search with Regex")
+async def search_subjects_regex_endpoint_async(
+    response: Response,
+    pattern: str = Query(..., example="^Intro.*"),
+    case_insensitive: bool = Query(False, description="Match with ~* instead of ~"),
+    skip: int = 0,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    check_regex_pattern(pattern)
+    after_id = keyset_after_id(cursor, after_id)
+    try:
+        items = await crud_async.search_subjects_by_regex(db, pattern, skip, limit, after_id, case_insensitive)
+    except DBAPIError as e:
+        await db.rollback()
+        raise regex_search_error(e)
+    return list_page(response, items, limit)
+
+@async_router.get("/subjects/by-tag/", response_model=List[schemas.Subject], tags=["Subjects"], summary="Subjects by tag (JSONB containment)")
+async def get_subjects_by_tag_endpoint_async(
+    response: Response,
+    tag: List[str] = Query(..., description="Repeat to require several tags"),
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    after_id = keyset_after_id(cursor, after_id)
+    return list_page(response, await crud_async.get_subjects_by_tags(db, tag, skip, limit, after_id), limit)
+
+@async_router.get("/subjects/by-extra/", response_model=List[schemas.Subject], tags=["Subjects"], summary="Subjects by JSONB containment")
+async def get_subjects_by_extra_endpoint_async(
+    response: Response,
+    contains: str = Query(..., example='{"tags": ["tag1"]}', description="JSON object that `extra` must contain"),
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    document = parse_containment(contains)
+    after_id = keyset_after_id(cursor, after_id)
+    return list_page(response, await crud_async.get_subjects_by_extra(db, document, skip, limit, after_id), limit)
+
+@async_router.get("/subjects/search-fts/", response_model=List[schemas.SubjectFtsResult], tags=["Subjects"], summary="6c. Full-text search with tsvector")
+async def search_subjects_fts_endpoint_async(
+    response: Response,
+    q: str = Query(..., min_length=1, example='"data structures" -graphs'),
+    skip: int = 0,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    after = fts_position(cursor)
+    return fts_page(response, await crud_async.search_subjects_by_fts(db, q, skip, limit, after), limit)
+
+async def read_schedule_async(response: Response, db: AsyncSession, owner: str, owner_id: int, date_from, date_to, limit: int, cursor):
+    after = dated_position(cursor, 0)
+    return schedule_page(response, await crud_async.get_schedule(db, owner, owner_id, date_from, date_to, limit, after), limit)
+
+@async_router.get("/teachers/{teacher_id}/schedule/", response_model=List[schemas.ScheduleEntry], tags=["Teachers"], summary="Timetable of a teacher")
+async def read_teacher_schedule_async(
+    response: Response,
+    teacher_id: int,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    return await read_schedule_async(response, db, "teacher", teacher_id, date_from, date_to, limit, cursor)
+
+@async_router.get("/groups/{group_id}/schedule/", response_model=List[schemas.ScheduleEntry], tags=["Groups"], summary="Timetable of a group")
+async def read_group_schedule_async(
+    response: Response,
+    group_id: int,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    return await read_schedule_async(response, db, "group", group_id, date_from, date_to, limit, cursor)
+
+@async_router.get("/subjects/{subject_id}/schedule/", response_model=List[schemas.ScheduleEntry], tags=["Subjects"], summary="Timetable of a subject")
+async def read_subject_schedule_async(
+    response: Response,
+    subject_id: int,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    return await read_schedule_async(response, db, "subject", subject_id, date_from, date_to, limit, cursor)
+
+@async_router.get("/sessions/conflicts/", response_model=List[schemas.SessionConflict], tags=["Sessions"], summary="Double-booked teachers or groups")
+async def read_session_conflicts_async(
+    response: Response,
+    kind: str = Query("teacher", enum=list(crud.CONFLICT_KINDS)),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    after = dated_position(cursor, 1)
+    return conflicts_page(response, await crud_async.get_conflicts(db, kind, date_from, date_to, limit, after), limit)
 
+if DB_ASYNC:
+    app.include_router(async_router)
 app.include_router(router)
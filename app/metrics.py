@@ -0,0 +1,196 @@
+import threading
+import time
+
+from sqlalchemy import event, exc
+
+# --- In-process metrics ---
+
+# Upper bounds (in milliseconds) of the latency histogram buckets
+LATENCY_BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+class Histogram:
+    """Cumulative latency histogram with Prometheus-style `le` buckets."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value_ms: float):
+        with self._lock:
+            self.count += 1
+            self.total += value_ms
+            for i, bound in enumerate(self.buckets):
+                if value_ms <= bound:
+                    self.counts[i] += 1
+                    break
+            else:
+                self.counts[-1] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative, running = {}, 0
+            for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+                running += count
+                cumulative[str(bound)] = running
+            return {"count": self.count, "sum_ms": round(self.total, 3), "buckets": cumulative}
+
+
+class PoolMetrics:
+    """Counters for one connection pool, fed by pool events and the instrumented pool class."""
+
+    def __init__(self):
+        self.checkout_latency = Histogram()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connections_created = 0
+        self.connections_invalidated = 0
+        self.wait_ms_total = 0.0
+        self._lock = threading.Lock()
+
+    def record_checkout(self, wait_ms: float, timed_out: bool = False):
+        self.checkout_latency.observe(wait_ms)
+        with self._lock:
+            self.wait_ms_total += wait_ms
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+
+    def record_connect(self):
+        with self._lock:
+            self.connections_created += 1
+
+    def record_invalidate(self):
+        with self._lock:
+            self.connections_invalidated += 1
+
+    def snapshot(self, pool) -> dict:
+        stats = {
+            "pool_class": type(pool).__name__,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_ms_total": round(self.wait_ms_total, 3),
+            "connections_created": self.connections_created,
+            "connections_invalidated": self.connections_invalidated,
+            "checkout_latency_ms": self.checkout_latency.snapshot(),
+        }
+        # Live figures are only available on queue-based pools
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            if hasattr(pool, name):
+                stats[name] = getattr(pool, name)()
+        return stats
+
+
+# Metrics of every instrumented engine, by name ("primary", "async", ...)
+POOLS = {}
+
+def instrumented_pool_class(base, metrics: PoolMetrics):
+    """Subclass `base` so the time spent waiting for a connection is recorded.
+
+    The metrics live on the class, so they survive `pool.recreate()` (which
+    builds a new pool of the same class) after `engine.dispose()`.
+    """
+
+    class InstrumentedPool(base):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                conn = super()._do_get()
+            except exc.TimeoutError:
+                metrics.record_checkout((time.perf_counter() - start) * 1000, timed_out=True)
+                raise
+            metrics.record_checkout((time.perf_counter() - start) * 1000)
+            return conn
+
+    InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+    return InstrumentedPool
+
+def instrument_engine(engine, name: str, metrics: PoolMetrics):
+    """Attach connection lifecycle listeners and register the engine for `pool_stats()`."""
+    target = getattr(engine, "sync_engine", engine)
+    event.listen(target, "connect", lambda *args: metrics.record_connect())
+    event.listen(target, "invalidate", lambda *args: metrics.record_invalidate())
+    event.listen(target, "soft_invalidate", lambda *args: metrics.record_invalidate())
+    POOLS[name] = (target, metrics)
+
+def pool_stats() -> dict:
+    return {name: metrics.snapshot(engine.pool) for name, (engine, metrics) in POOLS.items()}
+
+
+class RouteMetrics:
+    """Per-route request counters and histograms, fed by the instrumentation middleware."""
+
+    def __init__(self):
+        self.duration = Histogram()
+        self.db_time = Histogram()
+        self.statements = 0
+        self.responses = {}
+        self._lock = threading.Lock()
+
+    def record(self, status: int, duration_ms: float, db_ms: float, statements: int):
+        self.duration.observe(duration_ms)
+        self.db_time.observe(db_ms)
+        with self._lock:
+            self.statements += statements
+            self.responses[status] = self.responses.get(status, 0) + 1
+
+
+# Metrics of every route, by (method, route path template)
+ROUTES = {}
+_routes_lock = threading.Lock()
+
+def route_metrics(method: str, route: str) -> RouteMetrics:
+    metrics = ROUTES.get((method, route))
+    if metrics is None:
+        with _routes_lock:
+            metrics = ROUTES.setdefault((method, route), RouteMetrics())
+    return metrics
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels.items()) + "}"
+
+def _histogram_lines(name: str, snapshot: dict, **labels) -> list:
+    lines = [f"{name}_bucket{_labels(**labels, le=bound)} {count}" for bound, count in snapshot["buckets"].items()]
+    lines.append(f"{name}_sum{_labels(**labels)} {snapshot['sum_ms']}")
+    lines.append(f"{name}_count{_labels(**labels)} {snapshot['count']}")
+    return lines
+
+def prometheus_text() -> str:
+    """All route and pool metrics in the Prometheus text exposition format."""
+    lines = [
+        "# HELP http_requests_total Requests by route and status code.",
+        "# TYPE http_requests_total counter",
+    ]
+    routes = sorted(ROUTES.items())
+    for (method, route), metrics in routes:
+        for status, count in sorted(metrics.responses.items()):
+            lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+    lines += [
+        "# HELP http_request_duration_ms Request latency until the response starts, in milliseconds.",
+        "# TYPE http_request_duration_ms histogram",
+    ]
+    for (method, route), metrics in routes:
+        lines += _histogram_lines("http_request_duration_ms", metrics.duration.snapshot(), method=method, route=route)
+    lines += [
+        "# HELP http_request_db_ms Time spent executing SQL per request, in milliseconds.",
+        "# TYPE http_request_db_ms histogram",
+    ]
+    for (method, route), metrics in routes:
+        lines += _histogram_lines("http_request_db_ms", metrics.db_time.snapshot(), method=method, route=route)
+    lines += [
+        "# HELP http_request_db_statements_total SQL statements executed by requests.",
+        "# TYPE http_request_db_statements_total counter",
+    ]
+    for (method, route), metrics in routes:
+        lines.append(f"http_request_db_statements_total{_labels(method=method, route=route)} {metrics.statements}")
+    lines += [
+        "# HELP db_pool_checkout_wait_ms Time spent waiting for a pooled connection, in milliseconds.",
+        "# TYPE db_pool_checkout_wait_ms histogram",
+    ]
+    for name, (_, metrics) in POOLS.items():
+        lines += _histogram_lines("db_pool_checkout_wait_ms", metrics.checkout_latency.snapshot(), pool=name)
+    return "\n".join(lines) + "\n"
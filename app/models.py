@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, JSON, Date
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, String, Text, ForeignKey, JSON, Date, DateTime, Index, func
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 
 from .database import Base
 
@@ -10,8 +11,21 @@ class Faculty(Base):
     
     groups = relationship("Group", back_populates="faculty")
 
+class FacultyStat(Base):
+    """Per-faculty totals over groups, maintained by triggers on `groups` (migration 0004)."""
+    __tablename__ = 'faculty_stats'
+    faculty_id = Column(Integer, ForeignKey('faculties.id', ondelete='CASCADE'), primary_key=True)
+    total_students = Column(BigInteger, nullable=False, default=0)
+    group_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
 class Group(Base):
     __tablename__ = 'groups'
+    __table_args__ = (
+        Index('ix_groups_faculty_id_num_students', 'faculty_id', 'num_students'),
+        Index('ix_groups_course_id', 'course', 'id'),
+        Index('ix_groups_num_students_id', 'num_students', 'id'),
+    )
     id = Column(Integer, primary_key=True, index=True)
     code = Column(String, unique=True, index=True, nullable=False)
     course = Column(Integer, nullable=False)
@@ -34,9 +48,12 @@ class Subject(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False, unique=True)
     num_hours = Column(Integer, nullable=False)
-    extra = Column(JSON)
+    # JSONB on Postgres (migration 0006), with a jsonb_path_ops GIN index for @> queries
+    extra = Column(JSON().with_variant(JSONB(), "postgresql"))
+    # Full-text document over name + notes, maintained by a trigger (migration 0007); never loaded
+    search_vector = deferred(Column(Text().with_variant(TSVECTOR(), "postgresql")))
     
-    department_id = Column(Integer, ForeignKey('departments.id'))
+    department_id = Column(Integer, ForeignKey('departments.id'), index=True)
     department = relationship("Department", back_populates="subjects")
     
     sessions = relationship("Session", back_populates="subject")
@@ -49,10 +66,23 @@ class Teacher(Base):
     sessions = relationship("Session", back_populates="teacher")
 
 class Session(Base):
+    """Range-partitioned by session_date, one partition per year (migration 0008, app/partitions.py).
+
+    In the database the primary key is (id, session_date), since a partitioned
+    table's key must contain the partition key; `id` alone stays the ORM identity
+    (ids come from one sequence).
+    """
     __tablename__ = 'sessions'
+    __table_args__ = (
+        # Schedules and double-booking checks (migration 0009)
+        Index('ix_sessions_teacher_id_date', 'teacher_id', 'session_date', 'id'),
+        Index('ix_sessions_group_id_date', 'group_id', 'session_date', 'id'),
+        Index('ix_sessions_subject_id_date', 'subject_id', 'session_date', 'id'),
+        {'postgresql_partition_by': 'RANGE (session_date)'},
+    )
     id = Column(Integer, primary_key=True, index=True)
     control_type = Column(String, nullable=False)
-    session_date = Column(Date, nullable=False)
+    session_date = Column(Date, nullable=False, index=True)
     
     group_id = Column(Integer, ForeignKey('groups.id'))
     subject_id = Column(Integer, ForeignKey('subjects.id'))
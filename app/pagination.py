@@ -0,0 +1,24 @@
+import base64
+import json
+
+# --- Opaque cursors for keyset (seek) pagination ---
+#
+# A cursor is the sort key of the last row of a page, JSON encoded and wrapped
+# in url-safe base64 so clients treat it as an opaque token.
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> list:
+    """Decode a cursor produced by `encode_cursor`, raising ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Malformed cursor") from exc
+    if not isinstance(values, list) or not values:
+        raise ValueError("Malformed cursor")
+    return values
@@ -0,0 +1,111 @@
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+# --- Partitions of the sessions table ---
+#
+# Since migration 0008 `sessions` is range-partitioned by session_date, one
+# partition per calendar year (sessions_y2025 holds 2025-01-01 .. 2025-12-31),
+# plus sessions_default for dates without a partition. Indexes are declared on
+# the parent, so every partition gets them. Queries that filter on
+# session_date only scan the matching partitions, and a year of history is
+# removed by detaching its partition instead of a DELETE.
+#
+# Create partitions ahead of time (scripts/manage_partitions.py create): rows
+# that land in sessions_default have to be moved when their year's partition is
+# created, which ensure_partitions does in the same transaction.
+
+PARENT = "sessions"
+PARTITION_PREFIX = "sessions_y"
+DEFAULT_PARTITION = "sessions_default"
+ARCHIVE_SCHEMA = "archive"
+
+PARTITIONS_SQL = text("""
+    SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+    FROM pg_inherits
+    JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    WHERE parent.relname = :parent
+    ORDER BY child.relname
+""")
+
+
+def partition_name(year: int) -> str:
+    return f"{PARTITION_PREFIX}{year}"
+
+def partition_year(name: str) -> Optional[int]:
+    suffix = name[len(PARTITION_PREFIX):]
+    return int(suffix) if name.startswith(PARTITION_PREFIX) and suffix.isdigit() else None
+
+def create_partition_sql(year: int) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(year)} PARTITION OF {PARENT} "
+        f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+    )
+
+def list_partitions(conn) -> List[Tuple[str, str]]:
+    """ (name, bound) of every attached partition """
+    return [tuple(row) for row in conn.execute(PARTITIONS_SQL, {"parent": PARENT})]
+
+def attached_years(conn) -> List[int]:
+    return sorted(year for year in (partition_year(name) for name, _ in list_partitions(conn)) if year is not None)
+
+def default_partition_rows(conn, year: Optional[int] = None) -> int:
+    """ Rows without a yearly partition (only those of `year` when given); they block creating that year's partition """
+    if year is None:
+        return conn.scalar(text(f"SELECT count(*) FROM {DEFAULT_PARTITION}"))
+    return conn.scalar(text(f"SELECT count(*) FROM {DEFAULT_PARTITION} WHERE {year_condition(year)}"))
+
+def year_condition(year: int) -> str:
+    return f"session_date >= '{year}-01-01' AND session_date < '{year + 1}-01-01'"
+
+def missing_years(conn, years_ahead: int = 2, today: Optional[date] = None) -> List[int]:
+    """ Years from the current one to `years_ahead` years ahead that have no partition yet """
+    current = (today or date.today()).year
+    existing = set(attached_years(conn))
+    return [year for year in range(current, current + years_ahead + 1) if year not in existing]
+
+def create_partition_moving_rows_sql(year: int) -> List[str]:
+    """ Create a year's partition when sessions_default already holds rows of that year.
+
+    Postgres refuses to create the partition over them, so within one transaction
+    they are moved to a temporary table, the partition is created and they are
+    inserted back through `sessions`, landing in the new partition.
+    """
+    moving = f"{PARENT}_moving_{year}"
+    return [
+        f"CREATE TEMPORARY TABLE {moving} (LIKE {PARENT}) ON COMMIT DROP",
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE {year_condition(year)} RETURNING *) "
+        f"INSERT INTO {moving} SELECT * FROM moved",
+        create_partition_sql(year),
+        f"INSERT INTO {PARENT} SELECT * FROM {moving}",
+    ]
+
+def partition_statements(conn, year: int) -> Tuple[List[str], int]:
+    """ (statements creating the partition of `year`, rows they move out of sessions_default) """
+    rows = default_partition_rows(conn, year)
+    return (create_partition_moving_rows_sql(year) if rows else [create_partition_sql(year)]), rows
+
+def ensure_partitions(conn, years_ahead: int = 2, today: Optional[date] = None) -> Dict[int, int]:
+    """ Create the missing partitions up to `years_ahead` years ahead; returns {new year: rows moved from the default} """
+    created = {}
+    for year in missing_years(conn, years_ahead, today):
+        statements, created[year] = partition_statements(conn, year)
+        for statement in statements:
+            conn.execute(text(statement))
+    return created
+
+def detach_partition_sql(year: int) -> str:
+    # Not CONCURRENTLY: Postgres does not allow it while the table has a default partition
+    return f"ALTER TABLE {PARENT} DETACH PARTITION {partition_name(year)}"
+
+def archive_partition_sql(year: int) -> List[str]:
+    """ Move a detached partition to the archive schema (still queryable, no longer in `sessions`) """
+    return [
+        f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}",
+        f"ALTER TABLE {partition_name(year)} SET SCHEMA {ARCHIVE_SCHEMA}",
+    ]
+
+def drop_partition_sql(year: int) -> List[str]:
+    return [f"DROP TABLE {partition_name(year)}"]
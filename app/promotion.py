@@ -0,0 +1,184 @@
+import threading
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import func, select, text, update
+
+from . import cache, models
+from .database import engine
+
+# --- End-of-year course promotion ---
+#
+# Every group moves up one course. Courses are processed from the highest down,
+# so a group promoted from course c to c + 1 is never seen again: course c + 1
+# has already been done. Within a course the groups are walked in id order
+# (index ix_groups_course_id) and updated PROMOTION_CHUNK_SIZE keys at a time,
+# each chunk in its own short transaction, so row locks are held for one chunk
+# and an interrupted run can resume with `start_course` / `after_id`.
+#
+# Only one promotion may write at a time: in-process by PromotionJob.lock and,
+# on Postgres, across workers by a session-level advisory lock.
+
+PROMOTION_CHUNK_SIZE = 1000
+PROMOTION_LOCK_KEY = 0x70726F6D  # pg_advisory_lock key, "prom"
+
+JOB_PENDING, JOB_RUNNING, JOB_DONE, JOB_FAILED = "pending", "running", "done", "failed"
+
+
+class PromotionInProgress(Exception):
+    pass
+
+
+def course_counts(conn) -> Dict[int, int]:
+    """ Number of groups per course, highest course first """
+    stmt = (
+        select(models.Group.course, func.count())
+        .group_by(models.Group.course)
+        .order_by(models.Group.course.desc())
+    )
+    return {course: count for course, count in conn.execute(stmt)}
+
+def promote_chunk(conn, course: int, after_id: int, chunk_size: int) -> List[int]:
+    """ Promote the next `chunk_size` groups of `course` with id > after_id; returns their ids """
+    batch = (
+        select(models.Group.id)
+        .where(models.Group.course == course, models.Group.id > after_id)
+        .order_by(models.Group.id)
+        .limit(chunk_size)
+    )
+    stmt = (
+        update(models.Group)
+        .where(models.Group.id.in_(batch))
+        .values(course=models.Group.course + 1)
+        .returning(models.Group.id)
+    )
+    return conn.execute(stmt).scalars().all()
+
+
+class PromotionJob:
+    """ State and progress of one promotion run; `run` executes it in the calling thread. """
+
+    lock = threading.Lock()
+
+    def __init__(self, dry_run: bool = False, chunk_size: int = PROMOTION_CHUNK_SIZE,
+                 start_course: Optional[int] = None, after_id: int = 0):
+        self.id = uuid.uuid4().hex
+        self.dry_run = dry_run
+        self.chunk_size = chunk_size
+        self.start_course = start_course
+        self.after_id = after_id
+        self.status = JOB_PENDING
+        self.planned: Dict[int, int] = {}
+        self.promoted: Dict[int, int] = {}
+        self.current_course: Optional[int] = None
+        self.last_id: Optional[int] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+
+    def run(self, progress: Optional[Callable[["PromotionJob"], None]] = None, lock_held: bool = False):
+        """ Run the job; `progress` is called after every committed chunk.
+
+        `lock_held`: the caller already acquired PromotionJob.lock for this job
+        (start_job); it is released when the job ends.
+        """
+        self.status = JOB_RUNNING
+        try:
+            if self.dry_run:
+                with engine.connect() as conn:
+                    self.planned = self.select_courses(course_counts(conn))
+            else:
+                self.promote(progress, lock_held)
+            self.status = JOB_DONE
+        except Exception as e:
+            self.status, self.error = JOB_FAILED, str(e)
+            raise
+        finally:
+            self.finished_at = datetime.utcnow()
+
+    def select_courses(self, counts: Dict[int, int]) -> Dict[int, int]:
+        return {c: n for c, n in counts.items() if self.start_course is None or c <= self.start_course}
+
+    def promote(self, progress, lock_held: bool = False):
+        if not lock_held and not PromotionJob.lock.acquire(blocking=False):
+            raise PromotionInProgress("Another promotion is running in this process.")
+        try:
+            with engine.connect() as lock_conn:
+                advisory = lock_conn.dialect.name == "postgresql"
+                if advisory and not lock_conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": PROMOTION_LOCK_KEY}):
+                    raise PromotionInProgress("Another promotion is running.")
+                try:
+                    lock_conn.commit()
+                    self.planned = self.select_courses(course_counts(lock_conn))
+                    lock_conn.commit()
+                    for course in self.planned:
+                        self.promote_course(course, progress)
+                finally:
+                    if advisory:
+                        lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": PROMOTION_LOCK_KEY})
+                        lock_conn.commit()
+        finally:
+            PromotionJob.lock.release()
+
+    def promote_course(self, course: int, progress):
+        self.current_course, self.promoted[course] = course, 0
+        after_id = self.last_id = self.after_id if course == self.start_course else 0
+        while True:
+            with engine.begin() as conn:
+                ids = promote_chunk(conn, course, after_id, self.chunk_size)
+            if not ids:
+                break
+            after_id = self.last_id = max(ids)
+            self.promoted[course] += len(ids)
+            cache.invalidate("groups")
+            if progress is not None:
+                progress(self)
+
+    def status_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "dry_run": self.dry_run,
+            "planned": self.planned,
+            "promoted": self.promoted,
+            "current_course": self.current_course,
+            "last_id": self.last_id,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+# --- Background jobs for the API ---
+
+JOBS: Dict[str, PromotionJob] = {}
+JOBS_KEPT = 100
+
+def start_job(**options) -> PromotionJob:
+    """ Start a promotion in a background thread; raises PromotionInProgress if one is writing """
+    job = PromotionJob(**options)
+    # Taken here, not in the thread, so two concurrent requests cannot both start a promotion
+    if not job.dry_run and not PromotionJob.lock.acquire(blocking=False):
+        raise PromotionInProgress("Another promotion is running in this process.")
+    for old in sorted(JOBS.values(), key=lambda j: j.created_at)[:max(0, len(JOBS) - JOBS_KEPT + 1)]:
+        if old.status in (JOB_DONE, JOB_FAILED):
+            del JOBS[old.id]
+    JOBS[job.id] = job
+
+    def target():
+        try:
+            job.run(lock_held=not job.dry_run)
+        except Exception:
+            pass  # recorded in job.status / job.error
+
+    try:
+        threading.Thread(target=target, name=f"promotion-{job.id}", daemon=True).start()
+    except Exception:
+        if not job.dry_run:
+            PromotionJob.lock.release()
+        raise
+    return job
+
+def get_job(job_id: str) -> Optional[PromotionJob]:
+    return JOBS.get(job_id)
@@ -0,0 +1,263 @@
+import asyncio
+import logging
+import os
+import select as select_module
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import select
+
+from . import models, schemas
+from .database import SessionLocal, engine
+
+# --- In-process snapshot of the reference tables ---
+#
+# Faculties, departments, teachers and subjects are small and rarely change, so
+# every worker keeps them in memory: one ReferenceTable per table, rows stored
+# as tuples by id. The bulk creates check foreign keys against the snapshot
+# and the *details endpoints nest these rows from it instead of joining them.
+# An id missing from the snapshot (a row newer than the snapshot) is looked up
+# in the database, so a stale snapshot never rejects or drops a valid row.
+#
+# Invalidation: statement-level triggers (migration 0010) send
+# NOTIFY reference_data, '<table>' on every write, and a listener thread in each
+# worker marks that table stale; it is reloaded on next use. Writes through this
+# worker invalidate locally as well, and a table older than
+# REFERENCE_MAX_AGE seconds is reloaded in case a notification was missed
+# (e.g. without psycopg2, where there is no listener). Tables are always
+# (re)loaded from the primary, never through a request's (possibly replica) session.
+# The async routes (DB_ASYNC=1) never reload on the event loop: they refresh the
+# tables they need in a worker thread first (refresh_async), and a table found
+# stale on the loop anyway is served as is while it reloads in the background.
+# The snapshot is opt-in (REFERENCE_SNAPSHOT=1); when off, the *details
+# endpoints join the relations in the database and every lookup goes there.
+
+REFERENCE_SNAPSHOT = os.getenv("REFERENCE_SNAPSHOT", "0").lower() in ("1", "true", "yes")
+REFERENCE_MAX_AGE = float(os.getenv("REFERENCE_MAX_AGE", "300"))
+REFERENCE_CHANNEL = "reference_data"
+LISTEN_RECONNECT_SECONDS = 5
+
+# Table name -> (model, read schema whose fields are kept)
+REFERENCE_TABLES = {
+    "faculties": (models.Faculty, schemas.Faculty),
+    "departments": (models.Department, schemas.Department),
+    "teachers": (models.Teacher, schemas.Teacher),
+    "subjects": (models.Subject, schemas.Subject),
+}
+
+logger = logging.getLogger("app.reference")
+
+
+class ReferenceTable:
+    """Rows of one table by id, as tuples that share one tuple of column names."""
+
+    __slots__ = ("columns", "rows", "loaded_at")
+
+    def __init__(self, columns: Iterable[str], rows: Iterable[tuple]):
+        self.columns = tuple(columns)
+        id_index = self.columns.index("id")
+        self.rows = {row[id_index]: tuple(row) for row in rows}
+        self.loaded_at = time.monotonic()
+
+    def get(self, id: int) -> Optional[dict]:
+        row = self.rows.get(id)
+        return dict(zip(self.columns, row)) if row is not None else None
+
+    def __contains__(self, id) -> bool:
+        return id in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def reference_columns(name: str) -> list:
+    model, schema = REFERENCE_TABLES[name]
+    return [model.__table__.c[field] for field in schema.model_fields if field in model.__table__.c]
+
+def load_table(db, name: str) -> ReferenceTable:
+    columns = reference_columns(name)
+    return ReferenceTable([c.name for c in columns], db.execute(select(*columns)).all())
+
+
+class ReferenceSnapshot:
+    def __init__(self):
+        self.tables: Dict[str, ReferenceTable] = {}
+        self.version = 0
+        self._stale = set(REFERENCE_TABLES)
+        self._invalidations = dict.fromkeys(REFERENCE_TABLES, 0)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._background = set()
+
+    def invalidate(self, *names: str):
+        """Mark tables (all when none are given) to be reloaded on next use."""
+        with self._lock:
+            for name in names or REFERENCE_TABLES:
+                if name in REFERENCE_TABLES:
+                    self._stale.add(name)
+                    self._invalidations[name] += 1
+            self.version += 1
+
+    def is_fresh(self, name: str) -> bool:
+        table = self.tables.get(name)
+        return (
+            table is not None and name not in self._stale
+            and time.monotonic() - table.loaded_at < REFERENCE_MAX_AGE
+        )
+
+    def table(self, name: str) -> ReferenceTable:
+        """The snapshot of `name`, (re)loaded from the primary if it is stale."""
+        if not self.is_fresh(name):
+            if on_event_loop():
+                return self.reload_in_background(name)
+            with self._load_lock:
+                if not self.is_fresh(name):
+                    with self._lock:
+                        invalidations = self._invalidations[name]
+                    with SessionLocal() as db:
+                        self.tables[name] = load_table(db, name)
+                    # Only once the rows are loaded (a failed load leaves the table stale), and only
+                    # if no notification arrived during the load, which may not be in the new rows
+                    with self._lock:
+                        if self._invalidations[name] == invalidations:
+                            self._stale.discard(name)
+        return self.tables[name]
+
+    def reload_in_background(self, name: str) -> ReferenceTable:
+        """The rows at hand (none before the first load) while `name` reloads in a worker thread.
+        Ids missing from them are read through the request's own session (see resolve)."""
+        with self._lock:
+            if name not in self._background:
+                self._background.add(name)
+                future = asyncio.get_running_loop().run_in_executor(None, self.table, name)
+                future.add_done_callback(lambda f: self._reloaded(name, f))
+        table = self.tables.get(name)
+        return table if table is not None else ReferenceTable([c.name for c in reference_columns(name)], [])
+
+    def _reloaded(self, name: str, future):
+        with self._lock:
+            self._background.discard(name)
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning("reference table %s not reloaded: %s", name, future.exception())
+
+    def stats(self) -> dict:
+        return {
+            "enabled": REFERENCE_SNAPSHOT,
+            "version": self.version,
+            "tables": {name: len(table) for name, table in self.tables.items()},
+            "stale": sorted(self._stale),
+        }
+
+snapshot = ReferenceSnapshot()
+
+def on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+# --- Lookups used by crud.py ---
+
+def covers(model) -> bool:
+    return REFERENCE_SNAPSHOT and model.__tablename__ in REFERENCE_TABLES
+
+def known_ids(db, model, ids: set) -> set:
+    """The subset of `ids` present in the snapshot (empty when `model` is not covered)."""
+    if not covers(model):
+        return set()
+    table = snapshot.table(model.__tablename__)
+    return {id for id in ids if id in table}
+
+def resolve(db, model, ids: set) -> Dict[int, dict]:
+    """Rows of `model` by id as dicts; ids missing from the snapshot are read from the database.
+    None and ids that are not in the database either are left out."""
+    name = model.__tablename__
+    table = snapshot.table(name)
+    found = {id: table.get(id) for id in ids if id in table}
+    missing = {id for id in ids if id is not None} - set(found)
+    if missing:
+        columns = reference_columns(name)
+        for row in db.execute(select(*columns).where(model.id.in_(missing))).mappings():
+            found[row["id"]] = dict(row)
+        snapshot.invalidate(name)  # newer rows exist than the snapshot holds
+    return found
+
+async def refresh_async(*models):
+    """Reload the stale snapshot tables of `models` in a worker thread, off the event loop."""
+    loop = asyncio.get_running_loop()
+    for model in models:
+        if covers(model) and not snapshot.is_fresh(model.__tablename__):
+            await loop.run_in_executor(None, snapshot.table, model.__tablename__)
+
+def written(model):
+    """Invalidate the local snapshot after a write through this worker."""
+    if covers(model):
+        snapshot.invalidate(model.__tablename__)
+
+
+# --- LISTEN/NOTIFY ---
+
+class ReferenceListener(threading.Thread):
+    """Waits for reference_data notifications on a dedicated connection and invalidates the snapshot."""
+
+    def __init__(self):
+        super().__init__(name="reference-listener", daemon=True)
+        self.stopped = threading.Event()
+        self.reconnecting = False
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.listen()
+            except Exception as e:
+                logger.warning("reference listener disconnected: %s", e)
+                self.reconnecting = True
+                self.stopped.wait(LISTEN_RECONNECT_SECONDS)
+
+    def listen(self):
+        pooled = engine.raw_connection()
+        pooled.detach()  # a long-lived connection of its own, not returned to the pool
+        conn = pooled.dbapi_connection
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {REFERENCE_CHANNEL}")
+            if self.reconnecting:
+                # Anything may have changed while no one was listening
+                snapshot.invalidate()
+                self.reconnecting = False
+            while not self.stopped.is_set():
+                if select_module.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    snapshot.invalidate(conn.notifies.pop(0).payload)
+        finally:
+            conn.close()
+
+    def stop(self):
+        self.stopped.set()
+
+listener: Optional[ReferenceListener] = None
+
+def start():
+    """Load the snapshot and start the listener (application startup)."""
+    global listener
+    if not REFERENCE_SNAPSHOT:
+        return
+    # Listen first, so writes during the initial load are not missed
+    if engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg2":
+        listener = ReferenceListener()
+        listener.start()
+    try:
+        for name in REFERENCE_TABLES:
+            snapshot.table(name)
+    except Exception as e:  # the database may come up later; tables then load on first use
+        logger.warning("reference snapshot not loaded at startup: %s", e)
+
+def stop():
+    if listener is not None:
+        listener.stop()
@@ -0,0 +1,103 @@
+import itertools
+import os
+import threading
+import time
+from typing import List, Optional
+
+from sqlalchemy.exc import DBAPIError
+
+# --- Read replicas ---
+#
+# Read-only GET routes take their session from get_read_db / get_async_read_db
+# (database.py), which connect to one of the DATABASE_REPLICA_URLS:
+#   REPLICA_STRATEGY=round_robin        - rotate over the replicas
+#   REPLICA_STRATEGY=least_connections  - the replica with the fewest checked-out connections
+# A replica that fails to connect is skipped for REPLICA_RETRY_SECONDS; when
+# none is available reads fall back to the primary.
+#
+# Read-your-writes: a successful POST/PUT/PATCH/DELETE sets the STICKY_COOKIE
+# for REPLICA_STICKY_SECONDS (longer than the expected replication lag), and
+# reads carrying it go to the primary.
+
+REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_STRATEGY = os.getenv("REPLICA_STRATEGY", "round_robin").lower()
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+
+STICKY_COOKIE = "read_primary"
+
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+
+class ReplicaSet:
+    """The replica engines of one kind (sync or async), with health and balancing."""
+
+    def __init__(self, engines: list, strategy: str = REPLICA_STRATEGY, retry_seconds: float = REPLICA_RETRY_SECONDS):
+        self.engines = engines
+        self.strategy = strategy
+        self.retry_seconds = retry_seconds
+        self.down_until = {}
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.engines)
+
+    def candidates(self) -> List:
+        """Healthy replicas, in the order they should be tried."""
+        now = time.monotonic()
+        with self._lock:
+            healthy = [e for e in self.engines if self.down_until.get(e, 0) <= now]
+        if not healthy:
+            return []
+        if self.strategy == "least_connections":
+            return sorted(healthy, key=lambda e: e.pool.checkedout())
+        start = next(self._next) % len(healthy)
+        return healthy[start:] + healthy[:start]
+
+    def mark_down(self, engine):
+        with self._lock:
+            self.down_until[engine] = time.monotonic() + self.retry_seconds
+
+    def connect(self):
+        """A connection to a healthy replica, or None (use the primary)."""
+        for engine in self.candidates():
+            try:
+                return engine.connect()
+            except DBAPIError:
+                self.mark_down(engine)
+        return None
+
+    async def connect_async(self):
+        for engine in self.candidates():
+            try:
+                return await engine.connect()
+            except DBAPIError:
+                self.mark_down(engine)
+        return None
+
+
+def wants_primary(request) -> bool:
+    """The client wrote recently, so it must read its own writes from the primary."""
+    return STICKY_COOKIE in request.cookies
+
+
+class ReadYourWritesMiddleware:
+    """Pure ASGI middleware: successful writes pin the client's reads to the primary for a while."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        cookie = f"{STICKY_COOKIE}=1; Max-Age={REPLICA_STICKY_SECONDS}; Path=/; HttpOnly; SameSite=Lax"
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"set-cookie", cookie.encode("latin-1"))]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
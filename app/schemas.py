@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
-from datetime import date
+from typing import Dict, List, Optional
+from datetime import date, datetime
 
 # --- Base Schemas (for input data) ---
 
@@ -86,6 +86,14 @@ class Session(SessionBase):
     class Config:
         orm_mode = True
 
+class SubjectSearchResult(Subject):
+    score: float = Field(..., description="Trigram similarity of the best matching field (0..1)")
+    matched_on: str = Field(..., description="Field that matched best: name, notes or tags")
+
+class SubjectFtsResult(Subject):
+    rank: float = Field(..., description="ts_rank of the match (name weighs more than notes)")
+    snippet: str = Field(..., description="Notes fragments with the matched terms in <b></b>")
+
 # --- Schemas for Complex Responses (with nested objects) ---
 
 class GroupDetails(Group):
@@ -99,6 +107,70 @@ class SessionDetails(Session):
     subject: Subject
     teacher: Teacher
 
+class ScheduleEntry(BaseModel):
+    id: int
+    session_date: date
+    control_type: str
+    group_id: int
+    group_code: str
+    subject_id: int
+    subject_name: str
+    teacher_id: int
+    teacher_name: str
+    class Config:
+        orm_mode = True
+
+class SessionConflict(BaseModel):
+    owner_id: int = Field(..., description="Teacher or group id, depending on `kind`")
+    session_date: date
+    session_count: int
+    session_ids: List[int]
+    class Config:
+        orm_mode = True
+
 class FacultyStats(BaseModel):
     faculty_name: str
-    total_students: int
\ No newline at end of file
+    total_students: int
+    freshness: datetime = Field(..., description="When this faculty's totals last changed")
+
+class PromotionJobStatus(BaseModel):
+    id: str
+    status: str = Field(..., description="pending, running, done or failed")
+    dry_run: bool
+    planned: Dict[int, int] = Field(..., description="Groups per course to promote (course -> count)")
+    promoted: Dict[int, int] = Field(..., description="Groups promoted so far per original course")
+    current_course: Optional[int] = None
+    last_id: Optional[int] = Field(None, description="Last promoted group id of current_course; resume with start_course/after_id")
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+# --- Schemas for Bulk Create Responses ---
+
+class BulkItemError(BaseModel):
+    index: int
+    detail: str
+
+class FacultyBulkResult(BaseModel):
+    created: List[Faculty]
+    errors: List[BulkItemError]
+
+class DepartmentBulkResult(BaseModel):
+    created: List[Department]
+    errors: List[BulkItemError]
+
+class TeacherBulkResult(BaseModel):
+    created: List[Teacher]
+    errors: List[BulkItemError]
+
+class GroupBulkResult(BaseModel):
+    created: List[Group]
+    errors: List[BulkItemError]
+
+class SubjectBulkResult(BaseModel):
+    created: List[Subject]
+    errors: List[BulkItemError]
+
+class SessionBulkResult(BaseModel):
+    created: List[Session]
+    errors: List[BulkItemError]
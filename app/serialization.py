@@ -0,0 +1,62 @@
+import json
+import os
+from datetime import date, datetime
+
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the standard library encoder
+    orjson = None
+
+# --- Fast serialization path ---
+#
+# With SERIALIZATION=fast the read-only list endpoints select plain columns,
+# turn each row tuple into a dict and encode the page straight to JSON,
+# skipping ORM hydration, per-attribute Pydantic validation and
+# jsonable_encoder. The JSON produced is the same as the response_model path.
+
+FAST_SERIALIZATION = os.getenv("SERIALIZATION", "orm").lower() == "fast"
+
+# Label separator for joined columns, e.g. "group__code" -> row["group"]["code"]
+NESTED_SEPARATOR = "__"
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+if orjson is not None:
+    def dumps(content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+else:
+    _encoder = json.JSONEncoder(default=_default, separators=(",", ":"), ensure_ascii=False)
+
+    def dumps(content) -> bytes:
+        return _encoder.encode(content).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def rows_to_dicts(result) -> list:
+    """Column tuples -> dicts; labels with NESTED_SEPARATOR become nested objects."""
+    keys = list(result.keys())
+    if not any(NESTED_SEPARATOR in key for key in keys):
+        return [dict(zip(keys, row)) for row in result]
+
+    plan = [(key.split(NESTED_SEPARATOR, 1) if NESTED_SEPARATOR in key else (None, key)) for key in keys]
+    rows = []
+    for row in result:
+        item = {}
+        for (outer, inner), value in zip(plan, row):
+            if outer is None:
+                item[inner] = value
+            else:
+                item.setdefault(outer, {})[inner] = value
+        rows.append(item)
+    return rows
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import re
+import threading
+from typing import Callable, Hashable
+
+from sqlalchemy import event
+from sqlalchemy.engine import default as engine_default
+
+# --- Cached and prepared statements ---
+#
+# The hot getters in crud.py (get_by_id, get_*_by_name, get_group_by_code,
+# search_groups) no longer build a Query per call. Each statement is built once
+# per shape with bindparam() placeholders and kept in STATEMENTS (`cached`).
+# A statement object that is reused keeps its memoized cache key, so SQLAlchemy
+# neither rebuilds the construct nor recomputes the key. The key then finds the
+# compiled SQL in the engine's compiled cache.
+#
+# Statements built with execution_options(prepare=True) are also prepared on
+# the server when the driver is psycopg2. On first use on a connection the hook
+# below sends PREPARE stmt_<hash> AS <sql>. After that the statement runs as
+# EXECUTE stmt_<hash>(...), so Postgres skips parsing and planning. The
+# connection's .info records what it has prepared; it is cleared when the
+# connection is replaced. asyncpg prepares and caches every statement on its
+# own (prepared_statement_cache_size), so the hook is not needed there.
+# PREPARED_STATEMENTS=0 turns it off, e.g. behind a transaction-pooling
+# pgbouncer, where a session's prepared statements are not visible to the next
+# transaction.
+
+PREPARED_STATEMENTS = os.getenv("PREPARED_STATEMENTS", "1").lower() in ("1", "true", "yes")
+PREPARE_OPTION = "prepare"
+
+# pyformat placeholders, as psycopg2 statements are compiled
+PYFORMAT_PARAM = re.compile(r"%\((\w+)\)s")
+
+
+class StatementStats:
+    """Hit/miss counters of the statement cache, the compiled cache and the prepared statements."""
+
+    COUNTERS = (
+        "statement_hits", "statement_misses",
+        "compiled_hits", "compiled_misses",
+        "prepared_hits", "prepared_misses",
+    )
+
+    def __init__(self):
+        self.counts = dict.fromkeys(self.COUNTERS, 0)
+        self._lock = threading.Lock()
+
+    def count(self, name: str):
+        with self._lock:
+            self.counts[name] += 1
+
+    def reset(self):
+        with self._lock:
+            self.counts = dict.fromkeys(self.COUNTERS, 0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        stats = {"prepared_statements": PREPARED_STATEMENTS, "cached_statements": len(STATEMENTS), **counts}
+        for kind in ("statement", "compiled", "prepared"):
+            total = counts[f"{kind}_hits"] + counts[f"{kind}_misses"]
+            stats[f"{kind}_hit_rate"] = round(counts[f"{kind}_hits"] / total, 4) if total else None
+        return stats
+
+stats = StatementStats()
+
+
+# Statement shape -> statement, filled by `cached`
+STATEMENTS = {}
+_statements_lock = threading.Lock()
+
+def cached(key: Hashable, build: Callable):
+    """The statement stored under `key`, built by `build()` the first time."""
+    stmt = STATEMENTS.get(key)
+    if stmt is not None:
+        stats.count("statement_hits")
+        return stmt
+    stats.count("statement_misses")
+    with _statements_lock:
+        return STATEMENTS.setdefault(key, build())
+
+
+# --- SQLAlchemy hooks ---
+
+def prepared_name(statement: str) -> str:
+    return "stmt_" + hashlib.md5(statement.encode("utf-8")).hexdigest()[:16]
+
+def prepare_sql(statement: str):
+    """ (PREPARE body with $n placeholders, parameter names in $n order) for a pyformat statement """
+    names = list(dict.fromkeys(PYFORMAT_PARAM.findall(statement)))
+    body = PYFORMAT_PARAM.sub(lambda m: f"${names.index(m.group(1)) + 1}", statement)
+    # Sent without parameters, so psycopg2 leaves %% as is
+    return body.replace("%%", "%"), names
+
+def _prepare_statement(conn, cursor, statement, parameters, context, executemany):
+    if (
+        not PREPARED_STATEMENTS or executemany or context is None
+        or not context.execution_options.get(PREPARE_OPTION) or not isinstance(parameters, dict)
+    ):
+        return statement, parameters
+    prepared = conn.connection.info.setdefault("prepared_statements", {})
+    name = prepared_name(statement)
+    names = prepared.get(name)
+    if names is None:
+        stats.count("prepared_misses")
+        body, names = prepare_sql(statement)
+        cursor.execute(f"PREPARE {name} AS {body}")
+        prepared[name] = names
+    else:
+        stats.count("prepared_hits")
+    if not names:
+        return f"EXECUTE {name}", parameters
+    return f"EXECUTE {name}({', '.join(f'%({n})s' for n in names)})", parameters
+
+def _count_compiled(conn, cursor, statement, parameters, context, executemany):
+    if context is None or context.compiled is None:
+        return
+    if context.cache_hit is engine_default.CACHE_HIT:
+        stats.count("compiled_hits")
+    elif context.cache_hit is engine_default.CACHE_MISS:
+        stats.count("compiled_misses")
+
+def instrument_statements(engine):
+    """Attach the compiled-cache counters and, on psycopg2, the PREPARE/EXECUTE hook to an engine."""
+    target = getattr(engine, "sync_engine", engine)
+    event.listen(target, "after_cursor_execute", _count_compiled)
+    if target.dialect.name == "postgresql" and target.dialect.driver == "psycopg2":
+        event.listen(target, "before_cursor_execute", _prepare_statement, retval=True)
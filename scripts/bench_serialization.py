@@ -0,0 +1,146 @@
+"""
+Benchmark the response serialization paths of the read-only list endpoints.
+
+Compares, per page of rows:
+  orm  - ORM query -> response_model validation (from_attributes) -> JSON, as FastAPI does by default
+  fast - plain column select -> dicts -> JSON encoder (SERIALIZATION=fast)
+
+By default an in-memory SQLite database is created and seeded, so the script
+runs anywhere; pass --database-url to measure against a seeded PostgreSQL.
+Reports throughput (rows/s), time per page, and allocations per page (peak
+traced memory and number of allocated blocks, measured with tracemalloc in a
+separate pass so it does not distort the timings).
+
+Usage:
+    python scripts/bench_serialization.py [--rows 5000] [--limit 100] [--pages 200]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import crud, models, reference, schemas
+from app.serialization import dumps
+
+
+def seed(db, n_sessions: int):
+    faculty, department = models.Faculty(name="Bench Faculty"), models.Department(name="Bench Department")
+    db.add_all([faculty, department])
+    db.flush()
+    groups = [models.Group(code=f"B{i}", course=i % 5 + 1, num_students=20, faculty_id=faculty.id) for i in range(50)]
+    subjects = [
+        models.Subject(name=f"Bench Subject {i}", num_hours=64, department_id=department.id,
+                       extra={"notes": f"Bench notes {i}", "tags": ["bench"]})
+        for i in range(40)
+    ]
+    teachers = [models.Teacher(name=f"Bench Teacher {i}") for i in range(10)]
+    db.add_all(groups + subjects + teachers)
+    db.flush()
+    db.add_all([
+        models.Session(control_type="exam", session_date=date(2025, 1, 1) + timedelta(days=i % 365),
+                       group_id=groups[i % 50].id, subject_id=subjects[i % 40].id, teacher_id=teachers[i % 10].id)
+        for i in range(n_sessions)
+    ])
+    db.commit()
+
+
+def orm_path(db, adapter, fetch, limit):
+    def run(after_id):
+        items = fetch(db, 0, limit, after_id)
+        content = adapter.dump_python(adapter.validate_python(items, from_attributes=True), mode="json")
+        body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        db.expunge_all()  # every request starts with a fresh session / empty identity map
+        return len(items), body
+    return run
+
+
+def fast_path(db, fetch_rows, limit):
+    def run(after_id):
+        rows = fetch_rows(db, limit, after_id)
+        return len(rows), dumps(rows)
+    return run
+
+
+def measure(run, pages: int, limit: int, max_id: int):
+    positions = [(i * limit) % max(max_id - limit, 1) for i in range(pages)]
+    run(0)  # warm up statement caches
+    start = time.perf_counter()
+    rows = 0
+    for after_id in positions:
+        rows += run(after_id)[0]
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    sample = positions[: max(pages // 10, 1)]
+    blocks = 0
+    for after_id in sample:
+        before = tracemalloc.take_snapshot()
+        run(after_id)
+        after = tracemalloc.take_snapshot()
+        blocks += sum(stat.count for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "rows_per_s": round(rows / elapsed),
+        "ms_per_page": round(elapsed / pages * 1000, 3),
+        "peak_kib": round(peak / 1024, 1),
+        "blocks_per_page": round(blocks / len(sample)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--database-url", help="seeded database to read from (default: in-memory SQLite)")
+    parser.add_argument("--rows", type=int, default=5000, help="sessions to seed in the SQLite database")
+    parser.add_argument("--limit", type=int, default=100, help="rows per page")
+    parser.add_argument("--pages", type=int, default=200, help="pages per measurement")
+    args = parser.parse_args()
+
+    # Pin the JOIN paths (joinedload for orm, joined columns for fast): the
+    # reference snapshot would replace both, and it loads from DATABASE_URL, not --database-url
+    reference.REFERENCE_SNAPSHOT = False
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        models.Base.metadata.create_all(engine)
+        with sessionmaker(bind=engine)() as db:
+            seed(db, args.rows)
+
+    db = sessionmaker(bind=engine)()
+    max_id = db.query(models.Session.id).order_by(models.Session.id.desc()).limit(1).scalar() or 0
+    cases = {
+        "sessions": (
+            orm_path(db, TypeAdapter(List[schemas.Session]),
+                     lambda db, skip, limit, after: crud.get_all(db, models.Session, skip, limit, after), args.limit),
+            fast_path(db, lambda db, limit, after: crud.get_all_rows(db, models.Session, schemas.Session, 0, limit, after), args.limit),
+        ),
+        "sessions/details": (
+            orm_path(db, TypeAdapter(List[schemas.SessionDetails]), crud.get_session_details, args.limit),
+            fast_path(db, lambda db, limit, after: crud.get_details_rows(db, models.Session, schemas.Session, 0, limit, after), args.limit),
+        ),
+    }
+
+    print(f"{'endpoint':<18} {'path':<5} {'rows/s':>10} {'ms/page':>9} {'peak KiB':>9} {'blocks/page':>12}")
+    for name, (orm_run, fast_run) in cases.items():
+        assert json.loads(orm_run(0)[1]) == json.loads(fast_run(0)[1]), f"{name}: paths disagree"
+        for label, run in (("orm", orm_run), ("fast", fast_run)):
+            r = measure(run, args.pages, args.limit, max_id)
+            print(f"{name:<18} {label:<5} {r['rows_per_s']:>10} {r['ms_per_page']:>9} {r['peak_kib']:>9} {r['blocks_per_page']:>12}")
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
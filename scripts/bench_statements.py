@@ -0,0 +1,139 @@
+"""
+Benchmark the per-call overhead of the hot crud getters with and without cached statements.
+
+Compares, per call of get_by_id, get_group_by_code and search_groups:
+  query     - an ORM Query built on every call (how crud.py used to do it)
+  nocache   - the same with the compiled cache turned off, so the SQL is compiled every call
+  cached    - crud.py's statements, built once and found in the compiled cache (app/statements.py)
+  prepared  - cached, plus server-side PREPARE/EXECUTE (postgresql+psycopg2 only)
+
+By default an in-memory SQLite database is created and seeded, so the script
+runs anywhere; pass --database-url to measure against a seeded PostgreSQL,
+where the prepared row also shows the parse/plan time saved. Reports calls
+per second and microseconds per call, then the cache hit rates.
+
+Usage:
+    python scripts/bench_statements.py [--groups 2000] [--calls 5000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, tuple_
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import crud, models, statements
+from app.statements import instrument_statements
+
+
+def seed(db, n_groups: int):
+    faculty = models.Faculty(name="Bench Faculty")
+    db.add(faculty)
+    db.flush()
+    db.add_all([
+        models.Group(code=f"B{i:06d}", course=i % 5 + 1, num_students=10 + i % 30, faculty_id=faculty.id)
+        for i in range(n_groups)
+    ])
+    db.commit()
+
+
+# The getters as they were before app/statements.py, rebuilding the Query on every call
+
+def query_get_by_id(db, model, id):
+    return db.query(model).filter(model.id == id).first()
+
+def query_get_group_by_code(db, code):
+    return db.query(models.Group).filter(models.Group.code == code).first()
+
+def query_search_groups(db, faculty_id, min_students, sort_by, skip, limit, after=None):
+    query = db.query(models.Group)
+    if faculty_id:
+        query = query.filter(models.Group.faculty_id == faculty_id)
+    if min_students > 0:
+        query = query.filter(models.Group.num_students >= min_students)
+    order_by = [models.Group.id]
+    if sort_by:
+        order_by.insert(0, getattr(models.Group, sort_by))
+    query = query.order_by(*order_by)
+    if after is not None:
+        return query.filter(tuple_(*order_by) > tuple_(*after)).limit(limit).all()
+    return query.offset(skip).limit(limit).all()
+
+
+def cases(faculty_id: int, n_groups: int, limit: int):
+    """ name -> (old call, crud call); each takes the session and the call number """
+    return {
+        "get_by_id": (
+            lambda db, i: query_get_by_id(db, models.Group, i % n_groups + 1),
+            lambda db, i: crud.get_by_id(db, models.Group, i % n_groups + 1),
+        ),
+        "get_group_by_code": (
+            lambda db, i: query_get_group_by_code(db, f"B{i % n_groups:06d}"),
+            lambda db, i: crud.get_group_by_code(db, f"B{i % n_groups:06d}"),
+        ),
+        "search_groups": (
+            lambda db, i: query_search_groups(db, faculty_id, 20, "num_students", 0, limit, (20 + i % 10, i % n_groups)),
+            lambda db, i: crud.search_groups(db, faculty_id, 20, "num_students", 0, limit, (20 + i % 10, i % n_groups)),
+        ),
+    }
+
+
+def measure(Session, call, calls: int) -> dict:
+    with Session() as db:
+        call(db, 0)  # warm up the caches
+        start = time.perf_counter()
+        for i in range(calls):
+            call(db, i)
+            db.expunge_all()  # every request starts with a fresh session / empty identity map
+        elapsed = time.perf_counter() - start
+    return {"calls_per_s": round(calls / elapsed), "us_per_call": round(elapsed / calls * 1e6, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--database-url", help="seeded database to read from (default: in-memory SQLite)")
+    parser.add_argument("--groups", type=int, default=2000, help="groups to seed in the SQLite database")
+    parser.add_argument("--calls", type=int, default=5000, help="calls per measurement")
+    parser.add_argument("--limit", type=int, default=20, help="rows per search_groups page")
+    args = parser.parse_args()
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        models.Base.metadata.create_all(engine)
+        with sessionmaker(bind=engine)() as db:
+            seed(db, args.groups)
+    instrument_statements(engine)
+    prepares = engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg2"
+
+    Session = sessionmaker(bind=engine)
+    NoCacheSession = sessionmaker(bind=engine.execution_options(compiled_cache=None))
+    with Session() as db:
+        faculty_id = db.query(models.Group.faculty_id).limit(1).scalar()
+        n_groups = db.query(models.Group).count()
+    if not n_groups:
+        sys.exit("The database has no groups; seed it before running the benchmark.")
+
+    print(f"{'getter':<18} {'path':<9} {'calls/s':>9} {'us/call':>9}")
+    for name, (old_call, crud_call) in cases(faculty_id, n_groups, args.limit).items():
+        statements.PREPARED_STATEMENTS = False
+        runs = [("query", Session, old_call), ("nocache", NoCacheSession, old_call), ("cached", Session, crud_call)]
+        if prepares:
+            runs.append(("prepared", Session, crud_call))
+        for label, session_class, call in runs:
+            statements.PREPARED_STATEMENTS = label == "prepared"
+            r = measure(session_class, call, args.calls)
+            print(f"{name:<18} {label:<9} {r['calls_per_s']:>9} {r['us_per_call']:>9}")
+
+    print()
+    for key, value in statements.stats.snapshot().items():
+        print(f"{key:<22} {value}")
+
+
+if __name__ == '__main__':
+    main()
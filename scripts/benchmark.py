@@ -0,0 +1,351 @@
+"""
+Benchmark every crud query and API route, and compare the results across commits.
+
+For each scale factor (number of sessions; the other tables grow with its square
+root) the database in --database-url / DATABASE_URL is truncated and seeded with
+COPY (see scripts/populate_via_api.py), unless --no-reset is given, in which case
+the data already there is measured once.
+
+Then every function in app/crud.py (the list in scripts/explain_queries.py) is
+called directly, and every route of app/main.py is requested through the
+in-process ASGI test client. For each one the script records:
+  - latency distribution over --iterations runs (min, mean, p50, p95, p99, ms)
+  - SQL statements issued per call
+  - rows scanned per call (seq_tup_read + idx_tup_fetch from pg_stat_xact_user_tables)
+
+Everything runs on one connection inside a transaction, and every call inside a
+savepoint that is rolled back, so write routes always start from the seeded state
+and leave nothing behind. Export routes stream on their own connection, so their
+rows scanned are not available (reported as null). The response cache is off.
+
+Usage:
+    python scripts/benchmark.py --scales 1000,100000,10000000 --output bench.json
+    python scripts/benchmark.py --no-reset --output new.json --baseline old.json
+    python scripts/benchmark.py --compare old.json new.json [--threshold 0.2]
+
+With --baseline or --compare the exit status is 1 when a case regressed: p50 or
+p95 latency or rows scanned grew by more than --threshold (and latency by at
+least --min-delta-ms), or the number of statements grew.
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from random import Random
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(SCRIPTS_DIR, '..')))
+sys.path.insert(0, SCRIPTS_DIR)
+
+os.environ["CACHE_BACKEND"] = "off"  # measure the queries, not the response cache
+
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.database import engine, get_db, get_read_db
+from app.main import app, router
+from explain_queries import crud_calls, sample_values
+from populate_via_api import BASE_COUNTS, populate_via_copy
+
+SEEDED_TABLES = ["sessions", "groups", "subjects", "faculty_stats", "faculties", "departments", "teachers"]
+
+# Savepoints wrap every call (ours and the session's); they are not the code under test
+TRANSACTION_CONTROL = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+ROWS_SCANNED_SQL = text(
+    "SELECT COALESCE(SUM(seq_tup_read + COALESCE(idx_tup_fetch, 0)), 0) FROM pg_stat_xact_user_tables"
+)
+
+
+def route_cases(v: dict):
+    """(name, method, path, request kwargs) for every route; request kwargs may be a function of the iteration."""
+    group, subject, session = v["group"], v["subject"], v["session"]
+    day = str(session.session_date) if session else "2025-01-01"
+    new_session = {"group_id": group.id, "subject_id": subject.id, "teacher_id": v["teacher"].id,
+                   "control_type": "exam", "session_date": day}
+    return [
+        ("GET /", "GET", "/", {}),
+        ("GET /faculties/", "GET", "/faculties/", {}),
+        ("GET /departments/", "GET", "/departments/", {}),
+        ("GET /teachers/", "GET", "/teachers/", {}),
+        ("GET /groups/", "GET", "/groups/", {}),
+        ("GET /subjects/", "GET", "/subjects/", {}),
+        ("GET /sessions/", "GET", "/sessions/", {}),
+        ("GET /sessions/ (keyset)", "GET", "/sessions/", {"params": {"after_id": session.id // 2 if session else 0}}),
+        ("GET /groups/ (sparse)", "GET", "/groups/", {"params": {"fields": "id,code"}}),
+        ("GET /groups/ (ids)", "GET", "/groups/", {"params": {"ids": ",".join(str(group.id + i) for i in range(50))}}),
+        ("POST /faculties/", "POST", "/faculties/", lambda i: {"json": {"name": f"Benchmark Faculty {i}"}}),
+        ("POST /departments/", "POST", "/departments/", lambda i: {"json": {"name": f"Benchmark Department {i}"}}),
+        ("POST /teachers/", "POST", "/teachers/", lambda i: {"json": {"name": f"Benchmark Teacher {i}"}}),
+        ("POST /groups/", "POST", "/groups/", lambda i: {"json": {
+            "code": f"BENCH{i}", "course": 1, "num_students": 20, "faculty_id": group.faculty_id}}),
+        ("POST /subjects/", "POST", "/subjects/", lambda i: {"json": {
+            "name": f"Benchmark Subject {i}", "num_hours": 64, "department_id": subject.department_id,
+            "extra": {"notes": "benchmark", "tags": ["bench"]}}}),
+        ("POST /sessions/", "POST", "/sessions/", {"json": new_session}),
+        ("POST /faculties/bulk/", "POST", "/faculties/bulk/", lambda i: {"json": [
+            {"name": f"Benchmark Faculty {i}-{n}"} for n in range(100)]}),
+        ("POST /departments/bulk/", "POST", "/departments/bulk/", lambda i: {"json": [
+            {"name": f"Benchmark Department {i}-{n}"} for n in range(100)]}),
+        ("POST /teachers/bulk/", "POST", "/teachers/bulk/", lambda i: {"json": [
+            {"name": f"Benchmark Teacher {i}-{n}"} for n in range(100)]}),
+        ("POST /groups/bulk/", "POST", "/groups/bulk/", lambda i: {"json": [
+            {"code": f"BENCH{i}-{n}", "course": 1, "num_students": 20, "faculty_id": group.faculty_id}
+            for n in range(100)]}),
+        ("POST /subjects/bulk/", "POST", "/subjects/bulk/", lambda i: {"json": [
+            {"name": f"Benchmark Subject {i}-{n}", "num_hours": 64, "department_id": subject.department_id,
+             "extra": {"notes": "benchmark", "tags": ["bench"]}} for n in range(100)]}),
+        ("POST /sessions/bulk/", "POST", "/sessions/bulk/", {"json": [new_session] * 100}),
+        ("GET /groups/search/", "GET", "/groups/search/",
+         {"params": {"faculty_id": group.faculty_id, "min_students": group.num_students, "sort_by": "num_students"}}),
+        ("GET /groups/search/ (unfiltered)", "GET", "/groups/search/", {"params": {"sort_by": "code"}}),
+        ("GET /sessions/details/", "GET", "/sessions/details/", {}),
+        ("GET /sessions/details/ (sparse)", "GET", "/sessions/details/", {"params": {"fields": "session_date,group.code"}}),
+        ("GET /groups/details/", "GET", "/groups/details/", {}),
+        ("GET /subjects/details/", "GET", "/subjects/details/", {}),
+        ("PUT /groups/promote/", "PUT", "/groups/promote/", {"params": {"current_course": group.course}}),
+        # The job runs on its own connections, outside the rolled-back savepoint: dry runs only
+        ("POST /jobs/promotion/", "POST", "/jobs/promotion/", {"params": {"dry_run": True}}),
+        ("GET /jobs/promotion/{job_id}", "GET", "/jobs/promotion/unknown", {}),
+        ("GET /teachers/{teacher_id}/schedule/", "GET", f"/teachers/{v['teacher'].id}/schedule/",
+         {"params": {"date_from": day}}),
+        ("GET /groups/{group_id}/schedule/", "GET", f"/groups/{group.id}/schedule/",
+         {"params": {"date_from": day, "date_to": day}}),
+        ("GET /subjects/{subject_id}/schedule/", "GET", f"/subjects/{subject.id}/schedule/", {}),
+        ("GET /sessions/conflicts/", "GET", "/sessions/conflicts/", {"params": {"kind": "teacher"}}),
+        ("GET /sessions/conflicts/ (group, one day)", "GET", "/sessions/conflicts/",
+         {"params": {"kind": "group", "date_from": day, "date_to": day}}),
+        ("GET /reports/students-per-faculty/", "GET", "/reports/students-per-faculty/", {}),
+        ("GET /subjects/search-trgm/", "GET", "/subjects/search-trgm/", {"params": {"query": subject.name}}),
+        ("GET /subjects/search-regex/", "GET", "/subjects/search-regex/", {"params": {"pattern": "^This subject"}}),
+        ("GET /subjects/search-fts/", "GET", "/subjects/search-fts/", {"params": {"q": subject.name}}),
+        ("GET /subjects/by-tag/", "GET", "/subjects/by-tag/", {"params": {"tag": "tag1"}}),
+        ("GET /subjects/by-extra/", "GET", "/subjects/by-extra/", {"params": {"contains": '{"tags": ["tag1"]}'}}),
+        ("GET /export/sessions/", "GET", "/export/sessions/", {"params": {"date_from": day, "date_to": day}}),
+        ("GET /export/{entity}/", "GET", "/export/groups/", {"params": {"format": "csv"}}),
+        ("GET /metrics/pool", "GET", "/metrics/pool", {}),
+        ("GET /metrics", "GET", "/metrics", {}),
+    ]
+
+
+def uncovered_routes(cases) -> list:
+    covered = {name.split(" (")[0] for name, *_ in cases}
+    return [
+        f"{method} {route.path}"
+        for route in router.routes if isinstance(route, APIRoute)
+        for method in sorted(route.methods)
+        if f"{method} {route.path}" not in covered
+    ]
+
+
+def scale_counts(sessions: int) -> dict:
+    factor = sessions / BASE_COUNTS["sessions"]
+    counts = {entity: max(1, round(count * math.sqrt(factor))) for entity, count in BASE_COUNTS.items()}
+    counts["sessions"] = sessions
+    return counts
+
+def reset_and_seed(database_url: str, sessions: int, seed: int):
+    with engine.begin() as conn:
+        conn.execute(text(f"TRUNCATE {', '.join(SEEDED_TABLES)} RESTART IDENTITY CASCADE"))
+    counts = scale_counts(sessions)
+    print(f"Seeding {counts}")
+    populate_via_copy(database_url, counts, Random(seed))
+
+
+class Probe:
+    """Counts the statements issued on any connection and the rows scanned on ours."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.statements = 0
+        self.foreign = False
+        self._ours = conn.connection.dbapi_connection
+
+    def __call__(self, connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(TRANSACTION_CONTROL):
+            return
+        self.statements += 1
+        self.foreign |= connection.connection.dbapi_connection is not self._ours
+
+    def rows_scanned(self) -> int:
+        return int(self.conn.execute(ROWS_SCANNED_SQL).scalar())
+
+
+def distribution(samples: list) -> dict:
+    ordered = sorted(samples)
+
+    def pct(p):
+        return round(ordered[min(int(p / 100 * len(ordered)), len(ordered) - 1)], 3)
+
+    return {"min_ms": round(ordered[0], 3), "mean_ms": round(statistics.fmean(ordered), 3),
+            "p50_ms": pct(50), "p95_ms": pct(95), "p99_ms": pct(99)}
+
+def measure(conn, run, iterations: int) -> dict:
+    """Time `run(i)` in a rolled-back savepoint per iteration; the first run is a warm-up."""
+    probe = Probe(conn)
+    latencies, statements, scanned, errors = [], 0, 0, 0
+    for i in range(iterations + 1):
+        savepoint = conn.begin_nested()
+        before = probe.rows_scanned()
+        probe.statements = 0
+        event.listen(engine, "before_cursor_execute", probe)
+        start = time.perf_counter()
+        try:
+            ok = run(i)
+        except Exception as e:
+            ok = False
+            print(f"    error: {e}", file=sys.stderr)
+        elapsed = (time.perf_counter() - start) * 1000
+        event.remove(engine, "before_cursor_execute", probe)
+        scanned_now = probe.rows_scanned() - before
+        savepoint.rollback()
+        if i == 0:
+            continue
+        latencies.append(elapsed)
+        statements += probe.statements
+        scanned += scanned_now
+        errors += not ok
+    result = distribution(latencies)
+    result["statements"] = round(statements / iterations, 2)
+    result["rows_scanned"] = None if probe.foreign else round(scanned / iterations)
+    result["errors"] = errors
+    return result
+
+
+def run_scale(iterations: int) -> dict:
+    results = {"crud": {}, "routes": {}}
+    with engine.connect() as conn:
+        outer = conn.begin()
+
+        def new_session():
+            # crud functions commit; with a savepoint-joined session those commits stay inside `outer`
+            return Session(bind=conn, join_transaction_mode="create_savepoint")
+
+        v = sample_values(new_session())
+        for name, call in crud_calls(v):
+            def run(i, call=call):
+                with new_session() as db:
+                    call(db)
+                return True
+            results["crud"][name] = r = measure(conn, run, iterations)
+            print(f"  crud   {name:<36} p50 {r['p50_ms']:>9} ms  p95 {r['p95_ms']:>9} ms  "
+                  f"{r['statements']:>5} stmts  {r['rows_scanned']} rows")
+
+        def override_get_db():
+            with new_session() as db:
+                yield db
+
+        # Reads are measured on the same connection too, never on a replica
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_read_db] = override_get_db
+        cases = route_cases(v)
+        for missing in uncovered_routes(cases):
+            print(f"  WARNING: no benchmark case for route {missing}", file=sys.stderr)
+        try:
+            with TestClient(app) as client:
+                for name, method, path, kwargs in cases:
+                    def run(i, method=method, path=path, kwargs=kwargs):
+                        response = client.request(method, path, **(kwargs(i) if callable(kwargs) else kwargs))
+                        return response.status_code < 400
+                    results["routes"][name] = r = measure(conn, run, iterations)
+                    print(f"  route  {name:<36} p50 {r['p50_ms']:>9} ms  p95 {r['p95_ms']:>9} ms  "
+                          f"{r['statements']:>5} stmts  {r['rows_scanned']} rows")
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+            app.dependency_overrides.pop(get_read_db, None)
+        outer.rollback()
+    return results
+
+
+def compare(old: dict, new: dict, threshold: float, min_delta_ms: float) -> int:
+    """Print the cases that regressed between two result files; returns their number."""
+    regressions = 0
+    for scale, kinds in new["results"].items():
+        for kind, cases in kinds.items():
+            for name, n in cases.items():
+                o = old["results"].get(scale, {}).get(kind, {}).get(name)
+                if o is None:
+                    continue
+                reasons = [
+                    f"{key} {o[key]} -> {n[key]} ms"
+                    for key in ("p50_ms", "p95_ms")
+                    if n[key] > o[key] * (1 + threshold) and n[key] - o[key] >= min_delta_ms
+                ]
+                if n["statements"] > o["statements"]:
+                    reasons.append(f"statements {o['statements']} -> {n['statements']}")
+                if o["rows_scanned"] is not None and n["rows_scanned"] is not None \
+                        and n["rows_scanned"] > o["rows_scanned"] * (1 + threshold):
+                    reasons.append(f"rows scanned {o['rows_scanned']} -> {n['rows_scanned']}")
+                if reasons:
+                    regressions += 1
+                    print(f"REGRESSION [{scale}] {kind} {name}: {'; '.join(reasons)}")
+    print(f"{regressions} regression(s) (threshold {threshold:.0%}, min delta {min_delta_ms} ms).")
+    return regressions
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=SCRIPTS_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), help="used for seeding with COPY")
+    parser.add_argument("--scales", default="1000,100000,10000000", help="comma-separated session counts")
+    parser.add_argument("--no-reset", action="store_true", help="measure the data already in the database")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=20, help="measured runs per case (after one warm-up)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare the results with this earlier JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="only compare two result files")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative growth (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore latency changes smaller than this")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f_old, open(args.compare[1]) as f_new:
+            sys.exit(1 if compare(json.load(f_old), json.load(f_new), args.threshold, args.min_delta_ms) else 0)
+
+    results = {}
+    if args.no_reset:
+        print("Scale: current data")
+        results["current"] = run_scale(args.iterations)
+    else:
+        if not args.database_url:
+            sys.exit("Seeding needs --database-url or DATABASE_URL.")
+        for sessions in (int(s) for s in args.scales.split(",")):
+            print(f"Scale: {sessions} sessions")
+            reset_and_seed(args.database_url, sessions, args.seed)
+            results[str(sessions)] = run_scale(args.iterations)
+
+    with engine.connect() as conn:
+        server_version = conn.execute(text("SHOW server_version")).scalar()
+    report = {
+        "commit": git_commit(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "server_version": server_version,
+        "iterations": args.iterations,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            sys.exit(1 if compare(json.load(f), report, args.threshold, args.min_delta_ms) else 0)
+
+
+if __name__ == '__main__':
+    main()
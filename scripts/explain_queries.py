@@ -0,0 +1,153 @@
+"""
+Index advisor: run EXPLAIN (ANALYZE, BUFFERS) over every crud query and flag sequential scans.
+
+Each function in app/crud.py is called once against the database in DATABASE_URL
+(seed it first, e.g. with scripts/populate_via_api.py). The SQL statements it
+issues are captured and explained with the same parameters. Everything runs
+inside one transaction that is rolled back at the end, so write queries
+(promote_groups, create) leave no trace.
+
+Sequential scans on tables smaller than --min-rows are ignored, because the
+planner rightly prefers them there.
+
+Usage:
+    python scripts/explain_queries.py [--min-rows 1000] [--verbose]
+
+The exit status is 1 when a flagged sequential scan is found, so the script can
+guard new endpoints in CI.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app import crud, models, schemas
+from app.database import engine
+
+
+def sample_values(db: Session) -> dict:
+    """Pick real keys from the seeded database so every query has something to find."""
+    group = db.query(models.Group).order_by(models.Group.id).first()
+    subject = db.query(models.Subject).order_by(models.Subject.id).first()
+    if group is None or subject is None:
+        sys.exit("The database has no groups or subjects; seed it before running the advisor.")
+    return {
+        "group": group,
+        "subject": subject,
+        "faculty": db.get(models.Faculty, group.faculty_id),
+        "department": db.get(models.Department, subject.department_id),
+        "teacher": db.query(models.Teacher).order_by(models.Teacher.id).first(),
+        "session": db.query(models.Session).order_by(models.Session.id.desc()).first(),
+    }
+
+
+def crud_calls(v: dict):
+    """(name, call) for every query in crud.py; extend this list when adding crud functions."""
+    group, subject = v["group"], v["subject"]
+    last_session_id = v["session"].id if v["session"] else 0
+    day = v["session"].session_date if v["session"] else None
+    return [
+        ("get_by_id", lambda db: crud.get_by_id(db, models.Group, group.id)),
+        ("get_all", lambda db: crud.get_all(db, models.Session, 0, 100)),
+        ("get_all (keyset)", lambda db: crud.get_all(db, models.Session, 0, 100, after_id=last_session_id // 2)),
+        ("get_all (ids)", lambda db: crud.get_all(db, models.Session, 0, 100, ids=list(range(1, last_session_id, max(last_session_id // 50, 1))))),
+        ("get_all_rows (fields)", lambda db: crud.get_all_rows(
+            db, models.Group, schemas.Group, 0, 100, fields=crud.parse_fields(models.Group, schemas.Group, "code"))),
+        ("get_faculty_by_name", lambda db: crud.get_faculty_by_name(db, v["faculty"].name)),
+        ("get_group_by_code", lambda db: crud.get_group_by_code(db, group.code)),
+        ("get_department_by_name", lambda db: crud.get_department_by_name(db, v["department"].name)),
+        ("get_subject_by_name", lambda db: crud.get_subject_by_name(db, subject.name)),
+        ("get_teacher_by_name", lambda db: crud.get_teacher_by_name(db, v["teacher"].name)),
+        ("search_groups", lambda db: crud.search_groups(db, group.faculty_id, group.num_students, "num_students", 0, 100)),
+        ("search_groups (keyset)", lambda db: crud.search_groups(db, None, 0, "course", 0, 100, after=(group.course, group.id))),
+        ("get_session_details", lambda db: crud.get_session_details(db, 0, 10)),
+        ("get_session_details (keyset)", lambda db: crud.get_session_details(db, 0, 10, after_id=last_session_id // 2)),
+        ("get_group_details", lambda db: crud.get_group_details(db, 0, 10)),
+        ("get_subject_details", lambda db: crud.get_subject_details(db, 0, 10)),
+        ("get_details_rows (fields)", lambda db: crud.get_details_rows(
+            db, models.Session, schemas.Session, 0, 10, fields=crud.parse_fields(models.Session, schemas.Session, "group.code", nested=True))),
+        ("promote_groups", lambda db: crud.promote_groups(db, group.course)),
+        ("get_students_per_faculty", lambda db: crud.get_students_per_faculty(db)),
+        ("search_subjects_by_trgm", lambda db: crud.search_subjects_by_trgm(db, subject.name)),
+        ("search_subjects_by_regex", lambda db: crud.search_subjects_by_regex(db, "^This subject")),
+        ("search_subjects_by_fts", lambda db: crud.search_subjects_by_fts(db, subject.name)),
+        ("get_subjects_by_tags", lambda db: crud.get_subjects_by_tags(db, (subject.extra or {}).get("tags", ["tag1"])[:1], 0, 100)),
+        ("get_subjects_by_extra", lambda db: crud.get_subjects_by_extra(db, {"tags": ["tag1"]}, 0, 100)),
+        ("get_schedule (teacher)", lambda db: crud.get_schedule(db, "teacher", v["teacher"].id, day, None, 100)),
+        ("get_schedule (group)", lambda db: crud.get_schedule(db, "group", group.id, day, day, 100)),
+        ("get_schedule (subject)", lambda db: crud.get_schedule(db, "subject", subject.id, None, None, 100)),
+        ("get_conflicts (teacher)", lambda db: crud.get_conflicts(db, "teacher", day, day, 100)),
+        ("get_conflicts (group)", lambda db: crud.get_conflicts(db, "group", None, None, 100)),
+        ("create", lambda db: crud.create(db, models.Teacher, schemas.TeacherCreate(name="Index Advisor"))),
+    ]
+
+
+def seq_scans(plan: dict):
+    """Yield the relation names of all Seq Scan nodes in an EXPLAIN (FORMAT JSON) plan tree."""
+    if plan.get("Node Type") == "Seq Scan":
+        yield plan.get("Relation Name")
+    for child in plan.get("Plans", []):
+        yield from seq_scans(child)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--min-rows", type=int, default=1000, help="ignore seq scans on tables with fewer (estimated) rows")
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    flagged = 0
+    with engine.connect() as conn:
+        outer = conn.begin()
+        # crud functions commit; with a savepoint-joined session those commits stay inside `outer`
+        db = Session(bind=conn, join_transaction_mode="create_savepoint")
+        table_rows = dict(conn.execute(text(
+            "SELECT relname, reltuples::bigint FROM pg_class WHERE relkind IN ('r', 'p')"
+        )).all())
+
+        captured = []
+        def capture(connection, cursor, statement, parameters, context, executemany):
+            # The SQL as compiled: with prepared statements on, `statement` is already EXECUTE stmt_<hash>(...)
+            statement = context.statement if context is not None else statement
+            if not executemany and statement.lstrip().upper().startswith(("SELECT", "WITH", "UPDATE", "INSERT", "DELETE")):
+                captured.append((statement, parameters))
+
+        for name, call in crud_calls(sample_values(db)):
+            captured.clear()
+            event.listen(engine, "before_cursor_execute", capture)
+            try:
+                call(db)
+            finally:
+                event.remove(engine, "before_cursor_execute", capture)
+
+            for statement, parameters in list(captured):
+                cursor = conn.connection.cursor()
+                cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement, parameters)
+                plan = cursor.fetchone()[0]
+                cursor.close()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                top = plan[0]
+                scans = [rel for rel in seq_scans(top["Plan"]) if table_rows.get(rel, 0) >= args.min_rows]
+                status = "SEQ SCAN on " + ", ".join(sorted(set(scans))) if scans else "ok"
+                print(f"{name:<32} {top['Execution Time']:>9.3f} ms  {status}")
+                if args.verbose or scans:
+                    print("    " + " ".join(statement.split()))
+                if args.verbose:
+                    print(json.dumps(top["Plan"], indent=2))
+                flagged += bool(scans)
+
+        db.close()
+        outer.rollback()
+
+    print(f"\n{flagged} statement(s) with sequential scans on tables >= {args.min_rows} rows.")
+    sys.exit(1 if flagged else 0)
+
+
+if __name__ == '__main__':
+    main()
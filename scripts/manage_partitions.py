@@ -0,0 +1,108 @@
+"""
+Maintain the yearly partitions of the sessions table (see app/partitions.py).
+
+    list      attached partitions, their bounds, and rows left in sessions_default
+    create    create the partitions from this year to --years-ahead years ahead;
+              rows of those years already in sessions_default are moved into them
+    detach    detach every partition of a year before --before; the rows leave
+              `sessions` at once (no DELETE). With --archive the tables move to
+              the `archive` schema, with --drop they are dropped, otherwise they
+              stay as standalone tables named sessions_y<year>.
+
+Run `create` regularly (e.g. from cron each month) so new dates never land in
+sessions_default. Detaching takes a brief exclusive lock on `sessions`:
+DETACH ... CONCURRENTLY is not available because the table has a default
+partition. --dry-run prints the statements instead of running them.
+
+Usage:
+    python scripts/manage_partitions.py list
+    python scripts/manage_partitions.py create [--years-ahead 2]
+    python scripts/manage_partitions.py detach --before 2020 [--archive | --drop]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+
+from app.database import engine
+from app.partitions import (
+    DEFAULT_PARTITION,
+    archive_partition_sql,
+    attached_years,
+    default_partition_rows,
+    detach_partition_sql,
+    drop_partition_sql,
+    ensure_partitions,
+    list_partitions,
+    missing_years,
+    partition_name,
+    partition_statements,
+)
+
+
+def run(conn, statements, dry_run: bool):
+    for statement in statements:
+        print(statement + ";")
+        if not dry_run:
+            conn.execute(text(statement))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list")
+    create = sub.add_parser("create")
+    create.add_argument("--years-ahead", type=int, default=2)
+    detach = sub.add_parser("detach")
+    detach.add_argument("--before", type=int, required=True, help="detach the years before this one")
+    target = detach.add_mutually_exclusive_group()
+    target.add_argument("--archive", action="store_true", help="move the detached tables to the archive schema")
+    target.add_argument("--drop", action="store_true", help="drop the detached tables")
+    for command in (create, detach):
+        command.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        with engine.connect() as conn:
+            for name, bound in list_partitions(conn):
+                print(f"{name:<24} {bound}")
+            print(f"{default_partition_rows(conn)} rows in {DEFAULT_PARTITION}")
+        return
+
+    if args.command == "create":
+        with engine.begin() as conn:
+            if args.dry_run:
+                for year in missing_years(conn, args.years_ahead):
+                    statements, rows = partition_statements(conn, year)
+                    print(f"-- {partition_name(year)}: {rows} rows to move from {DEFAULT_PARTITION}")
+                    run(conn, statements, dry_run=True)
+                return
+            created = ensure_partitions(conn, args.years_ahead)
+        if not created:
+            print("All partitions exist.")
+        for year, rows in created.items():
+            print(f"Created {partition_name(year)}, moved {rows} rows from {DEFAULT_PARTITION}.")
+        return
+
+    with engine.connect() as conn:
+        years = [year for year in attached_years(conn) if year < args.before]
+    if not years:
+        print(f"No partitions before {args.before}.")
+        return
+    for year in years:
+        with engine.connect() as conn:
+            statements = [detach_partition_sql(year)]
+            if args.archive:
+                statements += archive_partition_sql(year)
+            elif args.drop:
+                statements += drop_partition_sql(year)
+            run(conn, statements, args.dry_run)
+            conn.commit()
+    print(f"{'Would detach' if args.dry_run else 'Detached'} {len(years)} partitions: {years}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,128 +1,366 @@
 """
-Populate the API with many records via REST calls.
+Populate the API with many records and measure it: a data generator and load tool.
 
-This script is updated to work with the refactored API that uses foreign key IDs.
-It first creates parent entities (Faculties, Departments, Teachers),
-collects their IDs, and then uses these IDs to create dependent entities
-(Groups, Subjects, Sessions).
+Parent entities (Faculties, Departments, Teachers) are created first, their IDs
+collected, and then used to create dependent entities (Groups, Subjects,
+Sessions). All payloads are generated from --seed alone: a child refers to its
+parent by the parent's position in the generated list, which is replaced by the
+id the parent was created with. So a run is reproducible whatever the
+concurrency, the order requests finish in or the rows that fail.
+
+Modes:
+  api   - one POST per row, sent concurrently by --concurrency worker threads
+          over a shared keep-alive connection pool
+  bulk  - POST /<entity>/bulk/ with --batch-size rows per request
+  copy  - bypass the API and COPY rows straight into PostgreSQL (DATABASE_URL),
+          for seeding large databases quickly
+
+For api/bulk modes the script reports per-endpoint throughput and p50/p95/p99
+latency (optionally as JSON with --report), so it doubles as a capacity
+planning tool.
+
+Examples:
+    python scripts/populate_via_api.py                          # the original small data set
+    python scripts/populate_via_api.py --scale 20 --concurrency 32
+    python scripts/populate_via_api.py --mode bulk --sessions 100000
+    python scripts/populate_via_api.py --mode copy --scale 1000 --seed 7
 """
-import requests
-from random import randint, choice
-from datetime import date, timedelta
+import argparse
+import io
+import json
+import os
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from random import Random
+
+import requests
+from requests.adapters import HTTPAdapter
 
-BASE_URL = "http://localhost:8000"
+BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
 
 # --- Data for population ---
 FACULTIES_DATA = ["Computer Science", "Applied Mathematics", "Physics", "History", "Philology"]
 DEPARTMENTS_DATA = ["Software Engineering", "Theoretical Physics", "Ancient History", "English Literature", "Computational Maths"]
 TEACHERS_DATA = ["Dr. Alan Turing", "Dr. Albert Einstein", "Dr. Marie Curie", "Dr. Herodotus", "Dr. William Shakespeare"]
+CONTROL_TYPES = ["exam", "test", "practical"]
 
-# --- Helper to make requests and handle errors ---
-def post_data(endpoint, payload):
-    """Posts data to an endpoint and returns the JSON response."""
-    try:
-        response = requests.post(f"{BASE_URL}{endpoint}", json=payload)
-        response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
-        print(f"SUCCESS: POST {endpoint} with {payload} -> {response.status_code}")
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        print(f"ERROR: POST {endpoint} with {payload} -> {e}", file=sys.stderr)
-        if hasattr(e, 'response') and e.response is not None:
-            print(f"Response body: {e.response.text}", file=sys.stderr)
-        return None
-
-# --- Step 1: Create independent entities and store their IDs ---
-def create_and_get_ids(endpoint, data_list):
-    """Creates entities from a list of names and returns a list of their full objects."""
-    created_items = []
-    for name in data_list:
-        payload = {"name": name}
-        response_json = post_data(endpoint, payload)
-        if response_json:
-            created_items.append(response_json)
-    return created_items
-
-# --- Step 2: Create dependent entities ---
-def create_groups(faculty_ids: list, num_groups=50):
-    """Creates groups using a list of faculty IDs."""
-    if not faculty_ids:
-        print("ERROR: No faculty IDs provided. Cannot create groups.", file=sys.stderr)
-        return []
-    
-    created_groups = []
-    for i in range(num_groups):
-        payload = {
+# Row counts at --scale 1 (the original data set)
+BASE_COUNTS = {"faculties": 5, "departments": 5, "teachers": 5, "groups": 50, "subjects": 40, "sessions": 200}
+
+
+# --- Deterministic payload generation ---
+
+def numbered(names: list, i: int) -> str:
+    """The plain name for the first round through `names`, numbered after that (keeps names unique)."""
+    name = names[i % len(names)]
+    return name if i < len(names) else f"{name} {i // len(names) + 1}"
+
+def generate_named(names: list, count: int) -> list:
+    return [{"name": numbered(names, i)} for i in range(count)]
+
+# Dependent payloads hold the position of their parent in its generated list; link()
+# swaps it for the parent's id once the parents are created
+
+def generate_groups(rng: Random, faculty_count: int, count: int) -> list:
+    return [
+        {
             "code": f"G{1000 + i}",
-            "course": randint(1, 5),
-            "num_students": randint(15, 30),
-            "faculty_id": choice(faculty_ids)
+            "course": rng.randint(1, 5),
+            "num_students": rng.randint(15, 30),
+            "faculty_id": rng.randrange(faculty_count),
         }
-        response_json = post_data("/groups/", payload)
-        if response_json:
-            created_groups.append(response_json)
-    return created_groups
-
-def create_subjects(department_ids: list, num_subjects=50):
-    """Creates subjects using a list of department IDs."""
-    if not department_ids:
-        print("ERROR: No department IDs provided. Cannot create subjects.", file=sys.stderr)
-        return []
-
-    created_subjects = []
-    for i in range(num_subjects):
-        payload = {
+        for i in range(count)
+    ]
+
+def generate_subjects(rng: Random, department_count: int, count: int) -> list:
+    return [
+        {
             "name": f"Subject {i+1}",
-            "num_hours": choice([32, 48, 64, 96]),
-            "department_id": choice(department_ids),
+            "num_hours": rng.choice([32, 48, 64, 96]),
+            "department_id": rng.randrange(department_count),
             "extra": {
                 "notes": f"This subject covers topics {i+1} and patterns {i%5+1}.",
                 "tags": [f"tag{i%3+1}", f"level{i%5+1}"]
             }
         }
-        response_json = post_data("/subjects/", payload)
-        if response_json:
-            created_subjects.append(response_json)
-    return created_subjects
-
-def create_sessions(group_ids: list, subject_ids: list, teacher_ids: list, num_sessions=200):
-    """Creates sessions using lists of group, subject, and teacher IDs."""
-    if not all([group_ids, subject_ids, teacher_ids]):
-        print("ERROR: Missing IDs for groups, subjects, or teachers. Cannot create sessions.", file=sys.stderr)
-        return
-
-    for _ in range(num_sessions):
-        payload = {
-            "group_id": choice(group_ids),
-            "subject_id": choice(subject_ids),
-            "teacher_id": choice(teacher_ids),
-            "control_type": choice(["exam","test","practical"]),
-            "session_date": str(date.today() - timedelta(days=randint(0, 365)))
+        for i in range(count)
+    ]
+
+def generate_sessions(rng: Random, group_count: int, subject_count: int, teacher_count: int, count: int) -> list:
+    start = date(2025, 9, 1)
+    return [
+        {
+            "group_id": rng.randrange(group_count),
+            "subject_id": rng.randrange(subject_count),
+            "teacher_id": rng.randrange(teacher_count),
+            "control_type": rng.choice(CONTROL_TYPES),
+            "session_date": str(start - timedelta(days=rng.randint(0, 365))),
         }
-        post_data("/sessions/", payload)
+        for _ in range(count)
+    ]
+
+def link(payloads: list, parent_ids: dict) -> list:
+    """Payloads with each parent position replaced by that parent's id, in order.
+    `parent_ids` maps a field to the ids by position, None where the parent was not created;
+    payloads pointing at such a parent are left out."""
+    linked = []
+    for payload in payloads:
+        ids = {field: parent_ids[field][payload[field]] for field in parent_ids}
+        if None not in ids.values():
+            linked.append({**payload, **ids})
+    if len(linked) < len(payloads):
+        print(f"WARNING: {len(payloads) - len(linked)} rows skipped, their parent was not created", file=sys.stderr)
+    return linked
+
+def ids_of(created: list) -> list:
+    return [row["id"] if row else None for row in created]
+
+
+# --- Latency statistics ---
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.rows = 0
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, ok: bool, rows: int):
+        with self._lock:
+            self.latencies.append(seconds)
+            self.errors += not ok
+            self.rows += rows if ok else 0
+
+    def summary(self) -> dict:
+        latencies = sorted(self.latencies)
+        elapsed = (self.finished or time.perf_counter()) - self.started
+
+        def pct(p):
+            return round(latencies[min(int(p / 100 * len(latencies)), len(latencies) - 1)] * 1000, 2) if latencies else None
+
+        return {
+            "requests": len(latencies),
+            "errors": self.errors,
+            "rows": self.rows,
+            "seconds": round(elapsed, 3),
+            "req_per_s": round(len(latencies) / elapsed, 1) if elapsed else None,
+            "rows_per_s": round(self.rows / elapsed, 1) if elapsed else None,
+            "p50_ms": pct(50),
+            "p95_ms": pct(95),
+            "p99_ms": pct(99),
+        }
+
+
+# --- HTTP client (api and bulk modes) ---
+
+class ApiClient:
+    """Concurrent POSTs over one keep-alive connection pool, with per-endpoint statistics."""
+
+    def __init__(self, base_url: str, concurrency: int, verbose: bool = False):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.verbose = verbose
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
+        self.stats = {}
+
+    def post(self, endpoint: str, payload, rows: int = 1):
+        stats = self.stats[endpoint]
+        start = time.perf_counter()
+        try:
+            response = self.http.post(f"{self.base_url}{endpoint}", json=payload, timeout=60)
+            ok = response.status_code < 400
+        except requests.exceptions.RequestException as e:
+            stats.record(time.perf_counter() - start, False, rows)
+            print(f"ERROR: POST {endpoint} -> {e}", file=sys.stderr)
+            return None
+        stats.record(time.perf_counter() - start, ok, rows)
+        if not ok:
+            print(f"ERROR: POST {endpoint} -> {response.status_code} {response.text[:200]}", file=sys.stderr)
+            return None
+        if self.verbose:
+            print(f"SUCCESS: POST {endpoint} -> {response.status_code}")
+        return response.json()
+
+    def create_all(self, endpoint: str, payloads: list) -> list:
+        """POST each payload concurrently; returns the created objects in payload order, None where it failed."""
+        self.stats[endpoint] = stats = EndpointStats()
+        stats.started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            results = list(pool.map(lambda payload: self.post(endpoint, payload), payloads))
+        stats.finished = time.perf_counter()
+        return [r or None for r in results]
+
+    def create_all_bulk(self, endpoint: str, payloads: list, batch_size: int) -> list:
+        """POST the payloads in batches; returns the created objects in payload order, None where it failed."""
+        bulk_endpoint = endpoint + "bulk/"
+        self.stats[bulk_endpoint] = stats = EndpointStats()
+        stats.started = time.perf_counter()
+        batches = [payloads[i:i + batch_size] for i in range(0, len(payloads), batch_size)]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            results = list(pool.map(lambda batch: self.post(bulk_endpoint, batch, rows=len(batch)), batches))
+        stats.finished = time.perf_counter()
+        created = []
+        for batch, result in zip(batches, results):
+            if not result:
+                created.extend([None] * len(batch))
+                continue
+            # "created" holds the rows without an error, in input order
+            failed = {error["index"] for error in result["errors"]}
+            rows = iter(result["created"])
+            created.extend(None if i in failed else next(rows) for i in range(len(batch)))
+            for error in result["errors"]:
+                print(f"ERROR: POST {bulk_endpoint} item -> {error['detail']}", file=sys.stderr)
+        return created
+
+
+def populate_via_api(client: ApiClient, counts: dict, rng: Random, bulk_batch: int = 0):
+    create = (lambda ep, payloads: client.create_all_bulk(ep, payloads, bulk_batch)) if bulk_batch else client.create_all
+
+    # Generated before anything is sent, so the payloads do not depend on the responses
+    faculties = generate_named(FACULTIES_DATA, counts["faculties"])
+    departments = generate_named(DEPARTMENTS_DATA, counts["departments"])
+    teachers = generate_named(TEACHERS_DATA, counts["teachers"])
+    groups = generate_groups(rng, counts["faculties"], counts["groups"])
+    subjects = generate_subjects(rng, counts["departments"], counts["subjects"])
+    sessions = generate_sessions(rng, counts["groups"], counts["subjects"], counts["teachers"], counts["sessions"])
 
-if __name__ == '__main__':
     print("--- 1. Creating Faculties ---")
-    faculties = create_and_get_ids("/faculties/", FACULTIES_DATA)
-    faculty_ids = [f['id'] for f in faculties]
+    faculty_ids = ids_of(create("/faculties/", faculties))
+    print("--- 2. Creating Departments ---")
+    department_ids = ids_of(create("/departments/", departments))
+    print("--- 3. Creating Teachers ---")
+    teacher_ids = ids_of(create("/teachers/", teachers))
+    if not any(faculty_ids) or not any(department_ids) or not any(teacher_ids):
+        sys.exit("ERROR: Missing parent IDs (faculties, departments or teachers). Cannot continue.")
+
+    print("--- 4. Creating Groups ---")
+    group_ids = ids_of(create("/groups/", link(groups, {"faculty_id": faculty_ids})))
+    print("--- 5. Creating Subjects ---")
+    subject_ids = ids_of(create("/subjects/", link(subjects, {"department_id": department_ids})))
+    if not any(group_ids) or not any(subject_ids):
+        sys.exit("ERROR: Missing IDs for groups or subjects. Cannot create sessions.")
+
+    print("--- 6. Creating Sessions ---")
+    create("/sessions/", link(sessions, {"group_id": group_ids, "subject_id": subject_ids, "teacher_id": teacher_ids}))
 
-    print("\n--- 2. Creating Departments ---")
-    departments = create_and_get_ids("/departments/", DEPARTMENTS_DATA)
-    department_ids = [d['id'] for d in departments]
 
-    print("\n--- 3. Creating Teachers ---")
-    teachers = create_and_get_ids("/teachers/", TEACHERS_DATA)
-    teacher_ids = [t['id'] for t in teachers]
+# --- Direct COPY into PostgreSQL (copy mode) ---
 
-    print("\n--- 4. Creating Groups ---")
-    groups = create_groups(faculty_ids, num_groups=50)
-    group_ids = [g['id'] for g in groups]
+COPY_CHUNK_ROWS = 100_000
+
+def copy_rows(conn, table: str, columns: list, rows: list) -> list:
+    """COPY `rows` (dicts) into `table` and return the new ids in insertion order, i.e. the order of `rows`."""
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+        (max_before,) = cur.fetchone()
+        for start in range(0, len(rows), COPY_CHUNK_ROWS):
+            buffer = io.StringIO()
+            for row in rows[start:start + COPY_CHUNK_ROWS]:
+                values = (json.dumps(row[c]) if isinstance(row[c], (dict, list)) else str(row[c]) for c in columns)
+                buffer.write("\t".join(v.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n") for v in values) + "\n")
+            buffer.seek(0)
+            cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+        cur.execute(f"SELECT id FROM {table} WHERE id > %s ORDER BY id", (max_before,))
+        return [row[0] for row in cur.fetchall()]
+
+def populate_via_copy(database_url: str, counts: dict, rng: Random):
+    import psycopg2
+
+    conn = psycopg2.connect(database_url.replace("+psycopg2", "", 1))
+    stats = {}
+
+    def timed(table, columns, rows):
+        start = time.perf_counter()
+        ids = copy_rows(conn, table, columns, rows)
+        elapsed = time.perf_counter() - start
+        stats[table] = {"rows": len(ids), "seconds": round(elapsed, 3), "rows_per_s": round(len(ids) / elapsed, 1) if elapsed else None}
+        print(f"COPY {table}: {len(ids)} rows in {elapsed:.2f}s")
+        return ids
+
+    try:
+        faculty_ids = timed("faculties", ["name"], generate_named(FACULTIES_DATA, counts["faculties"]))
+        department_ids = timed("departments", ["name"], generate_named(DEPARTMENTS_DATA, counts["departments"]))
+        teacher_ids = timed("teachers", ["name"], generate_named(TEACHERS_DATA, counts["teachers"]))
+        group_ids = timed("groups", ["code", "course", "num_students", "faculty_id"],
+                          link(generate_groups(rng, counts["faculties"], counts["groups"]), {"faculty_id": faculty_ids}))
+        subject_ids = timed("subjects", ["name", "num_hours", "department_id", "extra"],
+                            link(generate_subjects(rng, counts["departments"], counts["subjects"]), {"department_id": department_ids}))
+        remaining = counts["sessions"]
+        session_columns = ["group_id", "subject_id", "teacher_id", "control_type", "session_date"]
+        started, copied = time.perf_counter(), 0
+        while remaining > 0:  # generate sessions in chunks to keep memory flat at large scales
+            chunk = min(remaining, COPY_CHUNK_ROWS)
+            sessions = generate_sessions(rng, counts["groups"], counts["subjects"], counts["teachers"], chunk)
+            parent_ids = {"group_id": group_ids, "subject_id": subject_ids, "teacher_id": teacher_ids}
+            copied += len(copy_rows(conn, "sessions", session_columns, link(sessions, parent_ids)))
+            remaining -= chunk
+        elapsed = time.perf_counter() - started
+        stats["sessions"] = {"rows": copied, "seconds": round(elapsed, 3), "rows_per_s": round(copied / elapsed, 1) if elapsed else None}
+        print(f"COPY sessions: {copied} rows in {elapsed:.2f}s")
+        conn.commit()
+        with conn.cursor() as cur:
+            cur.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+    return stats
+
+
+def print_report(stats: dict):
+    print(f"\n{'endpoint':<22} {'reqs':>7} {'errs':>5} {'rows/s':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, s in stats.items():
+        print(f"{endpoint:<22} {s['requests']:>7} {s['errors']:>5} {s['rows_per_s']:>9} {s['req_per_s']:>8} "
+              f"{s['p50_ms']:>8} {s['p95_ms']:>8} {s['p99_ms']:>8}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Populate the University Session API and measure it.")
+    parser.add_argument("--mode", choices=["api", "bulk", "copy"], default="api")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), help="for --mode copy")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies every entity count")
+    for entity, count in BASE_COUNTS.items():
+        parser.add_argument(f"--{entity}", type=int, help=f"number of {entity} (default {count} x scale)")
+    parser.add_argument("--concurrency", type=int, default=8, help="parallel requests (api/bulk modes)")
+    parser.add_argument("--batch-size", type=int, default=500, help="rows per request in bulk mode")
+    parser.add_argument("--report", help="write the per-endpoint statistics to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="print every successful request")
+    return parser.parse_args(argv)
+
+def entity_counts(args) -> dict:
+    return {
+        entity: getattr(args, entity) if getattr(args, entity) is not None else max(1, round(count * args.scale))
+        for entity, count in BASE_COUNTS.items()
+    }
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    counts = entity_counts(args)
+    rng = Random(args.seed)
+    print(f"Counts: {counts} (seed {args.seed}, mode {args.mode})")
 
-    print("\n--- 5. Creating Subjects ---")
-    subjects = create_subjects(department_ids, num_subjects=40)
-    subject_ids = [s['id'] for s in subjects]
+    if args.mode == "copy":
+        if not args.database_url:
+            sys.exit("ERROR: --mode copy needs --database-url or DATABASE_URL.")
+        stats = populate_via_copy(args.database_url, counts, rng)
+    else:
+        client = ApiClient(args.base_url, args.concurrency, args.verbose)
+        populate_via_api(client, counts, rng, bulk_batch=args.batch_size if args.mode == "bulk" else 0)
+        stats = {endpoint: s.summary() for endpoint, s in client.stats.items()}
+        print_report(stats)
 
-    print("\n--- 6. Creating Sessions ---")
-    create_sessions(group_ids, subject_ids, teacher_ids, num_sessions=200)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"mode": args.mode, "seed": args.seed, "counts": counts, "endpoints": stats}, f, indent=2)
 
     print("\n--- Population complete! ---")
@@ -0,0 +1,53 @@
+"""
+End-of-year promotion: move every group up one course.
+
+Courses are processed from the highest down, in chunks of --chunk-size groups
+per transaction (see app/promotion.py). Progress is printed after every chunk.
+If a run is interrupted, resume it with the --start-course / --after-id it
+prints; starting over would promote the finished courses again.
+
+Usage:
+    python scripts/promote_groups.py --dry-run
+    python scripts/promote_groups.py [--chunk-size 1000] [--start-course 3 --after-id 1200]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.promotion import PROMOTION_CHUNK_SIZE, PromotionJob
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--dry-run", action="store_true", help="only print the groups per course")
+    parser.add_argument("--chunk-size", type=int, default=PROMOTION_CHUNK_SIZE)
+    parser.add_argument("--start-course", type=int, help="resume: skip courses above this one")
+    parser.add_argument("--after-id", type=int, default=0, help="resume: skip groups of --start-course up to this id")
+    args = parser.parse_args()
+
+    job = PromotionJob(args.dry_run, args.chunk_size, args.start_course, args.after_id)
+    start = time.perf_counter()
+
+    def progress(job):
+        planned = job.planned.get(job.current_course, 0)
+        print(f"course {job.current_course}: {job.promoted[job.current_course]}/{planned} groups "
+              f"(last id {job.last_id}, {time.perf_counter() - start:.1f}s)")
+
+    try:
+        job.run(progress)
+    except Exception as e:
+        if job.current_course is None:
+            sys.exit(f"ERROR: {e}")
+        sys.exit(f"ERROR: {e}\nResume with: --start-course {job.current_course} --after-id {job.last_id}")
+
+    for course, count in job.planned.items():
+        done = "" if job.dry_run else f", promoted {job.promoted.get(course, 0)}"
+        print(f"course {course} -> {course + 1}: {count} groups{done}")
+    print(f"Done in {time.perf_counter() - start:.1f}s{' (dry run, nothing written)' if job.dry_run else ''}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Incrementally (re)build subjects.search_vector, the full-text search document.
+
+New and changed subjects are indexed by the trigger from migration 0007. This
+script covers existing rows: after `alembic -x skip_fts_backfill=true upgrade`,
+or with --all after changing subject_search_vector() (e.g. its text search
+configuration). Rows are processed in id order, in batches that each commit
+on their own, so locks stay short and an interrupted run can be resumed with
+--after-id.
+
+Usage:
+    python scripts/reindex_subjects.py [--batch-size 5000] [--all] [--after-id 0] [--sleep 0]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+
+from app.database import engine
+
+REINDEX_BATCH = text("""
+    WITH batch AS (
+        SELECT id FROM subjects
+        WHERE id > :after_id {missing_only}
+        ORDER BY id
+        LIMIT :batch_size
+    )
+    UPDATE subjects SET search_vector = subject_search_vector(subjects.name, subjects.extra)
+    FROM batch WHERE subjects.id = batch.id
+    RETURNING subjects.id
+""")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--all", action="store_true", help="recompute every row, not only rows without a vector")
+    parser.add_argument("--after-id", type=int, default=0, help="resume after this subject id")
+    parser.add_argument("--sleep", type=float, default=0.0, help="seconds to pause between batches")
+    args = parser.parse_args()
+
+    stmt = text(REINDEX_BATCH.text.format(missing_only="" if args.all else "AND search_vector IS NULL"))
+    after_id, total, start = args.after_id, 0, time.perf_counter()
+    while True:
+        with engine.begin() as conn:
+            ids = conn.execute(stmt, {"after_id": after_id, "batch_size": args.batch_size}).scalars().all()
+        if not ids:
+            break
+        after_id, total = max(ids), total + len(ids)
+        print(f"reindexed {total} subjects (last id {after_id}, {total / (time.perf_counter() - start):.0f} rows/s)")
+        if args.sleep:
+            time.sleep(args.sleep)
+    print(f"Done: {total} subjects reindexed in {time.perf_counter() - start:.1f}s.")
+
+
+if __name__ == '__main__':
+    main()
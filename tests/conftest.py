@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# The app builds its engine at import time: point it at a throwaway SQLite file
+# and keep the response cache out of the way before anything imports `app`.
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test.db")
+os.environ["CACHE_BACKEND"] = "off"
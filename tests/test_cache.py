@@ -0,0 +1,45 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from app import cache, models
+from app.cache import RedisCache
+from app.database import engine
+from app.main import app
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode() if isinstance(value, str) else value
+
+
+def test_redis_entries_are_stored_as_json():
+    backend = RedisCache.__new__(RedisCache)
+    backend.client, backend.ttl = FakeRedis(), 60
+    entry = (b'[{"id": 1}]\xff', {"content-type": "application/json"}, '"abc"')
+
+    backend.set("key", entry)
+
+    stored = json.loads(backend.client.data["cache:key"])
+    assert set(stored) == {"body", "headers", "etag"}
+    assert backend.get("key") == entry
+    assert backend.get("missing") is None
+
+
+def test_job_writes_bump_no_namespace(monkeypatch):
+    backend = cache.MemoryCache()
+    monkeypatch.setattr(cache, "cache", backend)
+    models.Base.metadata.create_all(engine)
+
+    with TestClient(app) as client:
+        assert client.post("/jobs/promotion/", params={"dry_run": True}).status_code == 202
+        assert client.post("/faculties/", json={"name": "Cache Faculty"}).status_code < 400
+
+    assert backend.version("jobs") == 0
+    assert backend.version("faculties") == 1
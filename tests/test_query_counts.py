@@ -0,0 +1,59 @@
+from datetime import date, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app import models, reference
+from app.database import SessionLocal, engine
+from app.main import app
+
+DETAILS_ROUTES = ("/sessions/details/", "/groups/details/", "/subjects/details/")
+
+
+@pytest.fixture(scope="module")
+def client():
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        faculties = [models.Faculty(name=f"Faculty {i}") for i in range(3)]
+        departments = [models.Department(name=f"Department {i}") for i in range(3)]
+        db.add_all(faculties + departments)
+        db.flush()
+        groups = [models.Group(code=f"G{i}", course=i % 4 + 1, num_students=20, faculty_id=faculties[i % 3].id) for i in range(30)]
+        subjects = [models.Subject(name=f"Subject {i}", num_hours=32, department_id=departments[i % 3].id) for i in range(30)]
+        teachers = [models.Teacher(name=f"Teacher {i}") for i in range(10)]
+        db.add_all(groups + subjects + teachers)
+        db.flush()
+        db.add_all([
+            models.Session(control_type="exam", session_date=date(2025, 1, 1) + timedelta(days=i),
+                           group_id=groups[i % 30].id, subject_id=subjects[i % 30].id, teacher_id=teachers[i % 10].id)
+            for i in range(30)
+        ])
+        db.commit()
+    with TestClient(app) as client:
+        yield client
+
+
+def count_statements(client, url: str, params: dict) -> int:
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        response = client.get(url, params=params)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == params["limit"]
+    return len(statements)
+
+
+@pytest.mark.parametrize("snapshot", [True, False], ids=["snapshot", "joins"])
+@pytest.mark.parametrize("url", DETAILS_ROUTES)
+def test_details_query_count_does_not_grow_with_limit(client, monkeypatch, url, snapshot):
+    """No N+1: the statement count of a details page is the same for 1 row and for 25."""
+    monkeypatch.setattr(reference, "REFERENCE_SNAPSHOT", snapshot)
+    reference.snapshot.invalidate()
+    client.get(url, params={"limit": 1})  # load the snapshot tables first
+    counts = {limit: count_statements(client, url, {"limit": limit}) for limit in (1, 5, 25)}
+    assert len(set(counts.values())) == 1, counts
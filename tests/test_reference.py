@@ -0,0 +1,90 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import models, reference
+from app.database import SessionLocal, engine
+from app.main import app
+
+
+@pytest.fixture
+def snapshot(monkeypatch):
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        faculty = models.Faculty(name="Reference Faculty")
+        db.add(faculty)
+        db.flush()
+        db.add_all([
+            models.Group(code="R-1", course=1, num_students=20, faculty_id=faculty.id),
+            models.Group(code="R-2", course=1, num_students=20, faculty_id=None),
+        ])
+        db.commit()
+    monkeypatch.setattr(reference, "REFERENCE_SNAPSHOT", True)
+    monkeypatch.setattr(reference, "snapshot", reference.ReferenceSnapshot())
+    return reference.snapshot
+
+
+def test_failed_reload_leaves_the_table_stale(snapshot, monkeypatch):
+    snapshot.table("faculties")
+    snapshot.invalidate("faculties")
+
+    def fail(db, name):
+        raise ConnectionError("primary unavailable")
+
+    monkeypatch.setattr(reference, "load_table", fail)
+    with pytest.raises(ConnectionError):
+        snapshot.table("faculties")
+    assert not snapshot.is_fresh("faculties")
+
+
+def test_notification_during_reload_leaves_the_table_stale(snapshot, monkeypatch):
+    load_table = reference.load_table
+
+    def load_and_notify(db, name):
+        table = load_table(db, name)
+        snapshot.invalidate(name)
+        return table
+
+    monkeypatch.setattr(reference, "load_table", load_and_notify)
+    snapshot.table("faculties")
+    assert not snapshot.is_fresh("faculties")
+
+
+def test_resolve_leaves_out_null_and_unknown_ids(snapshot):
+    faculty_id = next(iter(snapshot.table("faculties").rows))
+    with SessionLocal() as db:
+        resolved = reference.resolve(db, models.Faculty, {faculty_id, None, 12345})
+    assert set(resolved) == {faculty_id}
+
+
+def test_details_without_a_related_row_are_left_out(snapshot):
+    with TestClient(app) as client:
+        response = client.get("/groups/details/")
+    assert response.status_code == 200
+    assert [group["code"] for group in response.json()] == ["R-1"]
+
+
+def test_stale_table_is_not_reloaded_on_the_event_loop(snapshot, monkeypatch):
+    threads = []
+    load_table = reference.load_table
+
+    def record_thread(db, name):
+        threads.append(threading.get_ident())
+        return load_table(db, name)
+
+    monkeypatch.setattr(reference, "load_table", record_thread)
+
+    async def on_loop():
+        table = snapshot.table("faculties")  # as crud.resolve would, inside run_sync
+        assert len(table) == 0  # nothing loaded yet: every id goes to the request's session
+        while not snapshot.is_fresh("faculties"):
+            await asyncio.sleep(0.01)
+        snapshot.invalidate("departments")
+        await reference.refresh_async(models.Department)
+        assert snapshot.is_fresh("departments")
+
+    asyncio.run(on_loop())
+    assert len(threads) == 2 and threading.get_ident() not in threads
@@ -0,0 +1,42 @@
+import pytest
+
+from app.crud import REGEX_MIN_LITERAL, regex_is_indexable, required_literal_run
+
+
+@pytest.mark.parametrize("pattern", [
+    ".{100}",
+    r"\d{123}",
+    "[a-z]{500}",
+    "(ab){100}",
+    "a{0,3}bc",
+    "ab{0,}c",
+    ".*",
+    "abc|.{100}",
+    "[^]abc]",
+    "[]abc]",
+    r"[\]abc]",
+    "[[:alpha:]abc]",
+])
+def test_patterns_without_a_literal_run_are_rejected(pattern):
+    assert not regex_is_indexable(pattern)
+
+
+@pytest.mark.parametrize("pattern", [
+    "abc.*",
+    "^Intro.*",
+    "data structures",
+    "abc{2}.{100}",
+    "x{3}abc",
+    "(?:abc|def)gh",
+    r"\d+ hours of algebra",
+    "[^]x]abc",
+])
+def test_patterns_with_a_literal_run_pass(pattern):
+    assert regex_is_indexable(pattern)
+
+
+def test_bound_digits_are_not_literals():
+    assert required_literal_run(r"\d{123}") == 0
+    assert required_literal_run("ab{2}") == 2
+    assert required_literal_run("ab{0,2}") == 1
+    assert REGEX_MIN_LITERAL == 3
@@ -0,0 +1,82 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import main, models
+from app.database import DATABASE_URL, engine, get_async_db
+
+# (path, item, changed item) per entity with a natural key; the changed item keeps the key
+ENTITIES = {
+    "faculties": ("/faculties/", {"name": "Upsert Faculty"}, {"name": "Upsert Faculty"}),
+    "departments": ("/departments/", {"name": "Upsert Department"}, {"name": "Upsert Department"}),
+    "groups": (
+        "/groups/",
+        {"code": "UP-1", "course": 1, "num_students": 20, "faculty_id": 1},
+        {"code": "UP-1", "course": 2, "num_students": 25, "faculty_id": 1},
+    ),
+    "subjects": (
+        "/subjects/",
+        {"name": "Upsert Subject", "num_hours": 32, "department_id": 1},
+        {"name": "Upsert Subject", "num_hours": 64, "department_id": 1},
+    ),
+}
+
+
+def sync_client():
+    return TestClient(main.app)
+
+
+def async_client():
+    """ The async routes (DB_ASYNC=1) on the same database, through aiosqlite """
+    async_engine = create_async_engine(DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1))
+    AsyncSession = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(main.async_router)
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    return TestClient(app)
+
+
+@pytest.fixture(params=["sync", "async"])
+def client(request):
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    if request.param == "async":
+        pytest.importorskip("aiosqlite")
+    with sync_client() as setup:
+        setup.post("/faculties/", json={"name": "Parent Faculty"})
+        setup.post("/departments/", json={"name": "Parent Department"})
+    with (async_client() if request.param == "async" else sync_client()) as client:
+        yield client
+
+
+@pytest.mark.parametrize("entity", ENTITIES)
+def test_upsert_returns_the_existing_row(client, entity):
+    path, item, changed = ENTITIES[entity]
+    created = client.post(path, json=item)
+    assert created.status_code == 200
+
+    assert client.post(path, json=changed).status_code == 409
+    upserted = client.post(path, json=changed, params={"upsert": True})
+    assert upserted.status_code == 200
+    assert upserted.json() == {**created.json(), **changed}
+
+
+@pytest.mark.parametrize("entity", ENTITIES)
+def test_bulk_upsert_returns_every_row(client, entity):
+    path, item, changed = ENTITIES[entity]
+    created = client.post(path, json=item).json()
+    key = "code" if entity == "groups" else "name"
+    new = {**changed, key: changed[key] + "-new"}
+
+    response = client.post(path + "bulk/", json=[changed, new], params={"upsert": True})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["errors"] == []
+    assert body["created"][0] == {**created, **changed}
+    assert body["created"][1][key] == new[key]